@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import LLMProviderConfig, ChatHistory, AssistantContextFile
+from django.db.models import Count, F, Sum
+
+from .models import LLMProviderConfig, ChatHistory, AssistantContextFile, ExtractedContent, LLMUsageDaily
 
 
 @admin.register(LLMProviderConfig)
@@ -24,6 +26,9 @@ class LLMProviderConfigAdmin(admin.ModelAdmin):
             'fields': ('instructions',),
             'classes': ('wide',)
         }),
+        ('Failover', {
+            'fields': ('fallback_chain', 'attempt_timeout'),
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -96,14 +101,14 @@ class AssistantContextFileAdmin(admin.ModelAdmin):
     list_display = ['name', 'llm_config', 'file_type_badge', 'status_badge', 'file_size_display', 'is_active', 'created_at']
     list_filter = ['file_type', 'status', 'is_active', 'created_at', 'llm_config']
     search_fields = ['name', 'llm_config__display_name', 'extracted_content']
-    readonly_fields = ['file_size', 'extracted_content', 'error_message', 'created_at', 'updated_at']
+    readonly_fields = ['file_size', 'content_hash', 'extracted_content', 'error_message', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('llm_config', 'name', 'file', 'is_active')
         }),
         ('Processamento', {
-            'fields': ('file_type', 'status', 'error_message', 'file_size')
+            'fields': ('file_type', 'status', 'error_message', 'file_size', 'content_hash')
         }),
         ('Conteúdo Extraído', {
             'fields': ('extracted_content',),
@@ -164,3 +169,66 @@ class AssistantContextFileAdmin(admin.ModelAdmin):
         return obj.get_file_size_display()
     file_size_display.short_description = 'Tamanho'
     file_size_display.admin_order_field = 'file_size'
+
+
+@admin.register(ExtractedContent)
+class ExtractedContentAdmin(admin.ModelAdmin):
+    """
+    Admin para o cache de extração (por SHA-256 do arquivo)
+    """
+    list_display = ['sha256', 'file_size', 'created_at', 'updated_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'extracted_text', 'file_size', 'provider_file_ids', 'created_at', 'updated_at']
+
+
+@admin.register(LLMUsageDaily)
+class LLMUsageDailyAdmin(admin.ModelAdmin):
+    """
+    Relatório de consumo de LLM (somente leitura): totais do filtro atual e
+    os maiores consumidores por usuário, instância e configuração
+    """
+    change_list_template = 'admin/agents/llmusagedaily/change_list.html'
+    list_display = ['date', 'user', 'evolution_instance', 'llm_config', 'model', 'requests',
+                    'input_tokens', 'output_tokens', 'cache_read_tokens', 'avg_latency', 'cost']
+    list_filter = ['date', 'model', 'llm_config', 'evolution_instance']
+    search_fields = ['model', 'user__username', 'llm_config__display_name']
+    date_hierarchy = 'date'
+    list_select_related = ['user', 'evolution_instance', 'llm_config']
+
+    REPORT_TOP = 10
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def avg_latency(self, obj):
+        """Latência média por chamada"""
+        return f"{obj.latency_ms / obj.requests / 1000:.1f}s" if obj.requests else '-'
+    avg_latency.short_description = 'Latência média'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            queryset = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            # Redirecionamento ou erro de filtro
+            return response
+
+        # Nomes diferentes dos campos do model (annotate não aceita repetidos)
+        totals = dict(
+            calls=Sum('requests'), tokens_in=Sum('input_tokens'), tokens_out=Sum('output_tokens'),
+            tokens_cached=Sum('cache_read_tokens'), spend=Sum('cost'),
+        )
+        response.context_data['usage_totals'] = queryset.aggregate(**totals)
+        response.context_data['usage_breakdowns'] = [
+            (title, queryset.order_by().values(label=F(field)).annotate(days=Count('date', distinct=True), **totals)
+             .order_by('-spend', '-tokens_in')[:self.REPORT_TOP])
+            for title, field in (
+                ('Por usuário', 'user__username'),
+                ('Por instância', 'evolution_instance__name'),
+                ('Por configuração', 'llm_config__display_name'),
+            )
+        ]
+        return response
@@ -333,7 +333,18 @@ class OpenAIService:
     def upload_pdf_to_openai(self, pdf_file):
         """
         Faz upload do arquivo PDF para a OpenAI Files API
+        Reaproveita o ID de um upload anterior do mesmo conteúdo (ExtractedContent)
         """
+        from .models import ExtractedContent
+
+        cached = None
+        if pdf_file.content_hash:
+            cached = ExtractedContent.objects.filter(sha256=pdf_file.content_hash).first()
+        if cached and cached.provider_file_ids.get('openai'):
+            pdf_file.openai_file_id = cached.provider_file_ids['openai']
+            pdf_file.save()
+            return pdf_file.openai_file_id
+
         try:
             url = f"{self.base_url}/files"
 
@@ -360,6 +371,9 @@ class OpenAIService:
                     # Salvar o file_id no modelo
                     pdf_file.openai_file_id = file_id
                     pdf_file.save()
+                    if cached:
+                        cached.provider_file_ids['openai'] = file_id
+                        cached.save(update_fields=['provider_file_ids', 'updated_at'])
 
                     print(f"PDF {pdf_file.name} enviado para OpenAI. File ID: {file_id}")
                     return file_id
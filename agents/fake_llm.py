@@ -0,0 +1,207 @@
+"""
+Provedor LLM falso para testes de carga de ponta a ponta
+Com LLMProviderConfig.name = 'fake' o pipeline inteiro (webhook, roteamento,
+grafo do agente, tools, streaming, envio) roda sem chamar nenhum provedor: as
+respostas saem de regras (regex na última mensagem do usuário -> chamada de
+tool ou texto) e a latência é sorteada de uma distribuição configurável em
+LLM_FAKE. O sorteio usa como semente o conteúdo das mensagens, então a mesma
+conversa tem sempre a mesma resposta e a mesma latência.
+
+Regras (LLM_FAKE['RULES'] ou o arquivo JSON em LLM_FAKE['SCRIPT'], que vêm
+antes das padrão), avaliadas em ordem:
+    {"match": "(?i)gastei (\\d+)", "tool": "registrar_movimentacao",
+     "args": {"tipo": "expense", "valor": "\\1"}}
+    {"match": "(?i)bom dia", "reply": "Bom dia!"}
+    {"after_tool": "listar_movimentacoes", "reply": "Aqui está:\\n{output}"}
+'match' é testado contra a última mensagem do usuário e os textos de 'reply'
+e 'args' aceitam \\1 / \\g<nome> dos grupos. 'after_tool' (nome ou '*') vale
+quando a última mensagem é o resultado dessa tool; {output} é o resultado.
+Uma regra de tool só vale se a tool estiver disponível (bind_tools).
+"""
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .rate_limit import estimate_tokens
+from .streaming import _text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAKE = {
+    # 'constant' (MEDIAN), 'uniform' (MIN a MAX) ou 'lognormal' (MEDIAN, SIGMA), em segundos
+    'LATENCY': {'DISTRIBUTION': 'lognormal', 'MEDIAN': 0.8, 'SIGMA': 0.4, 'MIN': 0.2, 'MAX': 2.0},
+    # Fração da latência até o primeiro chunk no streaming; o resto é dividido entre os chunks
+    'FIRST_TOKEN_SHARE': 0.3,
+    # Fração das chamadas que falham com FakeLLMError (failover, tratamento de erro)
+    'ERROR_RATE': 0.0,
+    'SEED': 0,
+    'RULES': [],
+    'SCRIPT': '',
+}
+
+# Fluxos comuns do assistente financeiro, para funcionar sem script
+DEFAULT_RULES = [
+    {'match': r'(?i)\b(?:gastei|paguei|comprei)\b\D*?(\d+(?:\.\d+)?)(?:\s*reais)?(?:\s+(?:com|no|na|em|de)\s+(.+))?',
+     'tool': 'registrar_movimentacao',
+     'args': {'tipo': 'expense', 'valor': r'\1', 'descricao': r'\2', 'categoria': 'Outros',
+              'metodo_pagamento': 'pix'}},
+    {'match': r'(?i)\b(?:recebi|ganhei)\b\D*?(\d+(?:\.\d+)?)',
+     'tool': 'registrar_movimentacao',
+     'args': {'tipo': 'income', 'valor': r'\1', 'descricao': 'Receita', 'categoria': 'Outros'}},
+    {'match': r'(?i)\bsaldo\b|\bresumo\b', 'tool': 'saldo_por_categoria', 'args': {'periodo_dias': 30}},
+    {'match': r'(?i)\bcategorias\b', 'tool': 'listar_categorias', 'args': {}},
+    {'match': r'(?i)\bmovimenta|\bextrato\b|\bgastos\b', 'tool': 'listar_movimentacoes', 'args': {'limite': 10}},
+    {'after_tool': '*', 'reply': '{output}'},
+    {'match': r'(?s)(.+)', 'reply': r'Entendi: \1'},
+]
+
+
+class FakeLLMError(Exception):
+    """Falha sorteada pelo ERROR_RATE"""
+
+
+def get_config():
+    return {**DEFAULT_FAKE, **getattr(settings, 'LLM_FAKE', {})}
+
+
+@lru_cache(maxsize=8)
+def _load_script(path):
+    with open(path, encoding='utf-8') as file:
+        script = json.load(file)
+    return script.get('rules', []) if isinstance(script, dict) else script
+
+
+def get_rules(config=None):
+    """Regras do script e de LLM_FAKE['RULES'] antes das padrão"""
+    config = config or get_config()
+    rules = list(config['RULES'])
+    if config['SCRIPT']:
+        try:
+            rules = _load_script(config['SCRIPT']) + rules
+        except (OSError, ValueError) as e:
+            logger.error('Script do LLM falso %s inválido: %s', config['SCRIPT'], e)
+    return rules + DEFAULT_RULES
+
+
+def sample_latency(rng, latency):
+    """Latência (s) sorteada da distribuição de LLM_FAKE['LATENCY']"""
+    distribution = latency.get('DISTRIBUTION', 'constant')
+    if distribution == 'uniform':
+        return rng.uniform(latency['MIN'], latency['MAX'])
+    if distribution == 'lognormal':
+        return rng.lognormvariate(0, latency['SIGMA']) * latency['MEDIAN']
+    return latency['MEDIAN']
+
+
+def _expand(value, match):
+    if match is None or not isinstance(value, str):
+        return value
+    return match.expand(value).strip()
+
+
+def respond(messages, tools, rules):
+    """
+    Resposta das regras: (texto, tool_calls). O texto vazio com tool_calls
+    é uma chamada de ferramenta.
+    """
+    last = messages[-1] if messages else None
+    human = next((message for message in reversed(messages) if isinstance(message, HumanMessage)), None)
+    human_text = _text(human.content) if human is not None else ''
+
+    for rule in rules:
+        if 'after_tool' in rule:
+            if not isinstance(last, ToolMessage) or rule['after_tool'] not in ('*', last.name):
+                continue
+            return rule.get('reply', '').replace('{output}', _text(last.content)), []
+        if isinstance(last, ToolMessage):
+            continue
+
+        match = re.search(rule['match'], human_text) if 'match' in rule else None
+        if 'match' in rule and match is None:
+            continue
+        if 'tool' in rule:
+            if rule['tool'] not in tools:
+                continue
+            args = {key: _expand(value, match) for key, value in rule.get('args', {}).items()}
+            return '', [{'name': rule['tool'], 'args': args, 'id': f'call_{uuid.uuid4().hex[:24]}'}]
+        return _expand(rule.get('reply', ''), match), []
+
+    return '', []
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model do LangChain com respostas por regras e latência simulada.
+    Suporta bind_tools(), invoke() e stream() como os clientes reais.
+    """
+
+    model_name: str = 'fake'
+    max_tokens: int = 0
+
+    @property
+    def _llm_type(self):
+        return 'fake'
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _prepare(self, messages, tools):
+        """(texto, tool_calls, latência, uso) da resposta às mensagens"""
+        config = get_config()
+        seed = f"{config['SEED']}:" + '\n'.join(_text(message.content) for message in messages)
+        rng = random.Random(seed)
+        latency = sample_latency(rng, config['LATENCY'])
+        if rng.random() < config['ERROR_RATE']:
+            time.sleep(latency)
+            raise FakeLLMError('Falha simulada do LLM falso')
+
+        names = {tool['function']['name'] for tool in tools or []}
+        text, tool_calls = respond(messages, names, get_rules(config))
+        if self.max_tokens:
+            text = text[:self.max_tokens * 4]
+        input_tokens = estimate_tokens(messages)
+        output_tokens = max(estimate_tokens(text + json.dumps([call['args'] for call in tool_calls])), 1)
+        usage = {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                 'total_tokens': input_tokens + output_tokens}
+        return text, tool_calls, latency, usage, config
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        text, tool_calls, latency, usage, _ = self._prepare(messages, tools)
+        time.sleep(latency)
+        message = AIMessage(content=text, tool_calls=tool_calls, usage_metadata=usage,
+                            response_metadata={'model_name': self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        text, tool_calls, latency, usage, config = self._prepare(messages, tools)
+        words = re.findall(r'\S*\s*', text)[:-1] or ['']
+        time.sleep(latency * config['FIRST_TOKEN_SHARE'])
+        interval = latency * (1 - config['FIRST_TOKEN_SHARE']) / len(words)
+
+        for position, word in enumerate(words):
+            if position:
+                time.sleep(interval)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content='',
+            tool_call_chunks=[
+                {'name': call['name'], 'args': json.dumps(call['args']), 'id': call['id'], 'index': index}
+                for index, call in enumerate(tool_calls)
+            ],
+            usage_metadata=usage,
+            response_metadata={'model_name': self.model_name},
+        ))
@@ -1,12 +1,32 @@
 """
 Processadores de arquivos para extrair contexto de diferentes tipos de arquivo
 """
+import codecs
+import csv
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
 import os
 import mimetypes
+import re
+import tempfile
+import time
+from html.parser import HTMLParser
 from typing import Optional, Dict, Any
 from django.core.files.uploadedfile import UploadedFile
 
 
+def _file_hash(file_path: str) -> str:
+    """SHA-256 do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 class BaseFileProcessor:
     """Classe base para processadores de arquivo"""
     
@@ -23,6 +43,13 @@ class BaseFileProcessor:
         """Extrai texto do arquivo. Deve ser implementado pelas subclasses."""
         raise NotImplementedError
     
+    def _setting(self, name, default):
+        try:
+            from django.conf import settings
+            return getattr(settings, name, default)
+        except Exception:
+            return default
+
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """Retorna informações básicas do arquivo"""
         stat = os.stat(file_path)
@@ -35,175 +62,498 @@ class BaseFileProcessor:
         }
 
 
+def _detect_encoding(file_path: str, sample_size: int = 64 * 1024) -> str:
+    """Encoding provável do arquivo, decidido por uma amostra do início"""
+    with open(file_path, 'rb') as file:
+        sample = file.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            # final=False: a amostra pode terminar no meio de um caractere
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    # latin-1 decodifica qualquer sequência de bytes
+    return 'latin-1'
+
+
+class _BoundedWriter:
+    """Acumula a saída até `max_chars` caracteres; o excedente é descartado"""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.truncated = False
+        self.reset()
+
+    def reset(self):
+        self.buffer = io.StringIO()
+        self.remaining = self.max_chars
+        self.truncated = False
+
+    def write(self, text: str) -> bool:
+        """Grava `text`; retorna False quando o limite foi atingido"""
+        if len(text) > self.remaining:
+            text = text[:self.remaining]
+            self.truncated = True
+        self.buffer.write(text)
+        self.remaining -= len(text)
+        return not self.truncated
+
+    def getvalue(self) -> str:
+        text = self.buffer.getvalue().strip()
+        if self.truncated:
+            text += f"\n\n... (conteúdo truncado em {self.max_chars} caracteres)"
+        return text
+
+
+# Tokens JSON (pontuação, strings completas e escalares) com os espaços em volta
+_JSON_TOKEN = re.compile(r'\s*([{}\[\],:]|"(?:[^"\\]|\\.)*"|[^\s{}\[\],:"]+)\s*')
+_JSON_SCALAR = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null')
+
+
+class _JsonStreamFormatter:
+    """
+    Reindenta JSON recebido em blocos sem montar o documento em memória.
+    Containers abaixo de `max_depth` níveis são resumidos como {…} / […].
+    Levanta ValueError se o conteúdo não for JSON.
+    """
+
+    CLOSING = {'{': '}', '[': ']'}
+
+    def __init__(self, output: _BoundedWriter, max_depth: int, indent: int = 2):
+        self.output = output
+        self.max_depth = max_depth
+        self.indent = indent
+        self.stack = []
+        self.pending = ''  # token possivelmente cortado no fim do bloco
+        self.opened = False  # container aberto ainda sem conteúdo
+        self.skipping = 0  # profundidade dentro de um container resumido
+
+    def _newline(self):
+        return self.output.write('\n' + ' ' * (self.indent * len(self.stack)))
+
+    def feed(self, chunk: str, final: bool = False) -> bool:
+        """Processa um bloco; retorna False quando a saída atingiu o limite"""
+        data = self.pending + chunk
+        self.pending = ''
+        position = 0
+        for match in _JSON_TOKEN.finditer(data):
+            if match.start() != position:
+                break
+            token = match.group(1)
+            # Escalar no fim do bloco pode estar cortado: espera o próximo
+            if not final and match.end(1) == len(data) and token[0] not in '"{}[],:':
+                self.pending = token
+                return True
+            position = match.end()
+            if not self._token(token):
+                return False
+
+        rest = data[position:]
+        if rest.strip():
+            # Só uma string ainda sem fechamento pode sobrar
+            if final or not rest.lstrip().startswith('"'):
+                raise ValueError(f'JSON inválido perto de {rest[:20]!r}')
+            self.pending = rest
+        elif final and self.stack:
+            raise ValueError('JSON incompleto')
+        return True
+
+    def _token(self, token: str) -> bool:
+        if token in '{[':
+            if self.skipping:
+                self.skipping += 1
+                return True
+            if self.opened and not self._newline():
+                return False
+            self.opened = False
+            if len(self.stack) >= self.max_depth:
+                self.skipping = 1
+                return self.output.write(token + '…')
+            self.stack.append(token)
+            self.opened = True
+            return self.output.write(token)
+
+        if token in '}]':
+            if self.skipping:
+                self.skipping -= 1
+                return self.skipping or self.output.write(token)
+            if not self.stack or self.CLOSING[self.stack.pop()] != token:
+                raise ValueError('JSON com chaves/colchetes desbalanceados')
+            if self.opened:
+                self.opened = False
+                return self.output.write(token)
+            return self._newline() and self.output.write(token)
+
+        if self.skipping:
+            return True
+        if self.opened:
+            self.opened = False
+            if not self._newline():
+                return False
+        if token == ',':
+            return self.output.write(',') and self._newline()
+        if token == ':':
+            return self.output.write(': ')
+
+        if not token.startswith('"'):
+            if not _JSON_SCALAR.fullmatch(token):
+                raise ValueError(f'Valor JSON inválido: {token[:20]!r}')
+        elif '\\u' in token:
+            token = json.dumps(json.loads(token), ensure_ascii=False)
+        return self.output.write(token)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Texto de HTML/XML em fluxo, sem scripts e estilos, uma linha por bloco"""
+
+    SKIP_TAGS = {'script', 'style'}
+    BLOCK_TAGS = {
+        'p', 'div', 'br', 'li', 'tr', 'td', 'th', 'table', 'ul', 'ol', 'section',
+        'article', 'header', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title',
+    }
+
+    def __init__(self, output: _BoundedWriter):
+        super().__init__(convert_charrefs=True)
+        self.output = output
+        self.skip = 0
+        self.line = []
+        self.full = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        first, *rest = data.split('\n')
+        self.line.append(first)
+        for part in rest:
+            self._break()
+            self.line.append(part)
+
+    def _break(self):
+        text = ' '.join(''.join(self.line).split())
+        self.line.clear()
+        if text and not self.full:
+            self.full = not self.output.write(text + '\n')
+
+    def close(self):
+        super().close()
+        self._break()
+
+
 class TextFileProcessor(BaseFileProcessor):
-    """Processador para arquivos de texto simples"""
-    
+    """
+    Processador para arquivos de texto simples
+    O encoding é detectado uma vez numa amostra e o arquivo é lido em blocos:
+    CSV, JSON e HTML são convertidos em fluxo, com memória constante, e a
+    saída é limitada a CONTEXT_TEXT_MAX_CHARS caracteres.
+    """
+
+    READ_SIZE = 64 * 1024
+    SNIFF_SIZE = 4096
+    CSV_MAX_ROWS = 100  # Incluindo o cabeçalho
+    JSON_MAX_DEPTH = 20
+
     def __init__(self):
         super().__init__()
         self.supported_extensions = ['.txt', '.md', '.csv', '.json', '.html', '.xml']
-    
+
     def extract_text(self, file_path: str) -> str:
         """Extrai texto de arquivos texto"""
         try:
-            # Tentar diferentes encodings
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        content = file.read()
-                        
-                    # Se conseguiu ler, processa baseado na extensão
-                    ext = os.path.splitext(file_path)[1].lower()
-                    
-                    if ext == '.json':
-                        return self._process_json(content)
-                    elif ext == '.csv':
-                        return self._process_csv(content)
-                    elif ext == '.html' or ext == '.xml':
-                        return self._process_html(content)
-                    else:
-                        return content.strip()
-                        
-                except UnicodeDecodeError:
-                    continue
-                    
-            return "Erro: Não foi possível decodificar o arquivo"
-            
+            encoding = _detect_encoding(file_path)
+            output = _BoundedWriter(self._setting('CONTEXT_TEXT_MAX_CHARS', 2_000_000))
+            ext = os.path.splitext(file_path)[1].lower()
+
+            # newline='': o módulo csv trata as quebras dentro de campos
+            with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as file:
+                if ext == '.json':
+                    self._process_json(file, output)
+                elif ext == '.csv':
+                    self._process_csv(file, output, file_path)
+                elif ext == '.html' or ext == '.xml':
+                    self._process_html(file, output)
+                else:
+                    self._copy(file, output)
+
+            return output.getvalue()
+
         except Exception as e:
             return f"Erro ao processar arquivo: {str(e)}"
-    
-    def _process_json(self, content: str) -> str:
-        """Formata JSON para melhor legibilidade"""
+
+    def _blocks(self, file):
+        return iter(lambda: file.read(self.READ_SIZE), '')
+
+    def _copy(self, file, output):
+        for block in self._blocks(file):
+            if not output.write(block):
+                break
+
+    def _process_json(self, file, output):
+        """Reindenta o JSON em blocos; se não for JSON válido, mantém o texto original"""
+        formatter = _JsonStreamFormatter(output, self._setting('CONTEXT_JSON_MAX_DEPTH', self.JSON_MAX_DEPTH))
         try:
-            import json
-            data = json.loads(content)
-            return json.dumps(data, indent=2, ensure_ascii=False)
-        except:
-            return content
-    
-    def _process_csv(self, content: str) -> str:
-        """Converte CSV em formato legível"""
+            for block in self._blocks(file):
+                if not formatter.feed(block):
+                    return
+            formatter.feed('', final=True)
+        except ValueError:
+            output.reset()
+            file.seek(0)
+            self._copy(file, output)
+
+    def _process_csv(self, file, output, file_path):
+        """Converte CSV em formato legível, lendo só as linhas exibidas"""
+        # Detectar delimitador numa amostra de linhas completas
+        sample = file.read(self.SNIFF_SIZE)
+        file.seek(0)
+        if len(sample) == self.SNIFF_SIZE and '\n' in sample:
+            sample = sample[:sample.rindex('\n')]
         try:
-            import csv
-            import io
-            
-            # Detectar delimitador
-            sample = content[:1024]
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-            
-            # Converter para formato tabular
-            reader = csv.reader(io.StringIO(content), delimiter=delimiter)
-            rows = list(reader)
-            
-            if not rows:
-                return content
-                
-            # Formatar como tabela
-            formatted_rows = []
-            for i, row in enumerate(rows[:100]):  # Limitar a 100 linhas
-                if i == 0:
-                    formatted_rows.append("Cabeçalhos: " + " | ".join(row))
-                    formatted_rows.append("-" * 50)
-                else:
-                    formatted_rows.append(" | ".join(row))
-                    
-            if len(rows) > 100:
-                formatted_rows.append(f"... e mais {len(rows) - 100} linhas")
-                
-            return "\n".join(formatted_rows)
-            
-        except:
-            return content
-    
-    def _process_html(self, content: str) -> str:
+            delimiter = csv.Sniffer().sniff(sample).delimiter
+        except csv.Error:
+            delimiter = ','
+
+        max_rows = self._setting('CONTEXT_CSV_MAX_ROWS', self.CSV_MAX_ROWS)
+        reader = csv.reader(file, delimiter=delimiter)
+        shown = 0
+        for i, row in enumerate(reader):
+            if i == max_rows:
+                break
+            if i == 0:
+                written = output.write("Cabeçalhos: " + " | ".join(row) + "\n" + "-" * 50 + "\n")
+            else:
+                written = output.write(" | ".join(row) + "\n")
+            shown += 1
+            if not written:
+                return
+        else:
+            return
+
+        # As demais linhas só são contadas, em bytes e sem interpretar o CSV
+        remaining = _count_lines(file_path) - shown
+        if remaining > 0:
+            output.write(f"... e mais cerca de {remaining} linhas")
+
+    def _process_html(self, file, output):
         """Extrai texto de HTML"""
+        parser = _HTMLTextExtractor(output)
+        for block in self._blocks(file):
+            parser.feed(block)
+            if parser.full:
+                return
+        parser.close()
+
+
+def _count_lines(file_path: str) -> int:
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return lines + (last != b'\n')
+
+
+def _import_pdf_module():
+    """pypdf (atual) ou, em instalações antigas, PyPDF4/PyPDF2"""
+    for name in ('pypdf', 'PyPDF4', 'PyPDF2'):
         try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Remover scripts e estilos
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            # Extrair texto
-            text = soup.get_text()
-            
-            # Limpar linhas vazias excessivas
-            lines = [line.strip() for line in text.splitlines()]
-            lines = [line for line in lines if line]
-            
-            return '\n'.join(lines)
-            
+            return importlib.import_module(name)
         except ImportError:
-            # Se beautifulsoup não estiver instalado, retorna conteúdo bruto
-            return content
-        except:
-            return content
+            continue
+    return None
+
+
+def _open_pdf(pdf_module, file):
+    if hasattr(pdf_module, 'PdfReader'):
+        pdf_reader = pdf_module.PdfReader(file)
+        return len(pdf_reader.pages), pdf_reader.pages.__getitem__
+    # Fallback para versão antiga
+    pdf_reader = pdf_module.PdfFileReader(file)
+    return pdf_reader.numPages, pdf_reader.getPage
+
+
+def _page_cache_path(cache_dir, file_hash, page_num):
+    return os.path.join(cache_dir, file_hash[:2], file_hash, f'{page_num:05d}.txt')
+
+
+def _extract_page_range(file_path, start, end, cache_dir, file_hash):
+    """
+    Extrai as páginas [start, end) e grava cada uma no cache (num processo
+    do pool ou, em PDFs pequenos, no próprio processo). Retorna
+    [(página, texto, erro)].
+    """
+    pdf_module = _import_pdf_module()
+    results = []
+    with open(file_path, 'rb') as file:
+        _, get_page = _open_pdf(pdf_module, file)
+        for page_num in range(start, end):
+            try:
+                page = get_page(page_num)
+                # Tentar extract_text() primeiro (versão nova)
+                if hasattr(page, 'extract_text'):
+                    page_text = page.extract_text() or ''
+                else:
+                    page_text = page.extractText() or ''
+            except Exception as e:
+                results.append((page_num, None, str(e)))
+                continue
+
+            path = _page_cache_path(cache_dir, file_hash, page_num)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f'{path}.{os.getpid()}', 'w', encoding='utf-8') as cache_file:
+                cache_file.write(page_text)
+            os.replace(f'{path}.{os.getpid()}', path)
+            results.append((page_num, page_text, None))
+    return results
+
+
+def _extract_page_range_task(args):
+    # Pool.imap_unordered passa um único argumento
+    return _extract_page_range(*args)
 
 
 class PDFFileProcessor(BaseFileProcessor):
-    """Processador para arquivos PDF"""
-    
+    """
+    Processador para arquivos PDF
+    As páginas são extraídas em paralelo por faixas num pool de processos e
+    gravadas em ordem num arquivo de saída, sem manter todas em memória.
+    Com até CONTEXT_PDF_PAGES_PER_TASK páginas a extrair, o pool (processos
+    'spawn', que reimportam tudo) custaria mais que a extração e ela roda
+    no próprio processo. O
+    texto de cada página fica em cache pelo hash do arquivo, então reenviar o
+    mesmo PDF não extrai nada de novo. Limites de páginas e de tempo encerram
+    arquivos patológicos com o que já foi extraído.
+    """
+
+    reports_progress = True
+
     def __init__(self):
         super().__init__()
         self.supported_extensions = ['.pdf']
-    
-    def extract_text(self, file_path: str) -> str:
+
+    def extract_text(self, file_path: str, progress=None) -> str:
         """Extrai texto de PDFs"""
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as output:
+            result = self.extract_to_file(file_path, output, progress)
+            if result is not None:
+                return result
+            output.seek(0)
+            text = output.read()
+        return text if text.strip() else "Não foi possível extrair texto do PDF"
+
+    def extract_to_file(self, file_path: str, output, progress=None):
+        """
+        Escreve o texto das páginas em `output`, em ordem, à medida que as
+        faixas terminam. Retorna uma mensagem de erro ou None.
+        """
+        pdf_module = _import_pdf_module()
+        if pdf_module is None:
+            return "pypdf não está instalado. Instale com: pip install pypdf"
+
         try:
-            # Tentar primeiro com PyPDF4 (mais moderno)
-            try:
-                import PyPDF4 as PyPDF2
-                pdf_module = "PyPDF4"
-            except ImportError:
-                try:
-                    import PyPDF2
-                    pdf_module = "PyPDF2"
-                except ImportError:
-                    return "PyPDF2 ou PyPDF4 não está instalado. Instale com: pip install PyPDF4"
-            
-            text_content = []
-            
             with open(file_path, 'rb') as file:
-                try:
-                    # Tentar com PdfReader (versão mais nova)
-                    if hasattr(PyPDF2, 'PdfReader'):
-                        pdf_reader = PyPDF2.PdfReader(file)
-                        pages = pdf_reader.pages
-                    else:
-                        # Fallback para versão antiga
-                        pdf_reader = PyPDF2.PdfFileReader(file)
-                        pages = [pdf_reader.getPage(i) for i in range(pdf_reader.numPages)]
-                    
-                    for page_num, page in enumerate(pages):
-                        try:
-                            # Tentar extract_text() primeiro (versão nova)
-                            if hasattr(page, 'extract_text'):
-                                page_text = page.extract_text()
-                            else:
-                                # Fallback para versão antiga
-                                page_text = page.extractText()
-                                
-                            if page_text and page_text.strip():
-                                text_content.append(f"--- Página {page_num + 1} ---")
-                                text_content.append(page_text.strip())
-                                text_content.append("")
-                        except Exception as e:
-                            text_content.append(f"--- Erro na página {page_num + 1}: {str(e)} ---")
-                            
-                except Exception as e:
-                    return f"Erro ao abrir PDF: {str(e)}"
-                        
-            if text_content:
-                result = '\n'.join(text_content)
-                return result if result.strip() else "PDF processado mas não foi possível extrair texto legível"
-            else:
-                return "Não foi possível extrair texto do PDF"
-                
+                total_pages, _ = _open_pdf(pdf_module, file)
         except Exception as e:
-            return f"Erro ao processar PDF: {str(e)}"
+            return f"Erro ao abrir PDF: {str(e)}"
+
+        max_pages = self._setting('CONTEXT_PDF_MAX_PAGES', 500)
+        time_budget = self._setting('CONTEXT_PDF_TIME_BUDGET', 120)
+        pages_per_task = self._setting('CONTEXT_PDF_PAGES_PER_TASK', 10)
+        workers = self._setting('CONTEXT_PDF_WORKERS', os.cpu_count() or 2)
+        cache_dir = self._setting('CONTEXT_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pdf_pages'))
+
+        page_count = min(total_pages, max_pages)
+        file_hash = _file_hash(file_path)
+
+        pages = {}
+        missing = []
+        for page_num in range(page_count):
+            try:
+                with open(_page_cache_path(cache_dir, file_hash, page_num), encoding='utf-8') as cache_file:
+                    pages[page_num] = (cache_file.read(), None)
+            except FileNotFoundError:
+                missing.append(page_num)
+
+        next_page = 0
+        done = len(pages)
+
+        def flush():
+            # Escreve as páginas prontas em sequência e libera a memória
+            nonlocal next_page
+            while next_page in pages:
+                page_text, error = pages.pop(next_page)
+                if error:
+                    output.write(f"--- Erro na página {next_page + 1}: {error} ---\n")
+                elif page_text.strip():
+                    output.write(f"--- Página {next_page + 1} ---\n{page_text.strip()}\n\n")
+                next_page += 1
+
+        def collect(results):
+            nonlocal done
+            for page_num, page_text, error in results:
+                if page_num >= next_page and page_num not in pages:
+                    pages[page_num] = (page_text, error)
+                    done += 1
+            flush()
+            if progress:
+                progress(min(done, page_count) * 100 // (page_count or 1))
+
+        flush()
+        interrupted = None
+        if missing:
+            # Faixas de até pages_per_task páginas consecutivas fora do cache
+            ranges = []
+            for page_num in missing:
+                if ranges and ranges[-1][1] == page_num and page_num - ranges[-1][0] < pages_per_task:
+                    ranges[-1][1] = page_num + 1
+                else:
+                    ranges.append([page_num, page_num + 1])
+
+            deadline = time.monotonic() + time_budget
+            if len(missing) <= pages_per_task:
+                for start, end in ranges:
+                    if time.monotonic() >= deadline:
+                        interrupted = f"limite de {time_budget}s"
+                        break
+                    collect(_extract_page_range(file_path, start, end, cache_dir, file_hash))
+            else:
+                # Ao sair do bloco o Pool é encerrado com terminate(), o que
+                # também interrompe as páginas em andamento depois do limite
+                with multiprocessing.get_context('spawn').Pool(max(1, min(workers, len(ranges)))) as pool:
+                    results = pool.imap_unordered(
+                        _extract_page_range_task,
+                        [(file_path, start, end, cache_dir, file_hash) for start, end in ranges],
+                    )
+                    try:
+                        for _ in ranges:
+                            collect(results.next(timeout=max(0, deadline - time.monotonic())))
+                    except multiprocessing.TimeoutError:
+                        interrupted = f"limite de {time_budget}s"
+
+        if interrupted is None and total_pages > max_pages:
+            interrupted = f"limite de {max_pages} páginas"
+        if interrupted:
+            # Páginas já extraídas depois de uma lacuna também entram
+            while pages:
+                next_page = min(pages)
+                flush()
+            output.write(f"--- Extração interrompida ({interrupted}); {total_pages} páginas no arquivo ---\n")
+        return None
 
 
 class DocxFileProcessor(BaseFileProcessor):
@@ -318,8 +668,11 @@ class FileProcessorFactory:
                 return processor
         return None
     
-    def process_file(self, file_path: str) -> Dict[str, Any]:
-        """Processa arquivo e retorna informações + conteúdo extraído"""
+    def process_file(self, file_path: str, progress=None) -> Dict[str, Any]:
+        """
+        Processa arquivo e retorna informações + conteúdo extraído.
+        `progress(percentual)` é chamado pelos processadores que o suportam.
+        """
         processor = self.get_processor(file_path)
         
         if not processor:
@@ -342,7 +695,10 @@ class FileProcessorFactory:
                 }
             
             # Extrair texto
-            extracted_text = processor.extract_text(file_path)
+            if progress and getattr(processor, 'reports_progress', False):
+                extracted_text = processor.extract_text(file_path, progress=progress)
+            else:
+                extracted_text = processor.extract_text(file_path)
             
             return {
                 'success': True,
@@ -0,0 +1,140 @@
+"""
+Grafo do agente (LLM + tools) que recebe o prompt já montado
+O grafo padrão do django-ai-assistant acrescenta um SystemMessage com
+get_instructions() depois das mensagens recebidas, duplicando as instruções e
+quebrando o prefixo cacheável (e a Anthropic rejeita system messages fora do
+início). Aqui as mensagens vêm prontas de agents.prompt_builder.
+
+Cada turno respeita o TurnBudget (agents.turn_budget) recebido no config:
+chamadas de ferramenta repetidas reaproveitam o resultado e, esgotado o
+orçamento, o agente responde com o que já obteve.
+"""
+from typing import Annotated, Any, TypedDict
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode
+
+from monitoring.metrics import AGENT_TOOL_CALLS
+from .turn_budget import PARTIAL_ANSWER, WRAP_UP_INSTRUCTION, get_budget
+
+# Resultado devolvido ao modelo no lugar de uma chamada sem orçamento
+REFUSED_TOOL_CALL = "Limite de chamadas de ferramenta deste turno atingido; responda com o que já foi obtido."
+# Prefixo do resultado reaproveitado de uma chamada idêntica
+REPEATED_TOOL_CALL = "(Mesmo resultado da chamada idêntica anterior neste turno.)\n"
+
+
+class AgentState(TypedDict):
+    messages: Annotated[list[AnyMessage], add_messages]
+    output: Any
+
+
+def build_agent_graph(assistant):
+    """Compila o grafo usando o LLM e as tools do AIAssistant"""
+    llm = assistant.get_llm()
+    tools = assistant.get_tools()
+    llm_with_tools = llm.bind_tools(tools) if tools else llm
+
+    tool_node = ToolNode(tools)
+
+    def agent(state: AgentState, config):
+        budget = get_budget(config)
+        reason = budget.check()
+        if reason in ('deadline', 'tokens'):
+            return {"messages": [AIMessage(content=PARTIAL_ANSWER)]}
+
+        if reason in ('tool_calls', 'loop'):
+            # Última chamada para responder com o que já foi obtido. As tools
+            # continuam declaradas (a Anthropic exige com tool_use no histórico);
+            # chamadas pedidas mesmo assim são descartadas
+            response = llm_with_tools.invoke(state["messages"] + [HumanMessage(content=WRAP_UP_INSTRUCTION)])
+            budget.charge(response)
+            if getattr(response, 'tool_calls', None):
+                response = AIMessage(content=response.content or PARTIAL_ANSWER,
+                                     usage_metadata=response.usage_metadata,
+                                     response_metadata=response.response_metadata)
+            return {"messages": [response]}
+
+        response = llm_with_tools.invoke(state["messages"])
+        budget.charge(response)
+        return {"messages": [response]}
+
+    def call_tools(state: AgentState, config):
+        """Executa as chamadas dentro do orçamento; idênticas reaproveitam o resultado"""
+        budget = get_budget(config)
+        message = state["messages"][-1]
+        results = {}
+        to_run = []
+        duplicates = []
+
+        for call in message.tool_calls:
+            content = budget.memoized(call)
+            if content is not None:
+                AGENT_TOOL_CALLS.labels(call['name'], 'memoized').inc()
+                results[call['id']] = ToolMessage(content=f'{REPEATED_TOOL_CALL}{content}',
+                                                  name=call['name'], tool_call_id=call['id'])
+            elif any(call['name'] == other['name'] and call['args'] == other['args'] for other in to_run):
+                # Repetida na mesma resposta do modelo: usa o resultado da primeira
+                duplicates.append(call)
+            elif budget.can_call_tool():
+                to_run.append(call)
+            else:
+                AGENT_TOOL_CALLS.labels(call['name'], 'refused').inc()
+                results[call['id']] = ToolMessage(content=REFUSED_TOOL_CALL, name=call['name'],
+                                                  tool_call_id=call['id'], status='error')
+
+        if to_run:
+            output = tool_node.invoke({"messages": [message.model_copy(update={'tool_calls': to_run})]}, config)
+            calls = {call['id']: call for call in to_run}
+            for tool_message in output["messages"]:
+                call = calls[tool_message.tool_call_id]
+                AGENT_TOOL_CALLS.labels(call['name'], 'executed').inc()
+                budget.remember(call, tool_message.content)
+                results[call['id']] = tool_message
+
+        for call in duplicates:
+            AGENT_TOOL_CALLS.labels(call['name'], 'memoized').inc()
+            results[call['id']] = ToolMessage(content=f'{REPEATED_TOOL_CALL}{budget.memoized(call)}',
+                                              name=call['name'], tool_call_id=call['id'])
+
+        return {"messages": [results[call['id']] for call in message.tool_calls]}
+
+    def tool_selector(state: AgentState):
+        last_message = state["messages"][-1]
+        if isinstance(last_message, AIMessage) and last_message.tool_calls:
+            return "call_tool"
+        return "continue"
+
+    def record_response(state: AgentState):
+        return {"output": state["messages"][-1].content}
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("agent", agent)
+    workflow.add_node("tools", call_tools)
+    workflow.add_node("respond", record_response)
+
+    workflow.set_entry_point("agent")
+    workflow.add_conditional_edges(
+        "agent",
+        tool_selector,
+        {
+            "call_tool": "tools",
+            "continue": "respond",
+        },
+    )
+    workflow.add_edge("tools", "agent")
+    workflow.add_edge("respond", END)
+
+    return workflow.compile()
+
+
+def get_agent_graph(assistant):
+    """
+    Grafo compilado guardado no próprio assistant, que fica em cache por
+    config (agents.llm_factory): é compilado uma vez por versão da config.
+    """
+    graph = getattr(assistant, '_agent_graph', None)
+    if graph is None:
+        graph = assistant._agent_graph = build_agent_graph(assistant)
+    return graph
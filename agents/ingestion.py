@@ -0,0 +1,313 @@
+"""
+Ingestão dos arquivos de contexto em segundo plano
+O upload só grava o arquivo e o coloca na fila (status 'processing',
+progresso 0). Um pool de threads por processo consome a fila; cada extração
+roda num processo filho, então um parser travado é encerrado pelo timeout e um
+crash do parser não derruba o worker web. Falhas são repetidas até
+CONTEXT_INGESTION['MAX_ATTEMPTS'] vezes. Jobs na fila em memória se perdem
+quando o worker é reiniciado: os arquivos presos em 'processing' são
+recolocados na fila por recover_stale(), que start_recovery() roda ao iniciar
+cada worker do gunicorn e depois a cada RECOVERY_INTERVAL segundos (ou à mão,
+com reprocess_context_files --stale).
+O resultado fica em ExtractedContent pelo SHA-256 do arquivo: o mesmo conteúdo
+enviado de novo, em qualquer configuração, fica pronto sem nova extração.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, models
+from django.utils import timezone
+
+from .file_processors import file_processor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INGESTION = {
+    'WORKERS': 2,
+    'TIMEOUT': 300,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,
+    # Intervalo (s) entre as buscas por arquivos presos em 'processing'
+    'RECOVERY_INTERVAL': 300,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovery_pid = None
+
+
+def get_config():
+    return {**DEFAULT_INGESTION, **getattr(settings, 'CONTEXT_INGESTION', {})}
+
+
+def content_hash(file):
+    """SHA-256 de um File do Django (upload ou FieldFile aberto), lido em blocos"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def apply_cached(context_file):
+    """
+    Preenche o arquivo com uma extração anterior do mesmo conteúdo.
+    Retorna False se o conteúdo ainda não foi extraído.
+    """
+    from .models import ExtractedContent
+
+    if not context_file.content_hash:
+        return False
+    cached = ExtractedContent.objects.filter(sha256=context_file.content_hash).first()
+    if cached is None:
+        return False
+
+    context_file.extracted_content = cached.extracted_text
+    context_file.status = 'ready'
+    context_file.error_message = None
+    context_file.progress = 100
+    if not context_file.openai_file_id:
+        context_file.openai_file_id = cached.provider_file_ids.get('openai')
+    context_file.save()
+
+    logger.info('Arquivo de contexto %s reaproveitou a extração de %s', context_file.pk, cached.sha256[:12])
+    return True
+
+
+def _extract(file_path, connection):
+    """
+    Roda no processo filho: extrai o texto e devolve pelo pipe mensagens
+    ('progress', percentual) e, no fim, ('result', dict).
+    """
+    try:
+        result = file_processor.process_file(
+            file_path, progress=lambda percent: connection.send(('progress', percent))
+        )
+        connection.send(('result', result))
+    except Exception as e:
+        connection.send(('result', {'success': False, 'error': f'Erro durante processamento: {e}', 'extracted_text': ''}))
+    finally:
+        connection.close()
+
+
+def extract_with_timeout(file_path, timeout, progress=None):
+    """
+    Executa a extração num processo separado. Retorna o dict de
+    FileProcessorFactory.process_file ou levanta TimeoutError/RuntimeError.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    # Não-daemon: o processador de PDF cria o próprio pool de processos
+    process = context.Process(target=_extract, args=(file_path, sender))
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if not receiver.poll(max(0, deadline - time.monotonic())):
+                raise TimeoutError(f'Extração excedeu {timeout}s')
+            kind, value = receiver.recv()
+            if kind == 'result':
+                return value
+            if progress:
+                progress(value)
+    except EOFError:
+        raise RuntimeError(f'Processo de extração encerrou inesperadamente (código {process.exitcode})')
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+        process.join(5)
+
+
+def _set_progress(context_file_id, progress):
+    from .models import AssistantContextFile
+
+    # update() não gera histórico nem dispara signals
+    AssistantContextFile.objects.filter(pk=context_file_id).update(progress=progress)
+
+
+def process_context_file(context_file_id, use_cache=True):
+    """
+    Extrai o conteúdo de um arquivo de contexto, com timeout e novas
+    tentativas. Pode ser chamado diretamente (comando de reprocessamento)
+    ou pelo pool via enqueue(). Com use_cache=False a extração é refeita e
+    substitui a guardada em ExtractedContent.
+    """
+    from .models import AssistantContextFile, ExtractedContent
+
+    config = get_config()
+    try:
+        context_file = AssistantContextFile.objects.get(pk=context_file_id)
+    except AssistantContextFile.DoesNotExist:
+        return None
+
+    if not context_file.content_hash:
+        # Arquivos enviados antes do hash ser calculado no upload
+        with context_file.file.open('rb') as file:
+            context_file.content_hash = content_hash(file)
+        AssistantContextFile.objects.filter(pk=context_file.pk).update(content_hash=context_file.content_hash)
+
+    if use_cache and apply_cached(context_file):
+        return context_file
+
+    while True:
+        context_file.attempts += 1
+        context_file.processing_started_at = timezone.now()
+        AssistantContextFile.objects.filter(pk=context_file.pk).update(
+            status='processing', progress=10,
+            attempts=context_file.attempts,
+            processing_started_at=context_file.processing_started_at,
+        )
+
+        started_at = time.perf_counter()
+        try:
+            result = extract_with_timeout(
+                context_file.file.path, config['TIMEOUT'],
+                # Extração ocupa a faixa 10-90% do progresso
+                progress=lambda percent: _set_progress(context_file.pk, 10 + percent * 80 // 100),
+            )
+        except (TimeoutError, RuntimeError) as e:
+            result = {'success': False, 'error': str(e), 'retry': True}
+
+        if result['success'] or not result.get('retry') or context_file.attempts >= config['MAX_ATTEMPTS']:
+            break
+
+        logger.warning('Extração do arquivo %s falhou (tentativa %s): %s',
+                       context_file.pk, context_file.attempts, result['error'])
+        time.sleep(config['RETRY_DELAY'] * context_file.attempts)
+
+    _set_progress(context_file.pk, 90)
+
+    if result['success']:
+        context_file.extracted_content = result['extracted_text']
+        context_file.status = 'ready'
+        context_file.error_message = None
+        ExtractedContent.objects.update_or_create(
+            sha256=context_file.content_hash,
+            defaults={'extracted_text': result['extracted_text'], 'file_size': context_file.file_size},
+        )
+    else:
+        context_file.status = 'error'
+        context_file.error_message = result['error']
+    context_file.progress = 100
+    context_file.save()
+
+    logger.info('Arquivo de contexto %s processado em %.1fs: %s (%s tentativa(s))',
+                context_file.pk, time.perf_counter() - started_at, context_file.status, context_file.attempts)
+    return context_file
+
+
+def _run(context_file_id):
+    try:
+        process_context_file(context_file_id)
+    except Exception as e:
+        logger.exception('Erro ao processar o arquivo de contexto %s: %s', context_file_id, e)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_config()['WORKERS'],
+                    thread_name_prefix='context-ingestion',
+                )
+                # Arquivos que ficaram presos por um worker reiniciado
+                _executor.submit(recover_stale)
+    return _executor
+
+
+def enqueue(context_file):
+    """
+    Marca o arquivo como na fila e agenda a extração. Conteúdo já extraído
+    antes fica pronto na hora.
+    """
+    from .models import AssistantContextFile
+
+    if apply_cached(context_file):
+        return
+
+    AssistantContextFile.objects.filter(pk=context_file.pk).update(
+        status='processing', progress=0, attempts=0, processing_started_at=None,
+    )
+    get_executor().submit(_run, context_file.pk)
+
+
+def claim_stale(files=None):
+    """
+    Reivindica os arquivos em 'processing' cujo processamento começou há
+    mais tempo do que o permitido para todas as tentativas. Retorna os ids;
+    outro processo que tente reivindicar o mesmo arquivo não o recebe.
+    """
+    from .models import AssistantContextFile
+
+    config = get_config()
+    now = timezone.now()
+    limit = now - timedelta(seconds=config['TIMEOUT'] * config['MAX_ATTEMPTS'] + 60)
+    files = AssistantContextFile.objects.all() if files is None else files
+    stale = (
+        files
+        .filter(status='processing')
+        .filter(
+            models.Q(processing_started_at__lt=limit)
+            # Na fila e nunca iniciado
+            | models.Q(processing_started_at__isnull=True, updated_at__lt=limit)
+        )
+        .values_list('pk', 'processing_started_at')
+    )
+
+    claimed = []
+    for context_file_id, started_at in list(stale):
+        if AssistantContextFile.objects.filter(
+            pk=context_file_id, status='processing', processing_started_at=started_at,
+        ).update(processing_started_at=now):
+            logger.warning('Arquivo de contexto %s preso em processamento, recolocando na fila', context_file_id)
+            claimed.append(context_file_id)
+    return claimed
+
+
+def recover_stale():
+    """Recoloca na fila do pool os arquivos presos em 'processing'"""
+    recovered = claim_stale()
+    for context_file_id in recovered:
+        get_executor().submit(_run, context_file_id)
+    close_old_connections()
+    return len(recovered)
+
+
+def _recovery_loop(interval):
+    while True:
+        try:
+            recover_stale()
+        except Exception as e:
+            logger.exception('Erro ao recuperar arquivos de contexto presos: %s', e)
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_recovery():
+    """
+    Inicia, uma vez por processo, a thread que roda recover_stale() agora e
+    a cada RECOVERY_INTERVAL segundos. Chamada no post_worker_init do
+    gunicorn (conf/production/gunicorn.conf.py), só nos workers web.
+    """
+    global _recovery_pid
+    with _executor_lock:
+        if _recovery_pid == os.getpid():
+            return
+        _recovery_pid = os.getpid()
+    threading.Thread(
+        target=_recovery_loop, args=(get_config()['RECOVERY_INTERVAL'],),
+        name='context-ingestion-recovery', daemon=True,
+    ).start()
@@ -0,0 +1,339 @@
+"""
+Roteamento local das mensagens para a configuração LLM da instância
+Um classificador TF-IDF + regressão logística (NumPy/SciPy) decide entre
+'finance', 'calendar' e 'general' em microssegundos. É treinado com exemplos
+fixos (SEED_EXAMPLES) e com o ChatHistory, rotulado pelas ferramentas que
+responderam cada mensagem. Abaixo de INTENT_ROUTER_MIN_CONFIDENCE a decisão
+fica com o LLM, usando as instruções do IntentRouterAssistant.
+
+Treino: manage.py train_intent_router (grava INTENT_ROUTER_MODEL_PATH)
+Avaliação offline: manage.py evaluate_intent_router
+"""
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+from langchain_core.messages import HumanMessage, SystemMessage
+from scipy import sparse
+
+from monitoring.metrics import INTENT_ROUTES, record_llm_usage
+from . import usage
+from .llm_factory import get_llm
+from .models import ChatHistory, LLMProviderConfig
+
+logger = logging.getLogger(__name__)
+
+LABELS = ('finance', 'calendar', 'general')
+
+# Exemplos que garantem o funcionamento antes de haver histórico rotulado
+SEED_EXAMPLES = {
+    'finance': [
+        'gastei 50 reais no mercado', 'gastei R$ 120,00 na farmácia', 'paguei a conta de luz',
+        'paguei 300 de aluguel no pix', 'comprei pão na padaria', 'recebi meu salário',
+        'recebi 1200 de freela', 'quanto gastei este mês', 'quanto gastei com uber na semana passada',
+        'qual meu saldo', 'mostra minhas despesas', 'lista minhas movimentações', 'quanto recebi mês passado',
+        'apaga a despesa do mercado', 'cria a categoria viagens', 'quais são minhas categorias',
+        'saldo por categoria dos últimos 30 dias', 'paguei o boleto do cartão de crédito',
+        'gasto de 45 com gasolina', 'registra uma despesa de 80 no restaurante', 'entrou 500 na conta',
+        'ganhei 200 de presente', 'anota 35 de ifood', 'quanto tenho de receitas', 'meus gastos de hoje',
+        'orçamento do mês', 'transferi 100 para a poupança', 'pagamento da fatura do cartão',
+    ],
+    'calendar': [
+        'marca uma reunião amanhã às 15h', 'agenda consulta no dentista sexta às 10:00',
+        'tenho algum compromisso hoje', 'quais meus eventos da semana', 'cria um evento dia 20/11 às 9h',
+        'estou livre amanhã de tarde', 'verifica minha disponibilidade na segunda', 'cancela a reunião de amanhã',
+        'desmarca o compromisso das 14h', 'me lembra da reunião com o cliente', 'agendar call às 16h30',
+        'o que tenho na agenda amanhã', 'próximos compromissos', 'marcar almoço com a Ana quinta ao meio-dia',
+        'remarca a consulta para terça', 'adiciona aniversário da mãe no calendário', 'horário livre na quarta',
+        'reunião de equipe toda segunda às 9', 'apaga o evento dentista', 'tenho reunião hoje à tarde',
+        'me lembra de ligar para o médico sexta', 'lembrete de pagar o aluguel dia 5',
+    ],
+    'general': [
+        'oi', 'olá, tudo bem?', 'bom dia', 'boa tarde', 'boa noite', 'obrigado', 'valeu', 'ok',
+        'quem é você', 'o que você faz', 'me ajuda', 'preciso de ajuda', 'qual o horário de atendimento',
+        'quero falar com um atendente', 'como funciona', 'vocês entregam', 'qual o endereço da loja',
+        'tem desconto', 'me conta uma piada', 'como está o tempo hoje', 'quais produtos vocês têm',
+        'qual o preço do plano', 'tchau', 'até mais',
+    ],
+}
+
+_model = None
+_model_mtime = None
+_model_lock = threading.Lock()
+
+
+def normalize(text):
+    """Minúsculas e sem acentos"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    """
+    Stems de 6 letras e bigramas; valores, datas e horários viram marcadores
+    (<valor>, <data>, <hora>, <num>) para generalizar.
+    """
+    text = normalize(text)
+    text = re.sub(r'r\$\s*\d[\d.,]*', ' _valor_ ', text)
+    text = re.sub(r'\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b', ' _data_ ', text)
+    text = re.sub(r'\b\d{1,2}(?::\d{2}|h\d{0,2})\b', ' _hora_ ', text)
+    text = re.sub(r'\b\d+(?:[.,]\d+)*\b', ' _num_ ', text)
+
+    stems = []
+    for word in re.findall(r'_\w+_|[a-z]{2,}', text):
+        stems.append(f'<{word[1:-1]}>' if word.startswith('_') else word[:6])
+    return stems + [f'{a} {b}' for a, b in zip(stems, stems[1:])]
+
+
+class IntentModel:
+    """TF-IDF + regressão logística multinomial; pesos em arrays NumPy"""
+
+    def __init__(self, vocabulary, idf, weights, bias, labels=LABELS):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights  # (classes, termos)
+        self.bias = bias
+        self.labels = tuple(labels)
+
+    def _features(self, text):
+        counts = {}
+        for token in tokenize(text):
+            index = self.vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = (1 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))) * self.idf[indices]
+        return indices, values / np.linalg.norm(values)
+
+    def predict_proba(self, text):
+        """Probabilidade de cada rótulo, na ordem de self.labels"""
+        indices, values = self._features(text)
+        logits = self.weights[:, indices] @ values + self.bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def predict(self, text):
+        """(rótulo, probabilidade)"""
+        probabilities = self.predict_proba(text)
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        temporary = f'{path}.{os.getpid()}.npz'
+        np.savez(temporary, terms=np.array(terms), idf=self.idf, weights=self.weights,
+                 bias=self.bias, labels=np.array(self.labels))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            vocabulary = {str(term): index for index, term in enumerate(data['terms'])}
+            return cls(vocabulary, data['idf'], data['weights'], data['bias'], [str(label) for label in data['labels']])
+
+
+def _matrix(texts, vocabulary, idf):
+    rows, cols, values = [], [], []
+    for row, text in enumerate(texts):
+        counts = {}
+        for token in tokenize(text):
+            index = vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        for index, count in counts.items():
+            rows.append(row)
+            cols.append(index)
+            values.append((1 + np.log(count)) * idf[index])
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(texts), len(vocabulary)))
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def train(texts, labels, l2=1e-3, epochs=400, learning_rate=2.0, max_terms=20000):
+    """Ajusta um IntentModel por gradiente descendente (softmax com L2)"""
+    document_frequency = {}
+    for text in texts:
+        for token in set(tokenize(text)):
+            document_frequency[token] = document_frequency.get(token, 0) + 1
+    terms = sorted(document_frequency, key=lambda token: (-document_frequency[token], token))[:max_terms]
+    vocabulary = {token: index for index, token in enumerate(terms)}
+    df = np.array([document_frequency[token] for token in terms], dtype=float)
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+
+    X = _matrix(texts, vocabulary, idf)
+    y = np.array([LABELS.index(label) for label in labels])
+    Y = np.zeros((len(texts), len(LABELS)))
+    Y[np.arange(len(texts)), y] = 1
+
+    # Classes com pesos iguais, mesmo com histórico desbalanceado
+    class_weights = len(texts) / (len(LABELS) * np.maximum(Y.sum(axis=0), 1))
+    sample_weights = class_weights[y][:, None] / len(texts)
+
+    weights = np.zeros((len(LABELS), len(terms)))
+    bias = np.zeros(len(LABELS))
+    for _ in range(epochs):
+        logits = (X @ weights.T) + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        error = (probabilities - Y) * sample_weights
+        weights -= learning_rate * ((X.T @ error).T + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+
+    return IntentModel(vocabulary, idf, weights, bias)
+
+
+def _tool_labels():
+    """{nome da ferramenta: rótulo} a partir dos assistentes de finanças e agenda"""
+    from finance.ai_assistants import FinanceAIAssistant
+    from google_calendar.ai_assistants import GoogleCalendarAIAssistant
+
+    labels = {}
+    for label, assistant_class in (('finance', FinanceAIAssistant), ('calendar', GoogleCalendarAIAssistant)):
+        for name, member in vars(assistant_class).items():
+            if getattr(member, '_is_tool', False):
+                labels[name] = label
+    return labels
+
+
+def history_examples(limit=50000):
+    """
+    (textos, rótulos) do ChatHistory: o rótulo vem das ferramentas chamadas
+    na resposta. Mensagens sem ferramentas ou com ferramentas de mais de um
+    assistente ficam de fora.
+    """
+    tool_labels = _tool_labels()
+    texts, labels = [], []
+    rows = ChatHistory.objects.order_by('-created_at').values_list('message', flat=True)[:limit]
+    for message in rows.iterator():
+        content = (message.get('content') or '').strip()
+        names = {call.get('name') for call in message.get('tool_calls') or [] if isinstance(call, dict)}
+        found = {tool_labels[name] for name in names if name in tool_labels}
+        if content and len(found) == 1:
+            texts.append(content)
+            labels.append(found.pop())
+    return texts, labels
+
+
+def seed_examples():
+    texts, labels = [], []
+    for label, examples in SEED_EXAMPLES.items():
+        texts.extend(examples)
+        labels.extend([label] * len(examples))
+    return texts, labels
+
+
+def train_default():
+    """Modelo treinado com os exemplos fixos e o histórico rotulado"""
+    texts, labels = seed_examples()
+    history_texts, history_labels = history_examples()
+    return train(texts + history_texts, labels + history_labels)
+
+
+def model_path():
+    return getattr(settings, 'INTENT_ROUTER_MODEL_PATH', os.path.join(settings.BASE_DIR, 'var', 'intent_router.npz'))
+
+
+def get_model():
+    """
+    Modelo gravado por train_intent_router (recarregado quando o arquivo
+    muda) ou, sem arquivo, um modelo só com os exemplos fixos.
+    """
+    global _model, _model_mtime
+    path = model_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    if _model is None or mtime != _model_mtime:
+        with _model_lock:
+            if _model is None or mtime != _model_mtime:
+                if mtime is None:
+                    _model = train(*seed_examples())
+                else:
+                    _model = IntentModel.load(path)
+                _model_mtime = mtime
+    return _model
+
+
+def available_configs(evolution_instance):
+    """{config_type: LLMProviderConfig} que podem atender a instância"""
+    configs = {}
+    if evolution_instance is not None:
+        if evolution_instance.llm_config:
+            configs[evolution_instance.llm_config.config_type] = evolution_instance.llm_config
+        for config in LLMProviderConfig.objects.filter(owner_id=evolution_instance.owner_id).order_by('-created_at'):
+            configs.setdefault(config.config_type, config)
+
+    if not configs:
+        # Instâncias sem configuração própria: comportamento anterior
+        config = LLMProviderConfig.objects.filter(config_type='finance').first()
+        if config:
+            configs['finance'] = config
+    return configs
+
+
+def classify_with_llm(llm_config, message, evolution_instance=None, user=None):
+    """Classificação pelo LLM, para mensagens em que o modelo local não tem confiança"""
+    from utils.ai_assistants import IntentRouterAssistant
+
+    started_at = time.perf_counter()
+    result = get_llm(llm_config).invoke([
+        SystemMessage(content=IntentRouterAssistant.instructions),
+        HumanMessage(content=message),
+    ])
+    duration = time.perf_counter() - started_at
+    totals = record_llm_usage(llm_config, [result], duration)
+    usage.record(usage.build_usage(llm_config, [result], totals, duration), llm_config,
+                 user=user, evolution_instance=evolution_instance)
+    answer = normalize(result.content if isinstance(result.content, str) else str(result.content))
+    for label in LABELS:
+        if label in answer:
+            return label
+    return None
+
+
+def route(message, evolution_instance, user=None):
+    """
+    Escolhe a configuração LLM para a mensagem. O consumo da classificação
+    pelo LLM, quando houver, é atribuído a `user` (o contato do WhatsApp).
+
+    Returns:
+        LLMProviderConfig ou None se a instância não tem nenhuma
+    """
+    configs = available_configs(evolution_instance)
+    if len(configs) <= 1:
+        INTENT_ROUTES.labels('single', 'single').inc()
+        return next(iter(configs.values()), None)
+
+    label, probability = get_model().predict(message or '')
+    source = 'model'
+    if probability < getattr(settings, 'INTENT_ROUTER_MIN_CONFIDENCE', 0.6) or label not in configs:
+        default = evolution_instance.llm_config if evolution_instance and evolution_instance.llm_config else None
+        try:
+            escalated = classify_with_llm(
+                default or next(iter(configs.values())), message, evolution_instance, user
+            )
+        except Exception as e:
+            logger.error('Erro ao classificar a intenção pelo LLM: %s', e)
+            escalated = None
+        source = 'llm'
+        if escalated in configs:
+            label = escalated
+        elif label not in configs:
+            label = default.config_type if default else next(iter(configs))
+            source = 'default'
+
+    INTENT_ROUTES.labels(label, source).inc()
+    logger.debug('Intenção %s (%s, p=%.2f)', label, source, probability)
+    return configs[label]
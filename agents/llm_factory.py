@@ -0,0 +1,203 @@
+"""
+Clientes LLM e assistants reaproveitados entre mensagens
+Criar um ChatOpenAI/ChatAnthropic/ChatGoogleGenerativeAI a cada mensagem abre
+um pool HTTP novo; o assistant e o grafo compilado também eram refeitos. Aqui
+eles ficam em cache por processo, com a chave (tipo, id da config) e a versão
+`updated_at`: salvar o LLMProviderConfig gera uma versão nova e o signal em
+agents/signals.py descarta as entradas antigas.
+
+O estado de cada usuário não fica no assistant em cache: é injetado na
+invocação com `assistant_state(user=..., message=...)` e lido pelos atributos
+declarados com InvocationAttribute.
+"""
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from langchain_anthropic import ChatAnthropic
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+
+from .fake_llm import FakeChatModel
+from .llm_routing import ProviderRouter
+from .rate_limit import RateLimitedChatModel, get_limiter
+
+logger = logging.getLogger(__name__)
+
+_cache = {}
+_lock = threading.Lock()
+
+_state = contextvars.ContextVar('assistant_state', default={})
+
+
+def build_llm(llm_config, provider=None, model=None, timeout=None, max_retries=None):
+    """
+    Cria o cliente do provedor configurado no LLMProviderConfig, atrás do
+    limite de requisições/tokens compartilhado da chave de API
+    (agents.rate_limit). provider e model substituem os da config
+    (candidatos da fallback_chain); timeout e max_retries só são passados
+    quando informados.
+    """
+    provider = provider or llm_config.name
+    model = model or llm_config.model
+    client = _build_client(llm_config, provider, model, timeout, max_retries)
+
+    # Provedores não reconhecidos usam o cliente (e a chave) da OpenAI. O
+    # falso só tem limites se houver LLM_RATE_LIMITS['fake'] (simular um provedor)
+    if provider not in ('anthropic', 'google', 'fake'):
+        provider = 'openai'
+    api_key = getattr(settings, f'{provider.upper()}_API_KEY', '')
+    return RateLimitedChatModel(client, get_limiter(provider, model, api_key), llm_config.max_tokens, timeout)
+
+
+def _build_client(llm_config, provider, model, timeout, max_retries):
+    limits = {key: value for key, value in (('timeout', timeout), ('max_retries', max_retries)) if value is not None}
+
+    if provider == "openai":
+        return ChatOpenAI(
+            model=model,
+            temperature=llm_config.temperature,
+            max_tokens=llm_config.max_tokens,
+            top_p=llm_config.top_p,
+            presence_penalty=llm_config.presence_penalty,
+            frequency_penalty=llm_config.frequency_penalty,
+            # Uso de tokens também nas respostas em streaming (agents.streaming)
+            stream_usage=True,
+            openai_api_key=getattr(settings, 'OPENAI_API_KEY', ''),
+            **limits
+        )
+    elif provider == "anthropic":
+        return ChatAnthropic(
+            model=model,
+            temperature=llm_config.temperature,
+            max_tokens=llm_config.max_tokens,
+            top_p=llm_config.top_p,
+            anthropic_api_key=getattr(settings, 'ANTHROPIC_API_KEY', ''),
+            **limits
+        )
+    elif provider == "fake":
+        # Testes de carga sem chamar provedor (agents.fake_llm)
+        return FakeChatModel(model_name=model, max_tokens=llm_config.max_tokens or 0)
+    elif provider == "google":
+        return ChatGoogleGenerativeAI(
+            model=model,
+            temperature=llm_config.temperature,
+            max_output_tokens=llm_config.max_tokens,
+            top_p=llm_config.top_p,
+            google_api_key=getattr(settings, 'GOOGLE_API_KEY', ''),
+            **limits
+        )
+    else:
+        # Fallback para OpenAI se provider não reconhecido
+        return ChatOpenAI(
+            model=model,
+            temperature=llm_config.temperature,
+            max_tokens=llm_config.max_tokens,
+            stream_usage=True,
+            openai_api_key=getattr(settings, 'OPENAI_API_KEY', ''),
+            **limits
+        )
+
+
+def build_router(llm_config):
+    """
+    Cliente com failover entre o provedor principal e os da fallback_chain.
+    Sem retries internos: a próxima tentativa é o próximo candidato. Um
+    candidato que não pode ser criado (ex: sem chave de API) fica de fora.
+    """
+    candidates = []
+    for candidate in llm_config.get_candidates():
+        try:
+            llm = build_llm(llm_config, candidate['name'], candidate['model'],
+                            timeout=candidate['timeout'], max_retries=0)
+        except Exception as e:
+            logger.error('Provedor %s/%s da config %s indisponível: %s',
+                         candidate['name'], candidate['model'], llm_config.pk, e)
+            continue
+        candidates.append({'provider': candidate['name'], 'model': candidate['model'], 'llm': llm})
+
+    if not candidates:
+        raise ValueError(f'Nenhum provedor disponível para a config {llm_config.pk}')
+    return ProviderRouter(str(llm_config.pk), candidates)
+
+
+def _cached(kind, llm_config, factory):
+    """Valor em cache para (kind, config), refeito quando o updated_at muda"""
+    key = (kind, str(llm_config.pk))
+    version = llm_config.updated_at
+
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None or entry[0] != version:
+            logger.debug('Criando %s para a config %s', kind, llm_config.pk)
+            entry = _cache[key] = (version, factory())
+    return entry[1]
+
+
+def get_llm(llm_config):
+    """
+    Cliente do provedor compartilhado (mantém o pool de conexões). Configs
+    com fallback_chain recebem um ProviderRouter (agents.llm_routing).
+    """
+    if llm_config.fallback_chain:
+        return _cached('llm', llm_config, lambda: build_router(llm_config))
+    return _cached('llm', llm_config, lambda: build_llm(llm_config, timeout=llm_config.attempt_timeout))
+
+
+def get_assistant(kind, llm_config, factory):
+    """
+    Assistant compartilhado por todos os usuários da config. `factory` cria a
+    instância quando não há uma para a versão atual da config.
+    """
+    return _cached(f'assistant:{kind}', llm_config, factory)
+
+
+def invalidate(config_id):
+    """Descarta os clientes e assistants da config"""
+    config_id = str(config_id)
+    with _lock:
+        for key in [key for key in _cache if key[1] == config_id]:
+            del _cache[key]
+
+
+@contextmanager
+def assistant_state(**values):
+    """
+    Estado da invocação atual (usuário, mensagem). Fica num ContextVar, então
+    vale para a thread/contexto da chamada e para as tools executadas pelo grafo.
+    """
+    token = _state.set(values)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class InvocationAttribute:
+    """
+    Atributo do assistant que usa o valor do assistant_state() em andamento,
+    ou o valor atribuído na instância fora de uma invocação.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        state = _state.get()
+        if self.key in state:
+            return state[self.key]
+        return instance.__dict__.get(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
@@ -0,0 +1,192 @@
+"""
+Failover entre provedores e roteamento pela saúde de cada um
+Um LLMProviderConfig com fallback_chain vira um ProviderRouter: cada chamada
+ao LLM tenta os candidatos (o principal e os da cadeia) do mais saudável para
+o menos saudável, com timeout por tentativa e sem os retries internos do
+cliente. A saúde de cada provedor/modelo (latência média móvel, taxa de erro
+numa janela das últimas chamadas e um circuit breaker) fica em memória no
+processo e vale para todas as configs que usam o mesmo modelo.
+
+O failover é por chamada ao LLM e não por execução do grafo: tools já
+executadas não rodam de novo. A rota usada fica em
+response_metadata['llm_route'] da resposta e é salva no ChatHistory.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+
+from monitoring.metrics import LLM_ATTEMPTS
+from .rate_limit import fail_fast
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTING = {
+    # Chamadas consideradas na taxa de erro: as últimas WINDOW dentro de WINDOW_SECONDS
+    'WINDOW': 20,
+    'WINDOW_SECONDS': 300,
+    # Peso da latência média nova (EWMA)
+    'LATENCY_ALPHA': 0.3,
+    # Falhas seguidas que abrem o circuito e por quanto tempo (s)
+    'CIRCUIT_FAILURES': 3,
+    'CIRCUIT_COOLDOWN': 60,
+    # score = latência × (1 + ERROR_PENALTY × taxa de erro) × (1 + PRIORITY_WEIGHT × posição):
+    # um alternativo só passa na frente do principal sendo bem mais rápido ou confiável
+    'ERROR_PENALTY': 4.0,
+    'PRIORITY_WEIGHT': 0.5,
+    # Fração das chamadas que segue a ordem configurada, para medir de novo
+    # um provedor preterido (sem isso a latência dele nunca se atualiza)
+    'PROBE_RATE': 0.05,
+}
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_ROUTING, **getattr(settings, 'LLM_ROUTING', {})}
+
+
+class ProviderHealth:
+    """Latência e erros recentes de um provedor/modelo"""
+
+    def __init__(self, window):
+        self.latency = None
+        # (instante, sucesso) das últimas chamadas
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def error_rate(self, max_age, now=None):
+        since = (now or time.monotonic()) - max_age
+        recent = [ok for at, ok in self.outcomes if at >= since]
+        if not recent:
+            return 0.0
+        return recent.count(False) / len(recent)
+
+    def is_open(self, now=None):
+        return (now or time.monotonic()) < self.open_until
+
+    def record(self, ok, duration, config):
+        self.outcomes.append((time.monotonic(), ok))
+        if ok:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            alpha = config['LATENCY_ALPHA']
+            self.latency = duration if self.latency is None else alpha * duration + (1 - alpha) * self.latency
+        else:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= config['CIRCUIT_FAILURES']:
+                self.open_until = time.monotonic() + config['CIRCUIT_COOLDOWN']
+
+
+def get_health(provider, model):
+    key = (provider, model)
+    health = _health.get(key)
+    if health is None:
+        with _health_lock:
+            health = _health.setdefault(key, ProviderHealth(get_config()['WINDOW']))
+    return health
+
+
+def rank(candidates, config=None):
+    """
+    Ordena os candidatos do mais saudável para o menos. Sem histórico, um
+    candidato assume a melhor latência conhecida (só a prioridade decide);
+    circuitos abertos vão para o fim, mas ainda servem de último recurso.
+    """
+    config = config or get_config()
+    now = time.monotonic()
+    healths = [get_health(candidate['provider'], candidate['model']) for candidate in candidates]
+    known = [health.latency for health in healths if health.latency is not None]
+    default_latency = min(known) if known else 1.0
+    probe = random.random() < config['PROBE_RATE']
+
+    def score(position):
+        health = healths[position]
+        if health.is_open(now):
+            return math.inf, position
+        if probe:
+            return 0, position
+        latency = health.latency if health.latency is not None else default_latency
+        return (
+            latency
+            * (1 + config['ERROR_PENALTY'] * health.error_rate(config['WINDOW_SECONDS'], now))
+            * (1 + config['PRIORITY_WEIGHT'] * position)
+        ), position
+
+    return [candidates[position] for position in sorted(range(len(candidates)), key=score)]
+
+
+def _outcome(error):
+    return 'timeout' if 'timeout' in type(error).__name__.lower() else 'error'
+
+
+class ProviderRouter(Runnable):
+    """
+    Chat model com failover: expõe invoke() e bind_tools() como os clientes
+    do LangChain e delega ao candidato mais saudável.
+
+    Args:
+        config_id (str): id do LLMProviderConfig (labels das métricas)
+        candidates (list): [{'provider', 'model', 'llm'}] na ordem configurada
+    """
+
+    def __init__(self, config_id, candidates):
+        self.config_id = config_id
+        self.candidates = candidates
+
+    def bind_tools(self, tools, **kwargs):
+        return ProviderRouter(self.config_id, [
+            {**candidate, 'llm': candidate['llm'].bind_tools(tools, **kwargs)}
+            for candidate in self.candidates
+        ])
+
+    def invoke(self, input, config=None, **kwargs):
+        routing = get_config()
+        ranked = rank(self.candidates, routing)
+        failed = []
+        last_error = None
+
+        for index, candidate in enumerate(ranked):
+            provider, model = candidate['provider'], candidate['model']
+            started_at = time.perf_counter()
+            try:
+                # Com outros candidatos restantes, um 429 passa direto ao próximo
+                with fail_fast(index < len(ranked) - 1):
+                    result = candidate['llm'].invoke(input, config, **kwargs)
+            except Exception as e:
+                duration = time.perf_counter() - started_at
+                get_health(provider, model).record(False, duration, routing)
+                LLM_ATTEMPTS.labels(self.config_id, provider, model, _outcome(e)).inc()
+                logger.warning('LLM %s/%s falhou em %.1fs (%s: %s), tentando o próximo',
+                               provider, model, duration, type(e).__name__, e)
+                failed.append({'provider': provider, 'model': model, 'error': type(e).__name__,
+                               'seconds': round(duration, 2)})
+                last_error = e
+                continue
+
+            duration = time.perf_counter() - started_at
+            get_health(provider, model).record(True, duration, routing)
+            LLM_ATTEMPTS.labels(self.config_id, provider, model, 'ok').inc()
+            if failed or candidate is not self.candidates[0]:
+                logger.info('LLM roteado para %s/%s (config %s, falhas: %s)',
+                            provider, model, self.config_id, len(failed))
+
+            if isinstance(result, BaseMessage):
+                result.response_metadata['llm_route'] = {
+                    'provider': provider,
+                    'model': model,
+                    'primary': candidate is self.candidates[0],
+                    'seconds': round(duration, 2),
+                    'failed': failed,
+                }
+            return result
+
+        raise last_error
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from agents import intent_router
+
+
+class Command(BaseCommand):
+    help = 'Offline evaluation of the local intent router with stratified k-fold cross-validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--folds',
+            type=int,
+            default=5,
+            help='Number of cross-validation folds'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=None,
+            help='Confidence below which the message is escalated (default: INTENT_ROUTER_MIN_CONFIDENCE)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50000,
+            help='Most recent chat history entries to read'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the fold assignment'
+        )
+
+    def handle(self, *args, **options):
+        seed_texts, seed_labels = intent_router.seed_examples()
+        texts, labels = intent_router.history_examples(options['limit'])
+        if texts:
+            # Exemplos fixos sempre no treino; a avaliação é sobre o histórico real
+            self.stdout.write(f'Evaluating on {len(texts)} labelled history messages')
+            fixed_texts, fixed_labels = seed_texts, seed_labels
+        else:
+            self.stdout.write(self.style.WARNING('No labelled history yet, evaluating on the seed examples'))
+            texts, labels = seed_texts, seed_labels
+            fixed_texts, fixed_labels = [], []
+
+        threshold = options['threshold']
+        if threshold is None:
+            threshold = getattr(settings, 'INTENT_ROUTER_MIN_CONFIDENCE', 0.6)
+
+        # Folds estratificados: cada rótulo distribuído igualmente
+        rng = np.random.default_rng(options['seed'])
+        folds = np.empty(len(texts), dtype=int)
+        for label in intent_router.LABELS:
+            positions = np.flatnonzero(np.array(labels) == label)
+            rng.shuffle(positions)
+            folds[positions] = np.arange(len(positions)) % options['folds']
+
+        predictions = []
+        elapsed = 0.0
+        for fold in range(options['folds']):
+            train_idx = np.flatnonzero(folds != fold)
+            test_idx = np.flatnonzero(folds == fold)
+            if not len(test_idx):
+                continue
+            model = intent_router.train(
+                fixed_texts + [texts[i] for i in train_idx],
+                fixed_labels + [labels[i] for i in train_idx],
+            )
+            for i in test_idx:
+                started_at = time.perf_counter()
+                predicted, probability = model.predict(texts[i])
+                elapsed += time.perf_counter() - started_at
+                predictions.append((labels[i], predicted, probability))
+
+        self._report(predictions, threshold, elapsed)
+
+    def _report(self, predictions, threshold, elapsed):
+        total = len(predictions)
+        correct = sum(1 for expected, predicted, _ in predictions if expected == predicted)
+        confident = [(e, p) for e, p, probability in predictions if probability >= threshold]
+        confident_correct = sum(1 for e, p in confident if e == p)
+
+        self.stdout.write(f'\nAccuracy: {correct / total:.1%} ({correct}/{total})')
+        self.stdout.write(
+            f'Threshold {threshold:.2f}: {len(confident) / total:.1%} routed locally '
+            f'with {confident_correct / max(len(confident), 1):.1%} accuracy, '
+            f'{1 - len(confident) / total:.1%} escalated to the LLM'
+        )
+        self.stdout.write(f'Prediction latency: {elapsed / total * 1e6:.0f} µs per message\n')
+
+        labels = intent_router.LABELS
+        self.stdout.write(f'{"":>10} {"precision":>10} {"recall":>10} {"f1":>10} {"support":>10}')
+        for label in labels:
+            tp = sum(1 for e, p, _ in predictions if e == label and p == label)
+            predicted = sum(1 for _, p, _ in predictions if p == label)
+            support = sum(1 for e, _, _ in predictions if e == label)
+            precision = tp / predicted if predicted else 0.0
+            recall = tp / support if support else 0.0
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            self.stdout.write(f'{label:>10} {precision:>10.2f} {recall:>10.2f} {f1:>10.2f} {support:>10}')
+
+        self.stdout.write('\nConfusion matrix (rows: expected, columns: predicted)')
+        self.stdout.write(f'{"":>10} ' + ' '.join(f'{label:>10}' for label in labels))
+        for expected in labels:
+            row = [sum(1 for e, p, _ in predictions if e == expected and p == predicted) for predicted in labels]
+            self.stdout.write(f'{expected:>10} ' + ' '.join(f'{count:>10}' for count in row))
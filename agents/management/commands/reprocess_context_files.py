@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from agents.ingestion import claim_stale, get_config, process_context_file
+from agents.models import AssistantContextFile
+
+
+def _process(context_file_id):
+    try:
+        # Reprocessar é refazer a extração, não reaproveitar a guardada
+        return process_context_file(context_file_id, use_cache=False)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Re-extract the content of assistant context files in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=get_config()['WORKERS'],
+            help='Number of files extracted in parallel (each one in its own process)'
+        )
+        parser.add_argument(
+            '--config',
+            type=str,
+            help='Only files of this LLMProviderConfig id'
+        )
+        status = parser.add_mutually_exclusive_group()
+        status.add_argument(
+            '--only-errors',
+            action='store_true',
+            help='Only files whose last extraction failed'
+        )
+        status.add_argument(
+            '--stale',
+            action='store_true',
+            help="Only files stuck in 'processing' (e.g. the worker was restarted mid-extraction)"
+        )
+
+    def handle(self, *args, **options):
+        files = AssistantContextFile.objects.all()
+        if options['config']:
+            files = files.filter(llm_config_id=options['config'])
+        if options['only_errors']:
+            files = files.filter(status='error')
+
+        if options['stale']:
+            # Reivindicados como no recover_stale(), para um worker não pegar o mesmo arquivo
+            ids = claim_stale(files)
+        else:
+            ids = list(files.values_list('pk', flat=True))
+        if not ids:
+            self.stdout.write(self.style.WARNING('No context files to reprocess'))
+            return
+
+        # Cada execução começa com as tentativas zeradas
+        AssistantContextFile.objects.filter(pk__in=ids).update(attempts=0)
+
+        workers = max(1, options['workers'])
+        self.stdout.write(f'Reprocessing {len(ids)} files with {workers} workers...')
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_process, pk): pk for pk in ids}
+            for future in as_completed(futures):
+                try:
+                    context_file = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'❌ {futures[future]}: {e}'))
+                    continue
+
+                if context_file is None:
+                    continue
+                if context_file.status == 'ready':
+                    self.stdout.write(self.style.SUCCESS(f'✅ {context_file.name}'))
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'⚠️ {context_file.name}: {context_file.error_message}'))
+
+        self.stdout.write(f'Done: {len(ids) - failed} ok, {failed} failed')
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from agents import intent_router
+
+
+class Command(BaseCommand):
+    help = 'Train the local intent router from the seed examples and the labelled chat history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50000,
+            help='Most recent chat history entries to read'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Model path (default: INTENT_ROUTER_MODEL_PATH)'
+        )
+
+    def handle(self, *args, **options):
+        texts, labels = intent_router.seed_examples()
+        history_texts, history_labels = intent_router.history_examples(options['limit'])
+        self.stdout.write(
+            f'Training with {len(texts)} seed examples and {len(history_texts)} labelled history messages '
+            f'({", ".join(f"{label}: {history_labels.count(label)}" for label in intent_router.LABELS)})'
+        )
+
+        started_at = time.perf_counter()
+        model = intent_router.train(texts + history_texts, labels + history_labels)
+        path = options['output'] or intent_router.model_path()
+        model.save(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(model.vocabulary)} terms, trained in {time.perf_counter() - started_at:.1f}s, saved to {path}'
+        ))
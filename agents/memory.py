@@ -0,0 +1,184 @@
+"""
+Memória da conversa do assistente
+Mantém no prompt os turnos mais recentes que cabem em CHAT_HISTORY_TOKEN_BUDGET
+(no máximo CHAT_HISTORY_MAX_TURNS), medidos por um estimador local de tokens.
+Os turnos que saem da janela são incorporados, em segundo plano, ao resumo
+incremental guardado em ChatSession.summary; `summary_until` marca até onde o
+histórico já foi resumido.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from monitoring.metrics import record_llm_usage
+from . import usage
+from .llm_factory import get_llm
+from .models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+# Sessões com resumo em andamento neste processo
+_folding = set()
+_folding_lock = threading.Lock()
+
+# Português gera mais tokens por caractere que inglês (~4 chars/token)
+CHARS_PER_TOKEN = 3.5
+
+# Custo fixo por mensagem (papel, separadores) nos formatos dos provedores
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Turnos resumidos por chamada ao LLM (sessões antigas alcançam o resumo aos poucos)
+FOLD_BATCH_SIZE = 20
+
+SUMMARY_PROMPT = (
+    "Você mantém o resumo de uma conversa entre um usuário e um assistente. "
+    "Atualize o resumo atual incorporando as novas mensagens. Preserve fatos, "
+    "pedidos, decisões, valores e datas relevantes; descarte cumprimentos e "
+    "repetições. Responda apenas com o novo resumo, em português, em no máximo "
+    "{max_words} palavras."
+)
+
+
+def estimate_tokens(text):
+    """Estimativa local de tokens (sem tokenizer do provedor)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _turn_contents(entry):
+    # Garante que content e response nunca sejam None
+    return (entry.message.get("content") or "").strip(), (entry.message.get("response") or "").strip()
+
+
+class ConversationMemory:
+    """
+    Janela de mensagens de uma ChatSession. Uso:
+
+        memory = ConversationMemory(chat_session, llm_config)
+        history = memory.load()          # HumanMessage/AIMessage em ordem cronológica
+        memory.summary_section()         # texto para o system prompt
+        memory.schedule_fold()           # após responder, resume o que saiu da janela
+    """
+
+    def __init__(self, chat_session, llm_config, token_budget=None, max_turns=None):
+        self.chat_session = chat_session
+        self.llm_config = llm_config
+        self.token_budget = token_budget or getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 3000)
+        self.max_turns = max_turns or getattr(settings, 'CHAT_HISTORY_MAX_TURNS', 10)
+        self.window_start = None
+        self.has_overflow = False
+
+    def _queryset(self):
+        queryset = ChatHistory.objects.filter(session_id=self.chat_session.from_number, closed=False)
+        if self.chat_session.summary_until:
+            queryset = queryset.filter(created_at__gt=self.chat_session.summary_until)
+        return queryset
+
+    def load(self):
+        """
+        Turnos mais recentes dentro do orçamento, em uma única query limitada
+        (índice session_id, closed, created_at).
+        """
+        # Um turno a mais só para saber se há algo fora da janela
+        entries = list(self._queryset().order_by("-created_at")[:self.max_turns + 1])
+
+        kept = []
+        used_tokens = 0
+        for entry in entries[:self.max_turns]:
+            human_content, ai_response = _turn_contents(entry)
+            tokens = estimate_tokens(human_content) + estimate_tokens(ai_response)
+            # O turno mais recente sempre entra, mesmo acima do orçamento
+            if kept and used_tokens + tokens > self.token_budget:
+                break
+            kept.append(entry)
+            used_tokens += tokens
+
+        self.has_overflow = len(entries) > len(kept)
+        self.window_start = kept[-1].created_at if kept else None
+
+        messages = []
+        for entry in reversed(kept):
+            human_content, ai_response = _turn_contents(entry)
+            if human_content:
+                messages.append(HumanMessage(content=human_content))
+            if ai_response:
+                messages.append(AIMessage(content=ai_response))
+
+        logger.debug('Memória da sessão %s: %s turnos, ~%s tokens, fora da janela: %s',
+                     self.chat_session.pk, len(kept), used_tokens, self.has_overflow)
+        return messages
+
+    def summary_section(self):
+        if not self.chat_session.summary:
+            return ""
+        return f"RESUMO DA CONVERSA ANTERIOR:\n{self.chat_session.summary}"
+
+    def schedule_fold(self):
+        """Resume em segundo plano os turnos que ficaram fora da janela"""
+        if not self.has_overflow or self.window_start is None:
+            return
+        threading.Thread(target=self._fold_in_background, daemon=True).start()
+
+    def _fold_in_background(self):
+        with _folding_lock:
+            if self.chat_session.pk in _folding:
+                return
+            _folding.add(self.chat_session.pk)
+        try:
+            self.fold()
+        except Exception as e:
+            logger.error('Erro ao resumir a conversa da sessão %s: %s', self.chat_session.pk, e)
+        finally:
+            with _folding_lock:
+                _folding.discard(self.chat_session.pk)
+            close_old_connections()
+
+    def fold(self):
+        """
+        Incorpora ao resumo os turnos anteriores à janela atual, do mais
+        antigo para o mais novo, e avança `summary_until`.
+        """
+        entries = list(
+            self._queryset()
+            .filter(created_at__lt=self.window_start)
+            .order_by("created_at")[:FOLD_BATCH_SIZE]
+        )
+        if not entries:
+            return
+
+        lines = []
+        for entry in entries:
+            human_content, ai_response = _turn_contents(entry)
+            if human_content:
+                lines.append(f"Usuário: {human_content}")
+            if ai_response:
+                lines.append(f"Assistente: {ai_response}")
+
+        max_tokens = getattr(settings, 'CHAT_SUMMARY_MAX_TOKENS', 400)
+        messages = [
+            SystemMessage(content=SUMMARY_PROMPT.format(max_words=int(max_tokens * 0.7))),
+            HumanMessage(content=(
+                f"Resumo atual:\n{self.chat_session.summary or '(vazio)'}\n\n"
+                f"Novas mensagens:\n" + "\n".join(lines)
+            )),
+        ]
+
+        started_at = time.perf_counter()
+        result = get_llm(self.llm_config).invoke(messages)
+        duration = time.perf_counter() - started_at
+        totals = record_llm_usage(self.llm_config, [result], duration)
+        usage.record(usage.build_usage(self.llm_config, [result], totals, duration),
+                     self.llm_config, user=self.chat_session.owner_id,
+                     evolution_instance=self.chat_session.evolution_instance_id)
+
+        summary = result.content if isinstance(result.content, str) else str(result.content)
+        self.chat_session.summary = summary.strip()
+        self.chat_session.summary_until = entries[-1].created_at
+        self.chat_session.save(update_fields=['summary', 'summary_until', 'updated_at'])
+        logger.info('Resumo da sessão %s atualizado com %s turnos', self.chat_session.pk, len(entries))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_historicalllmproviderconfig_config_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chathistory',
+            index=models.Index(fields=['session_id', 'closed', 'created_at'], name='chathistory_session_window'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_chathistory_chathistory_session_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assistantcontextfile',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas de processamento'),
+        ),
+        migrations.AddField(
+            model_name='assistantcontextfile',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Início do processamento'),
+        ),
+        migrations.AddField(
+            model_name='assistantcontextfile',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Andamento da extração do conteúdo (agents.ingestion)', verbose_name='Progresso (%)'),
+        ),
+        migrations.AddField(
+            model_name='historicalassistantcontextfile',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas de processamento'),
+        ),
+        migrations.AddField(
+            model_name='historicalassistantcontextfile',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Início do processamento'),
+        ),
+        migrations.AddField(
+            model_name='historicalassistantcontextfile',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Andamento da extração do conteúdo (agents.ingestion)', verbose_name='Progresso (%)'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:49
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0005_assistantcontextfile_attempts_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedContent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('extracted_text', models.TextField(verbose_name='Texto extraído')),
+                ('file_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho do arquivo (bytes)')),
+                ('provider_file_ids', models.JSONField(blank=True, default=dict, help_text='ID do arquivo já enviado a cada provedor, ex: {"openai": "file-..."}', verbose_name='IDs nos provedores')),
+            ],
+            options={
+                'verbose_name': 'Conteúdo Extraído',
+                'verbose_name_plural': 'Conteúdos Extraídos',
+            },
+        ),
+        migrations.AddField(
+            model_name='assistantcontextfile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 do arquivo, chave de ExtractedContent', max_length=64, null=True, verbose_name='Hash do conteúdo'),
+        ),
+        migrations.AddField(
+            model_name='historicalassistantcontextfile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 do arquivo, chave de ExtractedContent', max_length=64, null=True, verbose_name='Hash do conteúdo'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0006_extractedcontent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalllmproviderconfig',
+            name='attempt_timeout',
+            field=models.PositiveIntegerField(default=30, help_text='Prazo de cada chamada ao provedor antes de passar ao próximo da cadeia', verbose_name='Timeout por tentativa (s)'),
+        ),
+        migrations.AddField(
+            model_name='historicalllmproviderconfig',
+            name='fallback_chain',
+            field=models.JSONField(blank=True, default=list, help_text='Usados em ordem quando o principal falha ou está lento (agents.llm_routing). Ex: [{"name": "anthropic", "model": "claude-3-5-haiku-latest"}, {"name": "google", "model": "gemini-1.5-flash", "timeout": 20}]', verbose_name='Provedores alternativos'),
+        ),
+        migrations.AddField(
+            model_name='llmproviderconfig',
+            name='attempt_timeout',
+            field=models.PositiveIntegerField(default=30, help_text='Prazo de cada chamada ao provedor antes de passar ao próximo da cadeia', verbose_name='Timeout por tentativa (s)'),
+        ),
+        migrations.AddField(
+            model_name='llmproviderconfig',
+            name='fallback_chain',
+            field=models.JSONField(blank=True, default=list, help_text='Usados em ordem quando o principal falha ou está lento (agents.llm_routing). Ex: [{"name": "anthropic", "model": "claude-3-5-haiku-latest"}, {"name": "google", "model": "gemini-1.5-flash", "timeout": 20}]', verbose_name='Provedores alternativos'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:08
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0007_llmproviderconfig_fallback_chain'),
+        ('whatsapp_connector', '0005_chatsession_summary_chatsession_summary_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsageDaily',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('key', models.CharField(editable=False, max_length=255, unique=True)),
+                ('date', models.DateField(db_index=True, verbose_name='Data')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='Chamadas')),
+                ('input_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de entrada')),
+                ('output_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de saída')),
+                ('cache_read_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens lidos do cache')),
+                ('cache_creation_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens gravados no cache')),
+                ('latency_ms', models.PositiveBigIntegerField(default=0, verbose_name='Latência total (ms)')),
+                ('cost', models.DecimalField(decimal_places=6, default=0, help_text='Estimado pelos preços de LLM_PRICES', max_digits=12, verbose_name='Custo (US$)')),
+                ('evolution_instance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='whatsapp_connector.evolutioninstance', verbose_name='Instância')),
+                ('llm_config', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage', to='agents.llmproviderconfig', verbose_name='Configuração LLM')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Consumo de LLM (diário)',
+                'verbose_name_plural': 'Consumo de LLM (diário)',
+                'ordering': ['-date', '-cost'],
+                'indexes': [models.Index(fields=['user', 'date'], name='llmusagedaily_user_date')],
+            },
+        ),
+    ]
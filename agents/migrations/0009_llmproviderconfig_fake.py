@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0008_llmusagedaily'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalllmproviderconfig',
+            name='name',
+            field=models.CharField(choices=[('openai', 'OpenAI'), ('anthropic', 'Anthropic'), ('google', 'Google DeepMind'), ('mistral', 'Mistral AI'), ('cohere', 'Cohere'), ('meta', 'Meta (LLaMA)'), ('xai', 'xAI (Grok)'), ('other', 'Outro'), ('fake', 'Simulado (testes de carga)')], default='openai', max_length=50, verbose_name='Fornecedor LLM'),
+        ),
+        migrations.AlterField(
+            model_name='llmproviderconfig',
+            name='name',
+            field=models.CharField(choices=[('openai', 'OpenAI'), ('anthropic', 'Anthropic'), ('google', 'Google DeepMind'), ('mistral', 'Mistral AI'), ('cohere', 'Cohere'), ('meta', 'Meta (LLaMA)'), ('xai', 'xAI (Grok)'), ('other', 'Outro'), ('fake', 'Simulado (testes de carga)')], default='openai', max_length=50, verbose_name='Fornecedor LLM'),
+        ),
+    ]
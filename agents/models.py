@@ -74,6 +74,22 @@ class AssistantContextFile(BaseUUIDModel, HistoryBaseModel):
         blank=True, null=True,
         verbose_name="Mensagem de erro"
     )
+
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Progresso (%)",
+        help_text="Andamento da extração do conteúdo (agents.ingestion)"
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Tentativas de processamento"
+    )
+
+    processing_started_at = models.DateTimeField(
+        blank=True, null=True,
+        verbose_name="Início do processamento"
+    )
     
     file_size = models.PositiveIntegerField(
         blank=True, null=True,
@@ -93,6 +109,14 @@ class AssistantContextFile(BaseUUIDModel, HistoryBaseModel):
         help_text="ID do arquivo na OpenAI Files API (para PDFs)"
     )
 
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True, null=True,
+        db_index=True,
+        verbose_name="Hash do conteúdo",
+        help_text="SHA-256 do arquivo, chave de ExtractedContent"
+    )
+
     class Meta:
         verbose_name = "Arquivo de Contexto"
         verbose_name_plural = "Arquivos de Contexto"
@@ -120,6 +144,42 @@ class AssistantContextFile(BaseUUIDModel, HistoryBaseModel):
             return f"{size / (1024 * 1024):.1f} MB"
 
 
+class ExtractedContent(BaseUUIDModel):
+    """
+    Resultado da extração de um arquivo, compartilhado por todos os
+    AssistantContextFile com o mesmo conteúdo (mesmo SHA-256), de qualquer
+    configuração LLM
+    """
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="SHA-256"
+    )
+
+    extracted_text = models.TextField(
+        verbose_name="Texto extraído"
+    )
+
+    file_size = models.PositiveIntegerField(
+        blank=True, null=True,
+        verbose_name="Tamanho do arquivo (bytes)"
+    )
+
+    provider_file_ids = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="IDs nos provedores",
+        help_text="ID do arquivo já enviado a cada provedor, ex: {\"openai\": \"file-...\"}"
+    )
+
+    class Meta:
+        verbose_name = "Conteúdo Extraído"
+        verbose_name_plural = "Conteúdos Extraídos"
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({len(self.extracted_text)} caracteres)"
+
+
 class LLMProviderConfig(BaseUUIDModel, HistoryBaseModel):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
@@ -137,6 +197,7 @@ class LLMProviderConfig(BaseUUIDModel, HistoryBaseModel):
         ("meta", "Meta (LLaMA)"),
         ("xai", "xAI (Grok)"),
         ("other", "Outro"),
+        ("fake", "Simulado (testes de carga)"),
     )
 
     CONFIG_TYPES = (
@@ -196,10 +257,49 @@ class LLMProviderConfig(BaseUUIDModel, HistoryBaseModel):
         default=0.0,
         verbose_name="Penalidade de frequência"
     )
+    fallback_chain = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Provedores alternativos",
+        help_text='Usados em ordem quando o principal falha ou está lento (agents.llm_routing). '
+                  'Ex: [{"name": "anthropic", "model": "claude-3-5-haiku-latest"}, '
+                  '{"name": "google", "model": "gemini-1.5-flash", "timeout": 20}]'
+    )
+    attempt_timeout = models.PositiveIntegerField(
+        default=30,
+        verbose_name="Timeout por tentativa (s)",
+        help_text="Prazo de cada chamada ao provedor antes de passar ao próximo da cadeia"
+    )
 
     def __str__(self):
         return self.display_name if self.display_name else f"{self.get_name_display()} - {self.model}"
 
+    def clean(self):
+        """Valida a cadeia de provedores alternativos"""
+        if not isinstance(self.fallback_chain, list):
+            raise ValidationError({"fallback_chain": "A cadeia deve ser uma lista JSON."})
+
+        providers = dict(self.PROVIDERS)
+        for position, entry in enumerate(self.fallback_chain, 1):
+            if not isinstance(entry, dict) or not entry.get("model"):
+                raise ValidationError({"fallback_chain": f"Item {position}: informe name e model."})
+            if entry.get("name") not in providers:
+                raise ValidationError({"fallback_chain": f"Item {position}: fornecedor '{entry.get('name')}' inválido."})
+            timeout = entry.get("timeout")
+            if timeout is not None and (not isinstance(timeout, (int, float)) or timeout <= 0):
+                raise ValidationError({"fallback_chain": f"Item {position}: timeout deve ser um número positivo."})
+
+    def get_candidates(self):
+        """Provedor principal seguido dos alternativos: [{'name', 'model', 'timeout'}]"""
+        candidates = [{"name": self.name, "model": self.model, "timeout": self.attempt_timeout}]
+        for entry in self.fallback_chain or []:
+            candidates.append({
+                "name": entry["name"],
+                "model": entry["model"],
+                "timeout": entry.get("timeout") or self.attempt_timeout,
+            })
+        return candidates
+
 
 
 class ChatHistory(models.Model):
@@ -215,6 +315,10 @@ class ChatHistory(models.Model):
         verbose_name = "Histórico de Chat"
         verbose_name_plural = "Históricos de Chat"
         ordering = ["-created_at"]
+        indexes = [
+            # Janela da conversa: agents.memory.ConversationMemory.load()
+            models.Index(fields=["session_id", "closed", "created_at"], name="chathistory_session_window"),
+        ]
 
     session_id = models.CharField(
         max_length=255,
@@ -332,3 +436,78 @@ class ChatHistory(models.Model):
         #     if missing:
         #         raise ValidationError({"message": f"Mensagem de IA faltando campos: {', '.join(missing)}"})
 
+
+
+class LLMUsageDaily(BaseUUIDModel):
+    """
+    Consumo de LLM acumulado por dia, usuário, instância, configuração e
+    modelo (agents.usage). Incrementado a cada chamada; `key` identifica a
+    combinação (as FKs podem ser nulas, e NULL não conta como repetido em
+    constraints unique).
+    """
+    key = models.CharField(
+        max_length=255,
+        unique=True,
+        editable=False
+    )
+    date = models.DateField(
+        db_index=True,
+        verbose_name="Data"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Usuário"
+    )
+    evolution_instance = models.ForeignKey(
+        'whatsapp_connector.EvolutionInstance',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Instância"
+    )
+    llm_config = models.ForeignKey(
+        LLMProviderConfig,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='usage',
+        verbose_name="Configuração LLM"
+    )
+    model = models.CharField(
+        max_length=100,
+        verbose_name="Modelo"
+    )
+    requests = models.PositiveIntegerField(default=0, verbose_name="Chamadas")
+    input_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Tokens de entrada")
+    output_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Tokens de saída")
+    cache_read_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Tokens lidos do cache")
+    cache_creation_tokens = models.PositiveBigIntegerField(default=0, verbose_name="Tokens gravados no cache")
+    latency_ms = models.PositiveBigIntegerField(default=0, verbose_name="Latência total (ms)")
+    cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        verbose_name="Custo (US$)",
+        help_text="Estimado pelos preços de LLM_PRICES"
+    )
+
+    class Meta:
+        verbose_name = "Consumo de LLM (diário)"
+        verbose_name_plural = "Consumo de LLM (diário)"
+        ordering = ["-date", "-cost"]
+        indexes = [
+            # Cota diária: agents.usage.quota_exceeded()
+            models.Index(fields=["user", "date"], name="llmusagedaily_user_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.model}: {self.total_tokens} tokens"
+
+    @property
+    def total_tokens(self):
+        return self.input_tokens + self.output_tokens
@@ -0,0 +1,104 @@
+"""
+Montagem do prompt na ordem favorável ao cache de prefixo dos provedores
+Do mais estável para o mais volátil: instruções fixas, arquivos de contexto,
+catálogos do usuário, contexto da sessão, histórico e, por último, o que muda
+a cada mensagem (trechos recuperados e a data/hora), junto da mensagem atual.
+A OpenAI cacheia automaticamente prefixos idênticos; para a Anthropic são
+emitidos breakpoints explícitos (cache_control) no fim de cada camada estável
+e no fim do histórico.
+"""
+from django.utils import timezone
+from langchain_core.messages import HumanMessage, SystemMessage
+
+# Seções do system prompt e a camada de estabilidade de cada uma:
+# 0 = igual para todos os usuários da config, 1 = por usuário, 2 = por conversa
+SECTION_TIERS = {
+    'instructions': 0,
+    'context_files': 0,
+    'catalogue': 1,
+    'session': 2,
+}
+
+# Seções que mudam a cada mensagem (trechos recuperados dos arquivos de
+# contexto, categorias selecionadas para a mensagem): vão junto da mensagem
+# atual, depois do histórico e sem breakpoint
+MESSAGE_SECTIONS = ('retrieved', 'categories')
+
+EPHEMERAL = {'type': 'ephemeral'}
+
+
+def current_timestamp(now=None):
+    return (now or timezone.localtime()).strftime('%d/%m/%Y %H:%M')
+
+
+def _ordered_sections(sections, names=SECTION_TIERS):
+    parts = [(name, (sections.get(name) or '').strip()) for name in names]
+    return [(name, text) for name, text in parts if text]
+
+
+def render_text(sections, now=None):
+    """System prompt em texto plano, com a data/hora no final"""
+    parts = _ordered_sections(sections) + _ordered_sections(sections, MESSAGE_SECTIONS)
+    body = "\n\n".join(text for _, text in parts)
+    return f"{body}\n\nData e hora atual: {current_timestamp(now)}"
+
+
+def _system_message(sections, cache_breakpoints):
+    parts = _ordered_sections(sections)
+    if not cache_breakpoints:
+        return SystemMessage(content="\n\n".join(text for _, text in parts))
+
+    # Um bloco por seção; o breakpoint fica no último bloco de cada camada
+    blocks = []
+    for index, (name, text) in enumerate(parts):
+        block = {'type': 'text', 'text': text}
+        next_name = parts[index + 1][0] if index + 1 < len(parts) else None
+        if next_name is None or SECTION_TIERS[next_name] != SECTION_TIERS[name]:
+            block['cache_control'] = EPHEMERAL
+        blocks.append(block)
+    return SystemMessage(content=blocks)
+
+
+def _with_cache_breakpoint(message):
+    if not isinstance(message.content, str) or not message.content.strip():
+        return message
+    block = {'type': 'text', 'text': message.content, 'cache_control': EPHEMERAL}
+    return message.model_copy(update={'content': [block]})
+
+
+def build_messages(sections, history, message, provider=None, now=None):
+    """
+    Lista de mensagens para o modelo.
+
+    Args:
+        sections (dict): texto de cada seção de SECTION_TIERS e MESSAGE_SECTIONS (as vazias são omitidas)
+        history (list): HumanMessage/AIMessage anteriores, em ordem cronológica
+        message (str): mensagem atual do usuário
+        provider (str): LLMProviderConfig.name; 'anthropic' recebe breakpoints
+    """
+    cache_breakpoints = provider == 'anthropic'
+
+    messages = [_system_message(sections, cache_breakpoints), *history]
+    if cache_breakpoints and history:
+        # Na próxima mensagem da conversa, tudo até aqui é lido do cache
+        messages[-1] = _with_cache_breakpoint(messages[-1])
+
+    # O que muda a cada chamada vai junto da mensagem atual, fora do prefixo
+    parts = [message, *(text for _, text in _ordered_sections(sections, MESSAGE_SECTIONS))]
+    parts.append(f"(Data e hora atual: {current_timestamp(now)})")
+    messages.append(HumanMessage(content="\n\n".join(parts)))
+    return messages
+
+
+class LayeredPromptMixin:
+    """
+    Para AIAssistants: as subclasses informam as seções do prompt em
+    get_prompt_sections(). O get_instructions() continua disponível em texto
+    plano para quem usa o grafo padrão do django-ai-assistant.
+    """
+
+    def get_prompt_sections(self):
+        return {'instructions': self.instructions}
+
+    def get_instructions(self):
+        return render_text(self.get_prompt_sections())
@@ -0,0 +1,322 @@
+"""
+Limite de requisições, tokens e chamadas simultâneas por provedor LLM
+Em rajadas, todos os workers do gunicorn chamavam o provedor ao mesmo tempo e
+recebiam 429. Aqui cada chave de API + modelo tem dois token buckets
+(requisições/min e tokens/min) e um semáforo de chamadas simultâneas,
+compartilhados entre os processos da máquina por arquivos com flock em
+LLM_RATE_LIMIT_DIR. Sem capacidade, a chamada espera na fila até o prazo
+LLM_RATE_LIMIT_MAX_WAIT (ou o timeout da tentativa, se menor) em vez de
+falhar; um 429 bloqueia a chave pelo Retry-After informado pelo provedor.
+Dentro de fail_fast() (ProviderRouter com outros candidatos restantes) o 429
+é levantado na hora, para o failover não esperar pelo Retry-After.
+"""
+import contextvars
+import email.utils
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+
+from monitoring.metrics import LLM_RATE_LIMIT_WAIT, LLM_RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Sem Retry-After na resposta (ex: Google), espera padrão após um 429
+DEFAULT_RETRY_AFTER = 5
+# Estimativa local de tokens, a mesma proporção de agents.memory
+CHARS_PER_TOKEN = 4
+
+_limiters = {}
+
+_fail_fast = contextvars.ContextVar('rate_limit_fail_fast', default=False)
+
+
+class RateLimitTimeout(Exception):
+    """A chamada não conseguiu capacidade dentro do prazo"""
+
+
+def get_limits(provider, model):
+    """Limites de LLM_RATE_LIMITS: 'provedor/modelo' sobrepõe 'provedor'"""
+    limits = getattr(settings, 'LLM_RATE_LIMITS', {})
+    return {
+        'RPM': None, 'TPM': None, 'CONCURRENCY': None,
+        **limits.get(provider, {}),
+        **limits.get(f'{provider}/{model}', {}),
+    }
+
+
+def get_limiter(provider, model, api_key):
+    """Limiter compartilhado da chave de API + modelo"""
+    key = (provider, model, api_key)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = SharedRateLimiter(provider, model, api_key)
+    return limiter
+
+
+def retry_after(headers, default=DEFAULT_RETRY_AFTER):
+    """Segundos de Retry-After (segundos ou data HTTP; retry-after-ms da OpenAI)"""
+    if not headers:
+        return default
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return default
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def is_rate_limited(error):
+    """429 do SDK da OpenAI/Anthropic ou ResourceExhausted do Google"""
+    return (
+        getattr(error, 'status_code', None) == 429
+        or getattr(error, 'code', None) == 429
+        or type(error).__name__ in ('RateLimitError', 'ResourceExhausted')
+    )
+
+
+def estimate_tokens(messages):
+    """Tokens de entrada estimados de uma lista de mensagens ou texto"""
+    if isinstance(messages, str):
+        return len(messages) // CHARS_PER_TOKEN
+    if hasattr(messages, 'to_messages'):
+        messages = messages.to_messages()
+    return sum(len(str(message.content if isinstance(message, BaseMessage) else message))
+               for message in messages) // CHARS_PER_TOKEN
+
+
+class Permit:
+    """Capacidade concedida por SharedRateLimiter.acquire()"""
+
+    def __init__(self, limiter, tokens, slot):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.slot = slot
+
+    def release(self, used_tokens=None):
+        """Devolve o slot e acerta o bucket de tokens com o uso real"""
+        if self.slot is not None:
+            fcntl.flock(self.slot, fcntl.LOCK_UN)
+            self.slot.close()
+            self.slot = None
+        if used_tokens is not None and used_tokens != self.tokens:
+            self.limiter.adjust(self.tokens - used_tokens)
+            self.tokens = used_tokens
+
+
+class SharedRateLimiter:
+    """
+    Token buckets e semáforo de uma chave de API + modelo, com o estado num
+    arquivo JSON travado por flock (vale para todos os processos da máquina).
+    """
+
+    def __init__(self, provider, model, api_key):
+        self.provider = provider
+        self.model = model
+        limits = get_limits(provider, model)
+        self.rpm = limits['RPM']
+        self.tpm = limits['TPM']
+        self.concurrency = limits['CONCURRENCY']
+
+        directory = getattr(settings, 'LLM_RATE_LIMIT_DIR', '/tmp/vision8-rate-limits')
+        os.makedirs(directory, exist_ok=True)
+        # A chave de API não vai para o disco, só um hash dela
+        key_hash = hashlib.sha256((api_key or '').encode()).hexdigest()[:12]
+        safe_model = re.sub(r'[^\w.-]', '_', model)
+        self.path = os.path.join(directory, f'{provider}-{safe_model}-{key_hash}')
+
+    @contextmanager
+    def _state(self):
+        """Estado dos buckets com o arquivo travado; gravado na saída"""
+        with open(f'{self.path}.json', 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read()
+                now = time.time()
+                state = json.loads(content) if content else {
+                    'requests': self.rpm or 0, 'tokens': self.tpm or 0, 'updated': now, 'blocked_until': 0,
+                }
+                # Reposição contínua proporcional ao tempo desde a última leitura
+                elapsed = max(now - state['updated'], 0)
+                if self.rpm:
+                    state['requests'] = min(self.rpm, state['requests'] + elapsed * self.rpm / 60)
+                if self.tpm:
+                    state['tokens'] = min(self.tpm, state['tokens'] + elapsed * self.tpm / 60)
+                state['updated'] = now
+
+                yield state
+
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _reserve(self, tokens):
+        """Consome 1 requisição e `tokens` se houver; senão retorna a espera (s)"""
+        with self._state() as state:
+            wait = state['blocked_until'] - state['updated']
+            if wait > 0:
+                return wait
+            waits = [0.0]
+            if self.rpm:
+                waits.append((1 - state['requests']) * 60 / self.rpm)
+            if self.tpm:
+                waits.append((tokens - state['tokens']) * 60 / self.tpm)
+            wait = max(waits)
+            if wait <= 0:
+                if self.rpm:
+                    state['requests'] -= 1
+                if self.tpm:
+                    state['tokens'] -= tokens
+            return wait
+
+    def _take_slot(self):
+        """Trava um dos arquivos de slot livres (liberado até se o processo morrer)"""
+        for index in range(self.concurrency):
+            slot = open(f'{self.path}.slot{index}', 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except BlockingIOError:
+                slot.close()
+        return None
+
+    def acquire(self, tokens, deadline):
+        """
+        Espera capacidade para uma chamada de ~`tokens` tokens até `deadline`
+        (time.monotonic()). Levanta RateLimitTimeout se o prazo não basta.
+        """
+        if self.tpm:
+            # Uma chamada maior que o bucket inteiro nunca caberia
+            tokens = min(tokens, self.tpm)
+        started_at = time.monotonic()
+
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                break
+            if time.monotonic() + wait > deadline:
+                LLM_RATE_LIMITED.labels(self.provider, self.model, 'timeout').inc()
+                raise RateLimitTimeout(f'{self.provider}/{self.model}: sem capacidade em {wait:.1f}s')
+            # Acorda antes para disputar com os outros processos na fila
+            time.sleep(min(wait, 1.0) * random.uniform(0.8, 1.0))
+
+        slot = None
+        if self.concurrency:
+            while (slot := self._take_slot()) is None:
+                if time.monotonic() > deadline:
+                    self.adjust(tokens, requests=1)
+                    LLM_RATE_LIMITED.labels(self.provider, self.model, 'timeout').inc()
+                    raise RateLimitTimeout(f'{self.provider}/{self.model}: {self.concurrency} chamadas em andamento')
+                time.sleep(random.uniform(0.05, 0.2))
+
+        waited = time.monotonic() - started_at
+        LLM_RATE_LIMIT_WAIT.labels(self.provider, self.model).observe(waited)
+        if waited > 1:
+            logger.info('Chamada a %s/%s esperou %.1fs pelo limite do provedor', self.provider, self.model, waited)
+        return Permit(self, tokens, slot)
+
+    def adjust(self, tokens, requests=0):
+        """Devolve (positivo) ou cobra (negativo) tokens e requisições do bucket"""
+        with self._state() as state:
+            if self.tpm:
+                state['tokens'] = min(self.tpm, state['tokens'] + tokens)
+            if self.rpm:
+                state['requests'] = min(self.rpm, state['requests'] + requests)
+
+    def block(self, seconds):
+        """Suspende a chave por `seconds` (Retry-After de um 429)"""
+        LLM_RATE_LIMITED.labels(self.provider, self.model, '429').inc()
+        with self._state() as state:
+            state['blocked_until'] = max(state['blocked_until'], state['updated'] + seconds)
+        logger.warning('429 de %s/%s, aguardando %.1fs', self.provider, self.model, seconds)
+
+
+def max_wait():
+    return getattr(settings, 'LLM_RATE_LIMIT_MAX_WAIT', 20)
+
+
+@contextmanager
+def fail_fast(enabled=True):
+    """Num 429, levanta o erro em vez de voltar para a fila da chave"""
+    token = _fail_fast.set(enabled)
+    try:
+        yield
+    finally:
+        _fail_fast.reset(token)
+
+
+class RateLimitedChatModel(Runnable):
+    """
+    Chat model do LangChain atrás do SharedRateLimiter: expõe invoke() e
+    bind_tools(); o resto é delegado ao cliente. Um 429 bloqueia a chave pelo
+    Retry-After e a chamada volta para a fila enquanto houver prazo.
+
+    Args:
+        llm: cliente (ChatOpenAI, ChatAnthropic, ...) ou o resultado de bind_tools
+        limiter (SharedRateLimiter): limiter da chave de API + modelo
+        max_output_tokens (int): tokens de saída reservados por chamada
+        timeout (int): timeout da tentativa (s); limita a espera na fila
+    """
+
+    def __init__(self, llm, limiter, max_output_tokens=0, timeout=None):
+        self.llm = llm
+        self.limiter = limiter
+        self.max_output_tokens = max_output_tokens or 0
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        if name == 'llm':
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def bind_tools(self, tools, **kwargs):
+        return RateLimitedChatModel(
+            self.llm.bind_tools(tools, **kwargs), self.limiter, self.max_output_tokens, self.timeout
+        )
+
+    def invoke(self, input, config=None, **kwargs):
+        wait = max_wait() if self.timeout is None else min(max_wait(), self.timeout)
+        deadline = time.monotonic() + wait
+        tokens = estimate_tokens(input) + self.max_output_tokens
+
+        while True:
+            permit = self.limiter.acquire(tokens, deadline)
+            try:
+                result = self.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                permit.release()
+                if not is_rate_limited(e):
+                    raise
+                delay = retry_after(getattr(getattr(e, 'response', None), 'headers', None))
+                self.limiter.block(delay)
+                if _fail_fast.get() or time.monotonic() + delay > deadline:
+                    raise
+                continue
+
+            usage = getattr(result, 'usage_metadata', None) or {}
+            permit.release(usage.get('total_tokens'))
+            return result
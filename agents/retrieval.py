@@ -0,0 +1,357 @@
+"""
+Índice BM25 dos arquivos de contexto de cada LLMProviderConfig
+Quando um arquivo é processado, o conteúdo extraído de todos os arquivos
+ativos da config é dividido em trechos e indexado. A matriz de pesos BM25
+(trechos x termos, esparsa em CSC) e os textos ficam em CONTEXT_INDEX_DIR e
+são abertos com memory-map, então bases grandes não ocupam a memória do worker.
+
+Na consulta, os trechos mais relevantes para a mensagem entram no prompt até
+CONTEXT_RETRIEVAL_TOKEN_BUDGET. Bases que cabem inteiras no orçamento
+continuam indo completas (e estáveis, para o cache de prefixo).
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from scipy import sparse
+
+from .memory import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STEM_LENGTH = 6
+
+STOPWORDS = {
+    'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma', 'uns', 'umas',
+    'com', 'por', 'para', 'pra', 'pro', 'que', 'os', 'as', 'ao', 'aos', 'se', 'ou', 'mas', 'como',
+    'the', 'and', 'of', 'to', 'in', 'is', 'for', 'on',
+}
+
+CURRENT_FILE = 'CURRENT'
+
+# Idade mínima para remover versões antigas do índice
+STALE_VERSION_SECONDS = 10 * 60
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+# Configs com reconstrução do índice agendada neste processo
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return [token[:STEM_LENGTH] for token in re.findall(r'[a-z0-9]+', text)
+            if len(token) >= 2 and token not in STOPWORDS]
+
+
+def chunk_text(text, chunk_tokens=None, overlap_tokens=None):
+    """
+    Divide o texto em trechos de ~chunk_tokens, quebrando em parágrafos
+    sempre que possível; parágrafos maiores que o trecho são fatiados por
+    palavras com sobreposição.
+    """
+    chunk_tokens = chunk_tokens or getattr(settings, 'CONTEXT_CHUNK_TOKENS', 300)
+    overlap_tokens = overlap_tokens if overlap_tokens is not None else chunk_tokens // 6
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in re.split(r'\n\s*\n', text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+
+        if tokens > chunk_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            words = paragraph.split()
+            # Palavras por trecho, pela mesma estimativa de caracteres/token
+            per_chunk = max(1, int(len(words) * chunk_tokens / tokens))
+            step = max(1, per_chunk - int(len(words) * overlap_tokens / tokens))
+            for start in range(0, len(words), step):
+                chunks.append(" ".join(words[start:start + per_chunk]))
+                if start + per_chunk >= len(words):
+                    break
+            continue
+
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _config_dir(config_id):
+    return os.path.join(settings.CONTEXT_INDEX_DIR, str(config_id))
+
+
+def build_index(llm_config_id):
+    """
+    (Re)constrói o índice da config com os arquivos ativos e prontos.
+    A versão nova é gravada num diretório próprio e publicada trocando o
+    arquivo CURRENT, sem afetar leitores da versão anterior.
+    """
+    from .models import AssistantContextFile
+
+    files = (
+        AssistantContextFile.objects
+        .filter(llm_config_id=llm_config_id, is_active=True, status='ready')
+        .exclude(extracted_content__isnull=True)
+        .order_by('name')
+        .only('name', 'extracted_content')
+    )
+
+    sources, chunk_sources, texts = [], [], []
+    for context_file in files.iterator():
+        for chunk in chunk_text(context_file.extracted_content):
+            chunk_sources.append(len(sources))
+            texts.append(chunk)
+        sources.append(context_file.name)
+
+    base_dir = _config_dir(llm_config_id)
+    version = uuid.uuid4().hex
+    version_dir = os.path.join(base_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for row, text in enumerate(texts):
+        term_counts = {}
+        for token in tokenize(text):
+            term_counts[token] = term_counts.get(token, 0) + 1
+        lengths[row] = sum(term_counts.values())
+        for token, count in term_counts.items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+            counts.append(count)
+
+    tf = sparse.csc_matrix(
+        (np.asarray(counts, dtype=np.float32), (rows, cols)),
+        shape=(len(texts), len(vocabulary)), dtype=np.float32,
+    )
+
+    # Pesos BM25 pré-calculados: na consulta basta somar as colunas dos termos
+    document_frequency = np.diff(tf.indptr).astype(np.float32)
+    idf = np.log(1 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5))
+    average_length = float(lengths.mean()) if len(texts) else 0.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (average_length or 1))
+    weights = tf.copy()
+    weights.data = (
+        tf.data * (BM25_K1 + 1) / (tf.data + norm[tf.indices])
+        * np.repeat(idf, np.diff(tf.indptr))
+    ).astype(np.float32)
+
+    np.save(os.path.join(version_dir, 'data.npy'), weights.data)
+    np.save(os.path.join(version_dir, 'indices.npy'), weights.indices.astype(np.int32))
+    np.save(os.path.join(version_dir, 'indptr.npy'), weights.indptr.astype(np.int64))
+
+    offsets = [0]
+    with open(os.path.join(version_dir, 'chunks.txt'), 'wb') as handle:
+        for text in texts:
+            data = text.encode('utf-8')
+            handle.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(os.path.join(version_dir, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(version_dir, 'sources.npy'), np.asarray(chunk_sources, dtype=np.int32))
+    np.save(os.path.join(version_dir, 'tokens.npy'),
+            np.asarray([estimate_tokens(text) for text in texts], dtype=np.int32))
+
+    with open(os.path.join(version_dir, 'meta.json'), 'w', encoding='utf-8') as handle:
+        json.dump({'sources': sources, 'vocabulary': vocabulary}, handle, ensure_ascii=False)
+
+    pointer = os.path.join(base_dir, f'{CURRENT_FILE}.{version}')
+    with open(pointer, 'w') as handle:
+        handle.write(version)
+    os.replace(pointer, os.path.join(base_dir, CURRENT_FILE))
+
+    # Versões antigas: leitores já abertos mantêm os arquivos via mmap; as
+    # recentes ficam para quem leu o CURRENT anterior ou ainda está gravando
+    expired = time.time() - STALE_VERSION_SECONDS
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if name != version and os.path.isdir(path) and os.path.getmtime(path) < expired:
+            shutil.rmtree(path, ignore_errors=True)
+
+    logger.info('Índice de contexto da config %s: %s arquivos, %s trechos, %s termos',
+                llm_config_id, len(sources), len(texts), len(vocabulary))
+    return version
+
+
+def delete_index(llm_config_id):
+    shutil.rmtree(_config_dir(llm_config_id), ignore_errors=True)
+
+
+def schedule_rebuild(llm_config_id):
+    """
+    Reconstrói o índice em segundo plano após o commit da transação atual.
+    Pedidos para uma config que já tem reconstrução pendente são agrupados.
+    """
+    key = str(llm_config_id)
+
+    def run():
+        from .models import LLMProviderConfig
+
+        with _pending_lock:
+            _pending.discard(key)
+        try:
+            # A config pode ter sido removida junto com os arquivos
+            if LLMProviderConfig.objects.filter(pk=llm_config_id).exists():
+                build_index(llm_config_id)
+            else:
+                delete_index(llm_config_id)
+        except Exception as e:
+            logger.error('Erro ao indexar os arquivos de contexto da config %s: %s', llm_config_id, e)
+        finally:
+            close_old_connections()
+
+    def start():
+        with _pending_lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+        threading.Thread(target=run, daemon=True).start()
+
+    transaction.on_commit(start)
+
+
+class ContextIndex:
+    """Índice publicado de uma config, aberto com memory-map"""
+
+    def __init__(self, path):
+        def load(name):
+            try:
+                return np.load(os.path.join(path, name), mmap_mode='r')
+            except ValueError:
+                # Arrays vazios não podem ser mapeados
+                return np.load(os.path.join(path, name))
+
+        self.offsets = load('offsets.npy')
+        self.sources_by_chunk = load('sources.npy')
+        self.tokens = load('tokens.npy')
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        self.sources = meta['sources']
+        self.vocabulary = meta['vocabulary']
+
+        size = len(self.offsets) - 1
+        self.weights = sparse.csc_matrix(
+            (load('data.npy'), load('indices.npy'), load('indptr.npy')),
+            shape=(size, len(self.vocabulary)),
+        )
+        self.chunks = np.memmap(os.path.join(path, 'chunks.txt'), dtype=np.uint8, mode='r') if size and self.offsets[-1] else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def total_tokens(self):
+        return int(self.tokens.sum())
+
+    def text(self, position):
+        if self.chunks is None:
+            return ""
+        return bytes(self.chunks[self.offsets[position]:self.offsets[position + 1]]).decode('utf-8')
+
+    def source(self, position):
+        return self.sources[int(self.sources_by_chunk[position])]
+
+    def search(self, query):
+        """Posições dos trechos com score > 0, do mais para o menos relevante"""
+        columns = sorted({self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary})
+        if not columns or not len(self):
+            return []
+        scores = np.asarray(self.weights[:, columns].sum(axis=1)).ravel()
+        candidates = np.flatnonzero(scores > 0)
+        return candidates[np.argsort(-scores[candidates], kind='stable')].tolist()
+
+
+def get_index(llm_config_id):
+    """Índice atual da config, construído no primeiro acesso se não existir"""
+    base_dir = _config_dir(llm_config_id)
+    try:
+        with open(os.path.join(base_dir, CURRENT_FILE)) as handle:
+            version = handle.read().strip()
+    except FileNotFoundError:
+        version = build_index(llm_config_id)
+
+    key = str(llm_config_id)
+    cached = _loaded.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _loaded_lock:
+        try:
+            index = ContextIndex(os.path.join(base_dir, version))
+        except FileNotFoundError:
+            return None
+        _loaded[key] = (version, index)
+    return index
+
+
+def retrieve(llm_config_id, query, token_budget=None, top_k=None):
+    """
+    Trechos para o prompt: [(arquivo, texto)] na ordem de relevância, até
+    `top_k` trechos e `token_budget` tokens. Sem consulta, ou se a base inteira
+    cabe no orçamento, retorna os trechos na ordem original.
+    """
+    token_budget = token_budget or getattr(settings, 'CONTEXT_RETRIEVAL_TOKEN_BUDGET', 1500)
+    top_k = top_k or getattr(settings, 'CONTEXT_RETRIEVAL_TOP_K', 6)
+
+    index = get_index(llm_config_id)
+    if index is None or not len(index):
+        return []
+
+    if index.total_tokens <= token_budget:
+        positions = range(len(index))
+    elif query:
+        positions = index.search(query)[:top_k]
+    else:
+        positions = range(len(index))
+
+    selected = []
+    used_tokens = 0
+    for position in positions:
+        tokens = int(index.tokens[position])
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append((index.source(position), index.text(position)))
+        used_tokens += tokens
+    return selected
+
+
+def is_complete(llm_config_id, token_budget=None):
+    """Se a base inteira cabe no orçamento (vai completa e estável no prompt)"""
+    token_budget = token_budget or getattr(settings, 'CONTEXT_RETRIEVAL_TOKEN_BUDGET', 1500)
+    index = get_index(llm_config_id)
+    return index is None or index.total_tokens <= token_budget
+
+
+def format_chunks(chunks):
+    """Agrupa os trechos por arquivo no formato usado no prompt"""
+    by_source = {}
+    for source, text in chunks:
+        by_source.setdefault(source, []).append(text)
+    return "\n\n".join(f"**{source}:**\n" + "\n[...]\n".join(texts) for source, texts in by_source.items())
@@ -1,13 +1,27 @@
+import logging
+import time
 from datetime import datetime
 from django.conf import settings
 from django_ai_assistant import AIAssistant
 from django_ai_assistant.langchain.tools import method_tool
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, AIMessage, SystemMessage
 
+from agents.graph import get_agent_graph
+from agents import retrieval, streaming, usage
+from agents.llm_factory import InvocationAttribute, assistant_state, get_assistant, get_llm
+from agents.memory import ConversationMemory
 from agents.models import LLMProviderConfig, ChatHistory, AssistantContextFile
+from agents.prompt_builder import LayeredPromptMixin, build_messages
+from agents.turn_budget import TurnBudget
+from monitoring.metrics import LLM_FIRST_MESSAGE, llm_labels, record_llm_usage
+from monitoring.tracing import span
+
+logger = logging.getLogger(__name__)
+
+QUOTA_EXCEEDED_MESSAGE = (
+    "⚠️ Você atingiu o limite diário de uso do assistente. "
+    "Tente novamente amanhã."
+)
 
 
 def create_dynamic_assistant_class(llm_config: LLMProviderConfig, assistant_id: str = None):
@@ -15,109 +29,44 @@ def create_dynamic_assistant_class(llm_config: LLMProviderConfig, assistant_id:
     Cria uma classe AIAssistant dinâmica baseada no LLMProviderConfig
     """
 
-    class DynamicAIAssistant(AIAssistant):
+    class DynamicAIAssistant(LayeredPromptMixin, AIAssistant):
         id = assistant_id or f"assistant_{llm_config.id}"
         name = llm_config.display_name or f"{llm_config.get_name_display()} - {llm_config.model}"
         instructions = llm_config.instructions or "Você é um assistente inteligente."
         model = llm_config.model
 
+        # Mensagem em processamento, usada para buscar os trechos dos arquivos de contexto
+        current_message = InvocationAttribute('message')
+
         def __init__(self):
             self.llm_config = llm_config
             super().__init__()
 
         def get_llm(self):
             """Retorna o modelo LLM configurado baseado no LLMProviderConfig"""
-            provider = self.llm_config.name
-
-            if provider == "openai":
-                return ChatOpenAI(
-                    model=self.llm_config.model,
-                    temperature=self.llm_config.temperature,
-                    max_tokens=self.llm_config.max_tokens,
-                    top_p=self.llm_config.top_p,
-                    presence_penalty=self.llm_config.presence_penalty,
-                    frequency_penalty=self.llm_config.frequency_penalty,
-                    openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-                )
-            elif provider == "anthropic":
-                return ChatAnthropic(
-                    model=self.llm_config.model,
-                    temperature=self.llm_config.temperature,
-                    max_tokens=self.llm_config.max_tokens,
-                    top_p=self.llm_config.top_p,
-                    anthropic_api_key=getattr(settings, 'ANTHROPIC_API_KEY', '')
-                )
-            elif provider == "google":
-                return ChatGoogleGenerativeAI(
-                    model=self.llm_config.model,
-                    temperature=self.llm_config.temperature,
-                    max_output_tokens=self.llm_config.max_tokens,
-                    top_p=self.llm_config.top_p,
-                    google_api_key=getattr(settings, 'GOOGLE_API_KEY', '')
-                )
-            else:
-                # Fallback para OpenAI se provider não reconhecido
-                return ChatOpenAI(
-                    model=self.llm_config.model,
-                    temperature=self.llm_config.temperature,
-                    max_tokens=self.llm_config.max_tokens,
-                    openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-                )
-
-        def get_instructions(self):
-            """Retorna instruções dinâmicas com contexto atual"""
-            current_time = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-            base_instructions = self.instructions
+            return get_llm(self.llm_config)
 
-            # Adicionar contexto de arquivos
-            context_files_content = self._get_context_files_content()
-            if context_files_content:
-                base_instructions += f"\n\n=== CONTEXTO ADICIONAL ===\n{context_files_content}"
+        def get_prompt_sections(self):
+            """Instruções e arquivos de contexto (a data/hora é adicionada pelo prompt_builder)"""
+            sections = {'instructions': self.instructions}
 
-            return f"{base_instructions}\n\nData e hora atual: {current_time}"
-
-        def _get_context_files_content(self):
-            """
-            Busca e retorna o conteúdo dos arquivos de contexto ativos
-            """
             try:
-                context_files = AssistantContextFile.objects.filter(
-                    llm_config=self.llm_config,
-                    is_active=True,
-                    status='ready'
-                ).exclude(file_type='pdf').order_by('name')
-
-                if not context_files.exists():
-                    return ""
-
-                context_content = []
-                total_chars = 0
-                max_context_length = 20000
-
-                for file in context_files:
-                    if file.extracted_content:
-                        file_content = file.extracted_content.strip()
-
-                        if total_chars + len(file_content) > max_context_length:
-                            remaining_chars = max_context_length - total_chars
-                            if remaining_chars > 100:
-                                file_content = file_content[:remaining_chars] + "..."
-                                context_content.append(f"**{file.name}:**\n{file_content}")
-                            break
-
-                        context_content.append(f"**{file.name}:**\n{file_content}")
-                        total_chars += len(file_content) + len(file.name) + 10
-
-                if context_content:
-                    result = "\n\n".join(context_content)
-                    result += f"\n\n(Contexto baseado em {len(context_content)} arquivo(s) de referência)"
-                    return result
+                # Base pequena vai completa (seção estável); maior, só os trechos relevantes,
+                # junto da mensagem atual (fora do prefixo cacheado)
+                if retrieval.is_complete(self.llm_config.pk):
+                    chunks = retrieval.retrieve(self.llm_config.pk, None)
+                    section = 'context_files'
+                else:
+                    chunks = retrieval.retrieve(self.llm_config.pk, self.current_message)
+                    section = 'retrieved'
+            except Exception as e:
+                logger.error('Erro ao buscar arquivos de contexto: %s', e)
+                chunks = []
 
-                return ""
+            if chunks:
+                sections[section] = f"=== CONTEXTO ADICIONAL ===\n{retrieval.format_chunks(chunks)}"
 
-            except Exception as e:
-                print(f"Erro ao buscar arquivos de contexto: {e}")
-                return ""
+            return sections
 
     return DynamicAIAssistant
 
@@ -141,6 +90,14 @@ class DjangoAIAssistantService:
         """Delegate para o assistant interno"""
         return self.assistant.get_instructions()
 
+    def get_prompt_sections(self):
+        """Delegate para o assistant interno"""
+        return self.assistant.get_prompt_sections()
+
+    def get_tools(self):
+        """Delegate para o assistant interno"""
+        return self.assistant.get_tools()
+
 class AgentLLMService:
     """
     Service principal que gerencia diferentes provedores LLM usando django-ai-assistant
@@ -148,59 +105,104 @@ class AgentLLMService:
 
     def __init__(self, llm_config: LLMProviderConfig, user=None):
         self.llm_config = llm_config
+        self.user = user
 
+        # Assistants ficam em cache por config; o usuário entra via assistant_state()
         if llm_config.config_type == 'finance' and user:
             from finance.ai_assistants import FinanceAIAssistant
-            self.assistant = FinanceAIAssistant(user=user, llm_config=llm_config)
+            self.assistant = get_assistant('finance', llm_config, lambda: FinanceAIAssistant(llm_config=llm_config))
         elif llm_config.config_type == 'calendar' and user:
             from google_calendar.ai_assistants import GoogleCalendarAIAssistant
-            self.assistant = GoogleCalendarAIAssistant(user=user, llm_config=llm_config)
+            self.assistant = get_assistant('calendar', llm_config, lambda: GoogleCalendarAIAssistant(llm_config=llm_config))
         else:
-            self.assistant = DjangoAIAssistantService(llm_config)
+            self.assistant = get_assistant('general', llm_config, lambda: DjangoAIAssistantService(llm_config))
 
-    def send_text_message(self, message_content: str, chat_session):
+    def send_text_message(self, message_content: str, chat_session, on_part=None):
         """
         Envia mensagem de texto usando django-ai-assistant com todas as funcionalidades do OpenAIService
 
         Args:
             message_content (str): Conteúdo da mensagem
             chat_session: Sessão do chat
+            on_part (callable): Se informado, recebe a resposta do LLM em partes
+                enquanto é gerada (agents.streaming); o retorno continua sendo
+                a resposta completa. Se tiver start() e typing() (ex:
+                StreamingReply), start() é chamado quando o LLM vai de fato
+                rodar e typing() quando a geração continua depois de uma parte
 
         Returns:
             dict: Resposta do assistant ou None em caso de erro
         """
         try:
-            print(f"Enviando mensagem via AgentLLMService: {message_content}")
+            logger.debug('Enviando mensagem via AgentLLMService: %s caracteres', len(message_content))
 
             # VERIFICAR STATUS DA SESSÃO - Não responder se não permitir AI
             if hasattr(chat_session, 'allows_ai_response') and not chat_session.allows_ai_response():
-                print(f"🚫 FILTRADO: Sessão {chat_session.from_number} não permite resposta do AI (status: {chat_session.status}) - Assistant não irá responder")
+                logger.warning('🚫 FILTRADO: Sessão %s não permite resposta do AI (status: %s) - Assistant não irá responder', chat_session.from_number, chat_session.status)
                 return None
 
-            # Recuperar últimas 10 mensagens da sessão em ordem cronológica
-            last_messages = ChatHistory.objects.filter(session_id=chat_session.from_number, closed=False).order_by("created_at")[:10]
-
-            # Montar contexto do sistema com instruções estruturadas
-            system_content = self._build_enhanced_system_prompt()
+            # Mensagens financeiras comuns ("gastei 50 no mercado") dispensam o LLM
+            fast_path_prediction = None
+            if self.llm_config.config_type == 'finance' and self.user:
+                from finance import fast_path
+
+                with span('fast_path'), assistant_state(user=self.user, message=message_content):
+                    fast_path_prediction, fast_reply = fast_path.handle(self.assistant, self.user, message_content)
+                if fast_reply is not None:
+                    with span('history_create'):
+                        ChatHistory.create(
+                            session_id=chat_session.from_number,
+                            content=message_content,
+                            external_id=chat_session.id,
+                            response=fast_reply,
+                            tool_calls=[{'name': fast_path_prediction['tool'], 'args': fast_path_prediction['args']}]
+                        )
+                    return fast_reply
+
+            # Consultas repetidas sem mudança nos dados (finance.response_cache)
+            response_cache_key = None
+            if self.llm_config.config_type == 'finance' and self.user:
+                from finance import response_cache
+
+                response_cache_key, cached = response_cache.lookup(
+                    self.user, self.llm_config, message_content, fast_path_prediction
+                )
+                if cached is not None:
+                    with span('history_create'):
+                        ChatHistory.create(
+                            session_id=chat_session.from_number,
+                            content=message_content,
+                            external_id=chat_session.id,
+                            response=cached['response'],
+                            tool_calls=cached['tool_calls']
+                        )
+                    return cached['response']
+
+            # Cota diária de LLM do usuário (agents.usage)
+            if usage.quota_exceeded(self.user):
+                return QUOTA_EXCEEDED_MESSAGE
+
+            # Últimos turnos da sessão dentro do orçamento de tokens, em ordem cronológica
+            with span('history_load'):
+                memory = ConversationMemory(chat_session, self.llm_config)
+                history_messages = memory.load()
 
             # PRIMEIRO: Verificar se é uma solicitação relacionada a calendário
+            session_context = ""
             if self.llm_config.config_type == 'calendar':
-                system_content += """CONTEXTO IMPORTANTE:
+                session_context = f"""CONTEXTO IMPORTANTE:
                 - Este usuário está enviando mensagens via WhatsApp
-                - O número do WhatsApp é: {whatsapp_number}
+                - O número do WhatsApp é: {chat_session.from_number}
                 - Use sempre este número nas funções que requerem numero_whatsapp
                 - Seja direto e objetivo nas respostas
                 - Formate as respostas de forma amigável para WhatsApp
                 - Se o usuário solicitar criação de eventos, use os dados fornecidos ou peça os dados que faltam
                 - Para listar eventos, seja conciso mas informativo
-                - Para verificar disponibilidade, seja claro sobre conflitos{history_context}"""
+                - Para verificar disponibilidade, seja claro sobre conflitos"""
 
-            # SEGUNDO: Verificar se é uma solicitação relacionada a finanças
-            if self.llm_config.config_type == 'finance':
-                pass
-                # finance_response = self._try_finance_assistant(message_content, chat_session, last_messages)
-                # if finance_response:
-                #     return finance_response
+            # Estado desta mensagem para o assistant compartilhado. A mensagem
+            # permite ao assistente de finanças incluir só as categorias relevantes
+            state = {'user': self.user, 'message': message_content}
 
             # system_content = self._build_enhanced_system_prompt()
 
@@ -231,23 +233,13 @@ class AgentLLMService:
             #     system_content += "\nPara enviar qualquer um destes arquivos, use o formato JSON com a URL exata listada acima."
             #
             # # Preparar mensagens usando LangChain format
-            messages = []
-
-            # Adicionar instruções do sistema
-            from langchain.schema import SystemMessage, HumanMessage, AIMessage
-            messages.append(SystemMessage(content=system_content))
-
-            # Adicionar histórico de mensagens
-            for msg in last_messages:
-                # Garante que content e response nunca sejam None
-                human_content = msg.message.get("content") or ""
-                ai_response = msg.message.get("response") or ""
-
-                if human_content.strip():
-                    messages.append(HumanMessage(content=human_content))
-
-                if ai_response.strip():
-                    messages.append(AIMessage(content=ai_response))
+            # Prompt do mais estável ao mais volátil (cache de prefixo do provedor)
+            with span('prompt'), assistant_state(**state):
+                sections = self.assistant.get_prompt_sections()
+                sections['session'] = "\n\n".join(
+                    part for part in (session_context, memory.summary_section()) if part
+                )
+                messages = build_messages(sections, history_messages, message_content, provider=self.llm_config.name)
 
             # # Preparar conteúdo da mensagem atual (com suporte a imagens)
             # user_message_content = []
@@ -278,45 +270,92 @@ class AgentLLMService:
             #     messages.append(HumanMessage(content=current_message_content))
 
             # Criar histórico da mensagem humana
-            history = ChatHistory.create(
-                session_id=chat_session.from_number,
-                content=message_content,
-                external_id=chat_session.id,
-                response=None
-            )
-
-            # Adicionar mensagem atual ao histórico de mensagens
-            messages.append(HumanMessage(content=message_content))
+            with span('history_create'):
+                history = ChatHistory.create(
+                    session_id=chat_session.from_number,
+                    content=message_content,
+                    external_id=chat_session.id,
+                    response=None
+                )
 
-            # Usar django-ai-assistant com suporte a tools
+            # Usar as tools do django-ai-assistant com o prompt já montado
             # O .invoke() do grafo executa com tool calling e histórico manual
-            # thread_id=None evita salvar thread no banco
-            graph = self.assistant.as_graph(thread_id=None)
+            with span('graph_build'):
+                graph = get_agent_graph(self.assistant)
 
-            # Configurar limite de recursão e desabilitar salvamento
+            # Configurar limite de recursão e desabilitar salvamento. O
+            # TurnBudget limita ferramentas, tempo e tokens bem antes do recursion_limit
+            budget = TurnBudget()
             config = {
                 "recursion_limit": 50,
                 "configurable": {
                     "thread_id": None,  # Não salvar thread
+                    "turn_budget": budget,
                 }
             }
 
-            result = graph.invoke({"messages": messages, "input": None}, config=config)
+            started_at = time.perf_counter()
+            with span('graph_invoke'), assistant_state(**state):
+                if on_part is None:
+                    result = graph.invoke({"messages": messages}, config=config)
+                else:
+                    if hasattr(on_part, 'start'):
+                        on_part.start()
+                    result, first_part_after = streaming.stream_graph(
+                        graph, {"messages": messages}, config, on_part, on_typing=getattr(on_part, 'typing', None)
+                    )
+                    if first_part_after is not None:
+                        LLM_FIRST_MESSAGE.labels(**llm_labels(self.llm_config)).observe(first_part_after)
+            duration = time.perf_counter() - started_at
+            new_messages = result.get("messages", [])[len(messages):]
+            totals = record_llm_usage(self.llm_config, new_messages, duration)
+            logger.debug('Tokens de entrada: %s (cache: %s lidos, %s gravados)',
+                         totals['input'], totals['cache_read'], totals['cache_creation'])
+            turn_usage = usage.build_usage(self.llm_config, new_messages, totals, duration)
             ai_response = result.get("output", "")
+            if budget.reason:
+                logger.warning('Turno encerrado pelo orçamento (%s): %s', budget.reason, budget.as_dict())
+
+            # Concordância entre o atalho de finanças e as ferramentas que o LLM chamou
+            if fast_path_prediction is not None:
+                fast_path.compare(fast_path_prediction, new_messages, self.user)
 
             # Debug: verificar se há tool calls na resposta
             if result.get("messages"):
                 last_msg = result["messages"][-1]
 
 
-            # Salvar resposta no histórico
-            history.message['response'] = ai_response
-            history.save()
+            # Salvar resposta no histórico; as ferramentas chamadas rotulam a
+            # mensagem para o treino do roteador de intenções (agents.intent_router)
+            with span('history_save'):
+                history.message['response'] = ai_response
+                history.message['tool_calls'] = [
+                    {'name': call['name'], 'args': call['args']}
+                    for message in new_messages for call in (getattr(message, 'tool_calls', None) or [])
+                ]
+                # Provedor usado em cada chamada das configs com failover (agents.llm_routing)
+                routes = [
+                    message.response_metadata['llm_route'] for message in new_messages
+                    if 'llm_route' in (getattr(message, 'response_metadata', None) or {})
+                ]
+                if routes:
+                    history.message['llm_routes'] = routes
+                history.message['response_metadata'] = turn_usage
+                history.message['turn_budget'] = budget.as_dict()
+                history.save()
+                usage.record(turn_usage, self.llm_config, self.user, chat_session.evolution_instance_id)
+
+            # Turnos que só consultaram dados atendem as próximas perguntas iguais
+            if response_cache_key is not None:
+                response_cache.store(response_cache_key, ai_response, history.message['tool_calls'])
+
+            # Turnos que saíram da janela entram no resumo da sessão
+            memory.schedule_fold()
 
             return ai_response
 
         except Exception as e:
-            print(f"Erro ao comunicar via django-ai-assistant: {e}")
+            logger.error('Erro ao comunicar via django-ai-assistant: %s', e)
             return {
                 'success': False,
                 'error': str(e)
@@ -338,22 +377,8 @@ class AgentLLMService:
         if system_instructions:
             messages.append(SystemMessage(content=system_instructions))
 
-        # Recuperar últimas mensagens da sessão
-        last_messages = ChatHistory.objects.filter(
-            session_id=chat_session.from_number,
-            closed=False
-        ).order_by("created_at")[:10]
-
-        # Adicionar mensagens do histórico
-        for msg in last_messages:
-            human_content = msg.message.get("content") or ""
-            ai_response = msg.message.get("response") or ""
-
-            if human_content.strip():
-                messages.append(HumanMessage(content=human_content))
-
-            if ai_response.strip():
-                messages.append(AIMessage(content=ai_response))
+        # Adicionar os turnos mais recentes da sessão
+        messages.extend(ConversationMemory(chat_session, self.llm_config).load())
 
         # Adicionar mensagem atual
         if current_message and current_message.strip():
@@ -401,7 +426,7 @@ class AgentLLMService:
             return ""
 
         except Exception as e:
-            print(f"Erro ao buscar arquivos de contexto: {e}")
+            logger.error('Erro ao buscar arquivos de contexto: %s', e)
             return ""
 
     @method_tool
@@ -477,7 +502,7 @@ class AgentLLMService:
             return list(pdf_files)
 
         except Exception as e:
-            print(f"Erro ao buscar arquivos PDF: {e}")
+            logger.error('Erro ao buscar arquivos PDF: %s', e)
             return []
 
     def _get_image_files(self):
@@ -495,7 +520,7 @@ class AgentLLMService:
             return list(image_files)
 
         except Exception as e:
-            print(f"Erro ao buscar arquivos de imagem: {e}")
+            logger.error('Erro ao buscar arquivos de imagem: %s', e)
             return []
 
     def _get_available_files_with_urls(self):
@@ -554,13 +579,13 @@ class AgentLLMService:
                             available_files.append(file_info)
 
                 except Exception as url_error:
-                    print(f"Erro ao obter URL do arquivo {file.name}: {url_error}")
+                    logger.error('Erro ao obter URL do arquivo %s: %s', file.name, url_error)
                     continue
 
             return available_files
 
         except Exception as e:
-            print(f"Erro ao buscar arquivos disponíveis: {e}")
+            logger.error('Erro ao buscar arquivos disponíveis: %s', e)
             return []
 
     def _process_structured_response(self, ai_response):
@@ -593,7 +618,7 @@ class AgentLLMService:
                                 "text": text,
                                 "file": file_url
                             }
-                            print(f"Resposta estruturada detectada: texto='{text[:50]}...', arquivo='{file_url}'")
+                            logger.debug("Resposta estruturada detectada: texto com %s caracteres, arquivo='%s'", len(text), file_url)
                             return result
 
                 except json.JSONDecodeError:
@@ -613,13 +638,13 @@ class AgentLLMService:
                         "text": text.strip(),
                         "file": file_url.strip()
                     }
-                    print(f"Resposta estruturada (flexível) detectada: texto='{text[:50]}...', arquivo='{file_url}'")
+                    logger.debug("Resposta estruturada (flexível) detectada: texto com %s caracteres, arquivo='%s'", len(text), file_url)
                     return result
 
             return None
 
         except Exception as e:
-            print(f"Erro ao processar resposta estruturada: {e}")
+            logger.error('Erro ao processar resposta estruturada: %s', e)
             return None
 
     def _build_enhanced_system_prompt(self):
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import retrieval
+from .llm_factory import invalidate
+from .models import AssistantContextFile, LLMProviderConfig
+
+
+@receiver([post_save, post_delete], sender=LLMProviderConfig)
+def invalidate_llm_cache(sender, instance, **kwargs):
+    """Descarta o cliente, o assistant e o grafo em cache da config alterada"""
+    invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=LLMProviderConfig)
+def delete_context_index(sender, instance, **kwargs):
+    retrieval.delete_index(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AssistantContextFile)
+def rebuild_context_index(sender, instance, **kwargs):
+    """Reindexa a config quando um arquivo termina de ser processado, muda ou é removido"""
+    if kwargs.get('signal') is post_save and instance.status in ('uploading', 'processing'):
+        return
+    retrieval.schedule_rebuild(instance.llm_config_id)
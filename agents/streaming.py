@@ -0,0 +1,138 @@
+"""
+Resposta do agente enviada em partes enquanto o LLM gera
+graph.invoke() só devolve o texto no fim (10-20 s em análises longas, sem
+nenhum retorno ao usuário). Aqui o grafo roda com stream_mode='messages': os
+tokens do nó 'agent' passam pelo MessageSplitter, que libera partes em fins de
+parágrafo (ou de frase, perto do limite de tamanho de uma mensagem do
+WhatsApp) para o callback de envio.
+"""
+import re
+import time
+
+from django.conf import settings
+from langchain_core.messages import AIMessage
+
+from monitoring.tracing import current_trace
+
+# Fim de frase seguido de espaço ou quebra de linha
+_SENTENCE_END = re.compile(r'[.!?…;:](?=\s)')
+
+
+class MessageSplitter:
+    """
+    Acumula o texto gerado e devolve as partes prontas para envio. Uma parte
+    sai no primeiro fim de parágrafo depois de min_chars; passando de
+    max_chars, é cortada na última quebra de linha, fim de frase ou espaço
+    antes do limite.
+    """
+
+    def __init__(self, max_chars=None, min_chars=None):
+        self.max_chars = max_chars or getattr(settings, 'STREAMING_MAX_CHARS', 3000)
+        self.min_chars = min(min_chars or getattr(settings, 'STREAMING_MIN_CHARS', 300), self.max_chars)
+        self.buffer = ''
+
+    def feed(self, text):
+        """Acrescenta texto e retorna a lista de partes completas"""
+        self.buffer += text
+        parts = []
+        while True:
+            cut = self._cut()
+            if cut is None:
+                return parts
+            part, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:].lstrip()
+            if part:
+                parts.append(part)
+
+    def flush(self):
+        """Retorna o que sobrou no buffer (fim da resposta ou de um turno)"""
+        part, self.buffer = self.buffer.strip(), ''
+        return [part] if part else []
+
+    def _cut(self):
+        paragraph = self.buffer.rfind('\n\n', self.min_chars, self.max_chars + 2)
+        if paragraph != -1:
+            return paragraph
+        if len(self.buffer) <= self.max_chars:
+            return None
+
+        # Mensagem longa sem parágrafo: melhor fronteira antes do limite
+        window = self.buffer[:self.max_chars]
+        newline = window.rfind('\n')
+        if newline > self.max_chars // 2:
+            return newline
+        sentence = None
+        for sentence in _SENTENCE_END.finditer(window):
+            pass
+        if sentence is not None and sentence.end() > self.max_chars // 2:
+            return sentence.end()
+        space = window.rfind(' ')
+        return space if space > 0 else self.max_chars
+
+
+def _text(content):
+    """Texto de um chunk: str (OpenAI, Google) ou lista de blocos (Anthropic)"""
+    if isinstance(content, str):
+        return content
+    return ''.join(
+        block if isinstance(block, str) else block.get('text', '')
+        for block in content
+        if isinstance(block, str) or block.get('type') in ('text', 'text_delta')
+    )
+
+
+def stream_graph(graph, inputs, config, on_part, splitter=None, on_typing=None):
+    """
+    Executa o grafo do agente (agents.graph) chamando on_part(texto) para cada
+    parte da resposta. Texto gerado antes de uma chamada de ferramenta ("vou
+    consultar...") sai como parte própria assim que a ferramenta começa.
+    on_typing() é chamado quando a geração continua depois de uma parte
+    enviada (nunca depois da última).
+
+    Returns:
+        tuple: (estado final, o mesmo de graph.invoke; segundos até a primeira
+        parte ou None)
+    """
+    splitter = splitter or MessageSplitter()
+    started_at = time.perf_counter()
+    first_part_after = None
+    state = None
+    # Uma parte foi enviada e ainda não se sabe se vem mais texto
+    waiting = False
+
+    def resumed():
+        nonlocal waiting
+        if waiting and on_typing is not None:
+            on_typing()
+        waiting = False
+
+    def emit(parts):
+        nonlocal first_part_after, waiting
+        for part in parts:
+            if first_part_after is None:
+                first_part_after = time.perf_counter() - started_at
+                # Tempo desde a chegada do webhook até a primeira parte
+                trace = current_trace()
+                if trace is not None:
+                    trace.record('first_message', trace.total_ms, 0)
+            on_part(part)
+            waiting = True
+
+    for mode, payload in graph.stream(inputs, config=config, stream_mode=['messages', 'values']):
+        if mode == 'values':
+            state = payload
+            continue
+
+        message, metadata = payload
+        if metadata.get('langgraph_node') != 'agent':
+            # Saída das tools: o texto anterior do agente é um turno completo
+            # e o agente volta a gerar em seguida
+            emit(splitter.flush())
+            resumed()
+        elif isinstance(message, AIMessage):
+            text = _text(message.content)
+            if text:
+                resumed()
+            emit(splitter.feed(text))
+
+    emit(splitter.flush())
+    return state, first_part_after
@@ -0,0 +1,129 @@
+"""
+Orçamento de execução de um turno do agente
+Com só o recursion_limit do LangGraph, um modelo confuso chamava
+listar_movimentacoes ou verificar_disponibilidade dezenas de vezes no mesmo
+turno (cada uma com uma consulta ao banco ou à API do Google e mais um passo
+do LLM). O TurnBudget de cada turno limita as chamadas de ferramenta, o
+tempo e os tokens; chamadas idênticas (mesma ferramenta e argumentos)
+reaproveitam o resultado da primeira, e repeti-las além de MAX_REPEATS
+conta como loop. Esgotado o orçamento, o agente responde com o que já
+obteve (agents.graph) em vez de falhar.
+
+O orçamento vai no config da invocação do grafo:
+    config['configurable']['turn_budget'] = TurnBudget()
+"""
+import json
+import time
+
+from django.conf import settings
+
+from monitoring.metrics import AGENT_BUDGET_EXHAUSTED
+
+DEFAULT_BUDGET = {
+    # Chamadas de ferramenta executadas por turno (repetidas não contam)
+    'MAX_TOOL_CALLS': 8,
+    # Tempo total do turno (s); depois disso o LLM não é chamado de novo
+    'MAX_SECONDS': 60,
+    # Tokens de entrada + saída das chamadas ao LLM do turno
+    'MAX_TOKENS': 60000,
+    # Vezes que a mesma chamada pode ser repetida antes de contar como loop
+    'MAX_REPEATS': 2,
+}
+
+# Respostas quando o LLM não pode mais ser chamado
+PARTIAL_ANSWER = (
+    "⏳ Não consegui concluir tudo o que você pediu desta vez. "
+    "Tente de novo ou divida o pedido em partes menores."
+)
+# Instrução para a última chamada ao LLM, sem ferramentas
+WRAP_UP_INSTRUCTION = (
+    "[Limite de consultas deste turno atingido] Responda agora ao usuário usando apenas as "
+    "informações já obtidas, sem chamar ferramentas. Se faltar algo, diga o que ficou pendente."
+)
+
+
+def get_config():
+    return {**DEFAULT_BUDGET, **getattr(settings, 'AGENT_TURN_BUDGET', {})}
+
+
+def get_budget(config):
+    """TurnBudget do config da invocação; um novo (padrão) se não houver"""
+    configurable = (config or {}).get('configurable') or {}
+    budget = configurable.get('turn_budget')
+    return budget if budget is not None else TurnBudget()
+
+
+def call_key(call):
+    """Identidade de uma chamada: ferramenta + argumentos normalizados"""
+    return call['name'], json.dumps(call.get('args') or {}, sort_keys=True, default=str)
+
+
+class TurnBudget:
+    """Contadores e resultados memorizados de um turno do agente"""
+
+    def __init__(self, **limits):
+        config = {**get_config(), **limits}
+        self.max_tool_calls = config['MAX_TOOL_CALLS']
+        self.max_tokens = config['MAX_TOKENS']
+        self.max_repeats = config['MAX_REPEATS']
+        self.deadline = time.monotonic() + config['MAX_SECONDS']
+        self.tool_calls = 0
+        self.tokens = 0
+        # call_key -> (conteúdo do ToolMessage, vezes repetida)
+        self.results = {}
+        self.reason = None
+
+    def charge(self, message):
+        """Soma os tokens de uma resposta do LLM"""
+        usage = getattr(message, 'usage_metadata', None) or {}
+        self.tokens += usage.get('total_tokens') or usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+
+    def memoized(self, call):
+        """Resultado de uma chamada idêntica já executada no turno, ou None"""
+        entry = self.results.get(call_key(call))
+        if entry is None:
+            return None
+        content, repeats = entry
+        self.results[call_key(call)] = (content, repeats + 1)
+        if repeats + 1 > self.max_repeats:
+            self.exhaust('loop')
+        return content
+
+    def remember(self, call, content):
+        self.results[call_key(call)] = (content, 0)
+
+    def can_call_tool(self):
+        """Reserva uma chamada de ferramenta; False se acabou o orçamento"""
+        if self.tool_calls >= self.max_tool_calls:
+            self.exhaust('tool_calls')
+            return False
+        self.tool_calls += 1
+        return True
+
+    def exhaust(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            AGENT_BUDGET_EXHAUSTED.labels(reason).inc()
+
+    def check(self):
+        """
+        Motivo para não chamar mais o LLM: 'deadline' ou 'tokens' impedem
+        qualquer nova chamada; 'tool_calls' e 'loop' ainda permitem uma
+        última chamada, sem ferramentas, para responder ao usuário.
+        """
+        if time.monotonic() >= self.deadline:
+            self.exhaust('deadline')
+            return 'deadline'
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            self.exhaust('tokens')
+            return 'tokens'
+        return self.reason
+
+    def as_dict(self):
+        """Resumo gravado no ChatHistory"""
+        return {
+            'tool_calls': self.tool_calls,
+            'repeated': sum(repeats for _, repeats in self.results.values()),
+            'tokens': self.tokens,
+            'exhausted': self.reason,
+        }
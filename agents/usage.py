@@ -0,0 +1,156 @@
+"""
+Consumo e custo das chamadas LLM por turno, usuário, instância e config
+Cada turno do agente grava em ChatHistory.message['response_metadata'] os
+tokens (entrada, saída, cache), a latência, o modelo e o custo estimado. As
+mesmas chamadas, e também as de resumo da conversa e de roteamento, são
+somadas em LLMUsageDaily com UPDATE ... SET campo = campo + n, sem reler a
+linha. A cota diária por usuário (LLM_DAILY_TOKEN_QUOTA /
+LLM_DAILY_COST_QUOTA) é conferida antes de chamar o LLM.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from monitoring.metrics import LLM_QUOTA_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_creation_tokens')
+
+
+def response_model(messages, default):
+    """Modelo informado pelo provedor na última resposta (OpenAI/Google: model_name, Anthropic: model)"""
+    for message in reversed(messages):
+        metadata = getattr(message, 'response_metadata', None) or {}
+        model = metadata.get('model_name') or metadata.get('model')
+        if model:
+            return model
+    return default
+
+
+def get_prices(model):
+    """Preços (US$ por milhão de tokens) do prefixo mais longo de LLM_PRICES que casa com o modelo"""
+    prices = getattr(settings, 'LLM_PRICES', {})
+    matches = [name for name in prices if model.startswith(name)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model, usage):
+    """
+    Custo em US$. input_tokens inclui os tokens servidos/gravados no cache,
+    cobrados pelos preços próprios quando configurados.
+    """
+    prices = get_prices(model)
+    if prices is None:
+        return Decimal(0)
+    cache_read = usage['cache_read_tokens']
+    cache_creation = usage['cache_creation_tokens']
+    uncached = max(usage['input_tokens'] - cache_read - cache_creation, 0)
+    cost = (
+        uncached * prices['input']
+        + cache_read * prices.get('cache_read', prices['input'])
+        + cache_creation * prices.get('cache_creation', prices['input'])
+        + usage['output_tokens'] * prices['output']
+    ) / 1_000_000
+    return Decimal(str(round(cost, 6)))
+
+
+def build_usage(llm_config, messages, totals, duration):
+    """
+    Consumo de uma execução a partir dos totais de record_llm_usage()
+    (monitoring.metrics) e das AIMessages geradas.
+    """
+    model = response_model(messages, llm_config.model)
+    # Com failover (agents.llm_routing), o provedor que respondeu
+    routes = [message.response_metadata['llm_route'] for message in messages
+              if 'llm_route' in (getattr(message, 'response_metadata', None) or {})]
+    usage = {
+        'provider': routes[-1]['provider'] if routes else llm_config.name,
+        'model': model,
+        'requests': sum(1 for message in messages if getattr(message, 'usage_metadata', None)) or 1,
+        'input_tokens': totals['input'],
+        'output_tokens': totals['output'],
+        'cache_read_tokens': totals['cache_read'],
+        'cache_creation_tokens': totals['cache_creation'],
+        'latency_ms': round(duration * 1000),
+    }
+    usage['cost'] = float(estimate_cost(model, usage))
+    return usage
+
+
+def build_openai_usage(model, data, duration):
+    """Consumo de uma resposta crua da API Chat Completions (chamadas sem LangChain)"""
+    tokens = data.get('usage') or {}
+    usage = {
+        'provider': 'openai',
+        'model': data.get('model') or model,
+        'requests': 1,
+        'input_tokens': tokens.get('prompt_tokens', 0),
+        'output_tokens': tokens.get('completion_tokens', 0),
+        'cache_read_tokens': (tokens.get('prompt_tokens_details') or {}).get('cached_tokens') or 0,
+        'cache_creation_tokens': 0,
+        'latency_ms': round(duration * 1000),
+    }
+    usage['cost'] = float(estimate_cost(usage['model'], usage))
+    return usage
+
+
+def record(usage, llm_config=None, user=None, evolution_instance=None):
+    """Soma o consumo ao LLMUsageDaily do dia para usuário/instância/config/modelo"""
+    from .models import LLMUsageDaily
+
+    date = timezone.localdate()
+    user_id = getattr(user, 'pk', user)
+    instance_id = getattr(evolution_instance, 'pk', evolution_instance)
+    config_id = getattr(llm_config, 'pk', llm_config)
+    key = f"{date}:{user_id or '-'}:{instance_id or '-'}:{config_id or '-'}:{usage['model']}"
+
+    increments = {field: F(field) + usage[field] for field in (*TOKEN_FIELDS, 'requests', 'latency_ms')}
+    increments['cost'] = F('cost') + Decimal(str(usage['cost']))
+
+    try:
+        if LLMUsageDaily.objects.filter(key=key).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                LLMUsageDaily.objects.create(
+                    key=key, date=date, user_id=user_id, evolution_instance_id=instance_id,
+                    llm_config_id=config_id, model=usage['model'],
+                    **{field: usage[field] for field in (*TOKEN_FIELDS, 'requests', 'latency_ms')},
+                    cost=Decimal(str(usage['cost'])),
+                )
+        except IntegrityError:
+            # Outro worker criou a linha do dia entre o UPDATE e o INSERT
+            LLMUsageDaily.objects.filter(key=key).update(**increments)
+    except Exception as e:
+        logger.error('Erro ao registrar consumo de LLM: %s', e)
+
+
+def quota_exceeded(user):
+    """
+    Verdadeiro se o usuário passou da cota diária de tokens ou de custo.
+    Sem cota configurada (0), não consulta o banco.
+    """
+    from .models import LLMUsageDaily
+
+    token_quota = getattr(settings, 'LLM_DAILY_TOKEN_QUOTA', 0)
+    cost_quota = getattr(settings, 'LLM_DAILY_COST_QUOTA', 0)
+    if not user or not (token_quota or cost_quota):
+        return False
+
+    today = LLMUsageDaily.objects.filter(user=user, date=timezone.localdate()).aggregate(
+        input=Sum('input_tokens'), output=Sum('output_tokens'), cost=Sum('cost'),
+    )
+    tokens = (today['input'] or 0) + (today['output'] or 0)
+    exceeded = (
+        token_quota and tokens >= token_quota
+        or cost_quota and (today['cost'] or 0) >= Decimal(str(cost_quota))
+    )
+    if exceeded:
+        LLM_QUOTA_EXCEEDED.inc()
+        logger.warning('Usuário %s atingiu a cota diária de LLM (%s tokens, US$ %s)', user.pk, tokens, today['cost'])
+    return bool(exceeded)
@@ -1,8 +1,10 @@
+import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.db import transaction
 from django.db.models import Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -12,10 +14,12 @@ from rest_framework.permissions import AllowAny
 from .models import LLMProviderConfig, AssistantContextFile
 from .forms import AssistantForm, AssistantContextFileForm
 from .services import create_llm_service
-from .file_processors import file_processor
+from . import ingestion
 from whatsapp_connector.models import EvolutionInstance
 from whatsapp_connector.services import EvolutionAPIService
 
+logger = logging.getLogger(__name__)
+
 
 # === ASSISTANTS VIEWS ===
 
@@ -99,7 +103,7 @@ class AssistantCreateView(LoginRequiredMixin, CreateView):
         initial = super().get_initial()
         initial['name'] = 'openai'
         initial['model'] = 'gpt-4o-mini'
-        print(f"🎯 Definindo valores iniciais: {initial}")
+        logger.debug('🎯 Definindo valores iniciais: %s', initial)
         return initial
 
     def form_valid(self, form):
@@ -276,41 +280,20 @@ class AssistantContextFileUploadView(LoginRequiredMixin, CreateView):
                 # Padrão para tipos não mapeados
                 context_file.file_type = 'txt'
         
-        # Salvar tamanho do arquivo
+        # Salvar tamanho e hash do arquivo (chave do cache de extração)
         if context_file.file:
             context_file.file_size = context_file.file.size
+            context_file.content_hash = ingestion.content_hash(context_file.file)
             
         context_file.status = 'processing'
         context_file.save()
         
-        # Processar arquivo em background (simplificado - pode ser movido para Celery)
-        self.process_file_content(context_file)
+        # Extração em segundo plano (agents.ingestion), fora da requisição
+        transaction.on_commit(lambda: ingestion.enqueue(context_file))
         
-        messages.success(self.request, f'Arquivo "{context_file.name}" enviado com sucesso!')
+        messages.success(self.request, f'Arquivo "{context_file.name}" enviado com sucesso! O conteúdo está sendo processado.')
         return redirect('agents:assistant_detail', pk=llm_config.pk)
     
-    def process_file_content(self, context_file):
-        """
-        Processa o arquivo e extrai o conteúdo
-        """
-        try:
-            file_path = context_file.file.path
-            result = file_processor.process_file(file_path)
-            
-            if result['success']:
-                context_file.extracted_content = result['extracted_text']
-                context_file.status = 'ready'
-                context_file.error_message = None
-            else:
-                context_file.status = 'error'
-                context_file.error_message = result['error']
-                
-        except Exception as e:
-            context_file.status = 'error'
-            context_file.error_message = f'Erro durante processamento: {str(e)}'
-        
-        context_file.save()
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         llm_config_id = self.kwargs.get('llm_config_id')
@@ -391,7 +374,7 @@ class AssistantContextFileDeleteView(LoginRequiredMixin, DeleteView):
                 if os.path.isfile(self.object.file.path):
                     os.remove(self.object.file.path)
             except Exception as e:
-                print(f"Error deleting file: {e}")
+                logger.error('Error deleting file: %s', e)
         
         messages.success(request, f'Arquivo "{file_name}" removido com sucesso!')
         return super().delete(request, *args, **kwargs)
@@ -1,4 +1,4 @@
-import traceback
+import logging
 
 from django.db.models.functions import Lower
 from django.http import QueryDict
@@ -11,6 +11,8 @@ from django.db.models import Q
 from core.exceptions import SmartException
 from core.middleware import RequestMiddleware
 
+logger = logging.getLogger(__name__)
+
 
 class CaseInsensitiveOrderingFilter(OrderingFilter):
     def filter_queryset(self, request, queryset, view):
@@ -75,7 +77,7 @@ class EntityMixin(DestroyModelMixin, GenericAPIView):
         try:
             instance.delete()
         except Exception:
-            traceback.print_exc()
+            logger.exception('Erro ao excluir %s', instance)
             raise SmartException('Você não pode realizar essa ação')
 
 
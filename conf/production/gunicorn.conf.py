@@ -0,0 +1,34 @@
+"""
+Configuração do gunicorn em produção
+Prepara o diretório de métricas multiprocesso do prometheus_client
+(PROMETHEUS_MULTIPROC_DIR deve estar no ambiente antes do gunicorn iniciar)
+e inicia em cada worker a recuperação dos arquivos de contexto presos.
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = '127.0.0.1:8003'
+workers = 2
+timeout = 12000
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior distorceriam contadores e gauges
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # A aplicação Django já foi carregada no worker
+    from agents.ingestion import start_recovery
+
+    start_recovery()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
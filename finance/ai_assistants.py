@@ -1,47 +1,35 @@
+import logging
 from django.utils import timezone
-from django.conf import settings
 from django.db import models
 from django_ai_assistant import AIAssistant, method_tool
 from datetime import datetime, timedelta
 from decimal import Decimal
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agents.llm_factory import InvocationAttribute, get_llm
+from agents.prompt_builder import LayeredPromptMixin
+from . import reports
 from .models import Category, Movement, PaymentMethod
+from .category_retrieval import find_in_catalogue, format_catalogue
+from .prompt_cache import get_context, get_message_categories, get_prompt_fragment
 
-"""Você é um assistente inteligente especializado em gestão financeira.
+logger = logging.getLogger(__name__)
 
-    Você pode ajudar os usuários a:
-    - Registrar receitas e despesas
-    - Listar movimentações financeiras
-    - Verificar saldo por categoria
-    - Criar e gerenciar categorias
-    - Analisar gastos por período
-    - Gerenciar métodos de pagamento para despesas
 
-    Sempre seja útil, preciso e forneça informações claras sobre as finanças.
-    Use as ferramentas disponíveis para registrar e consultar movimentações financeiras.
-
-    IMPORTANTE: Quando usar qualquer ferramenta, retorne EXATAMENTE a resposta da ferramenta, sem adicionar, modificar ou reformular.
-    As ferramentas já retornam mensagens formatadas e completas.
-
-    Para valores monetários, sempre use o formato brasileiro (R$ 100,50).
-    Ao registrar uma movimentação, não é necessário pedir confirmação, apenas registre.
-    Analise e insira na categoria que faça mais sentido.
-
-    Para despesas, sempre especifique o método de pagamento (PIX, Dinheiro, Cartão, etc.).
-    Se não especificado, use "Não especificado" como padrão para despesas."""
-
-class FinanceAIAssistant(AIAssistant):
+class FinanceAIAssistant(LayeredPromptMixin, AIAssistant):
     id = "finance_assistant"
     name = "Assistente de Finanças"
     instructions = ""
     model = "gpt-4o-mini"
 
+    # Vêm do assistant_state() da invocação: a instância é compartilhada entre usuários
+    _user = InvocationAttribute('user')
+    # Mensagem em processamento, usada para selecionar as categorias do prompt
+    current_message = InvocationAttribute('message')
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._user = kwargs.get('user')
         self._llm_config = kwargs.get('llm_config')
+        self.current_message = kwargs.get('current_message')
 
         # Sobrescrever configurações se llm_config for fornecido
         if self._llm_config:
@@ -50,81 +38,41 @@ class FinanceAIAssistant(AIAssistant):
             if self._llm_config.instructions:
                 self.instructions = self._llm_config.instructions
 
-    def get_instructions(self):
-        base_instructions = f"{self.instructions}\n\nData e hora atual: {timezone.now().strftime('%d/%m/%Y %H:%M')}"
+    def get_prompt_sections(self):
+        sections = {'instructions': self.instructions}
 
-        # Adicionar lista de categorias disponíveis do usuário
+        # Categorias e métodos de pagamento do usuário (cacheados, invalidados via signals)
         if self._user:
-            categories = Category.objects.filter(user=self._user, is_active=True).order_by('name')
-            if categories.exists():
-                categorias_lista = "\n".join([f"  - {cat.name}" for cat in categories])
-                base_instructions += f"\n\n**CATEGORIAS DISPONÍVEIS DO USUÁRIO:**\n{categorias_lista}\n\nIMPORTANTE: Use EXATAMENTE um desses nomes de categoria ao registrar movimentações. Escolha a categoria que melhor se encaixa na descrição da movimentação."
+            sections['catalogue'] = get_prompt_fragment(self._user)
+            # Catálogos grandes: seleção por mensagem, junto da mensagem atual (agents.prompt_builder)
+            sections['categories'] = get_message_categories(self._user, self.current_message)
 
-            # Adicionar lista de métodos de pagamento disponíveis
-            payment_methods = PaymentMethod.objects.filter(
-                models.Q(user=self._user) | models.Q(user__isnull=True),
-                is_active=True
-            ).order_by('name')
-
-            if payment_methods.exists():
-                metodos_lista = "\n".join([f"  - {method.name}" for method in payment_methods])
-                base_instructions += f"\n\n**MÉTODOS DE PAGAMENTO DISPONÍVEIS:**\n{metodos_lista}\n\nIMPORTANTE: Para despesas, sempre especifique o método de pagamento usando EXATAMENTE um desses nomes. Se não especificado, use 'Não especificado' como padrão."
-
-        return base_instructions
+        return sections
 
     def get_llm(self):
         if not self._llm_config:
             return super().get_llm()
-
-        provider = self._llm_config.name
-
-        if provider == "openai":
-            return ChatOpenAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                presence_penalty=self._llm_config.presence_penalty,
-                frequency_penalty=self._llm_config.frequency_penalty,
-                openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-            )
-        elif provider == "anthropic":
-            return ChatAnthropic(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                anthropic_api_key=getattr(settings, 'ANTHROPIC_API_KEY', '')
-            )
-        elif provider == "google":
-            return ChatGoogleGenerativeAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_output_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                google_api_key=getattr(settings, 'GOOGLE_API_KEY', '')
-            )
-        else:
-            return ChatOpenAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-            )
+        return get_llm(self._llm_config)
 
     @method_tool
-    def listar_movimentacoes(self, limite: int = 500, tipo: str = "", categoria: str = "", data_inicial: str = "", data_final: str = "") -> str:
-        """Lista as movimentações financeiras
+    def listar_movimentacoes(self, limite: int = 20, tipo: str = "", categoria: str = "", data_inicial: str = "", data_final: str = "", cursor: str = "", formato: str = "compacto") -> str:
+        """Lista as movimentações financeiras com o resumo do período (totais, quantidade e maiores categorias de despesa)
+
+        A saída compacta tem uma linha por movimentação (data|valor|descricao|categoria|pagamento);
+        monte a resposta ao usuário a partir dela. Os totais já consideram todo o período filtrado:
+        só peça a próxima página (cursor) se o usuário quiser ver mais movimentações.
 
         Args:
-            limite: Número máximo de movimentações para retornar (padrão: 10)
+            limite: Número de movimentações por página (padrão: 20, máximo: 100)
             tipo: Filtro por tipo ('income' para receitas, 'expense' para despesas, vazio para todos)
             categoria: Nome da categoria para filtrar (opcional)
             data_inicial: Data inicial no formato DD/MM/YYYY (opcional)
             data_final: Data final no formato DD/MM/YYYY (opcional)
+            cursor: Cursor da próxima página, informado na linha 'mais N: cursor=...' (opcional)
+            formato: 'compacto' (padrão) ou 'whatsapp' (texto já formatado para o usuário)
 
         Returns:
-            String com as movimentações formatadas ou mensagem de erro
+            String com o resumo e as movimentações ou mensagem de erro
         """
         try:
             user = self._user
@@ -138,7 +86,7 @@ class FinanceAIAssistant(AIAssistant):
                 queryset = queryset.filter(category__name__icontains=categoria)
 
             # Filtrar por período (data do movimento, não data de criação)
-            print(f'data_inicial: {data_inicial}')
+            logger.debug('data_inicial: %s', data_inicial)
             if data_inicial:
                 try:
                     data_inicio = datetime.strptime(data_inicial, '%d/%m/%Y').date()
@@ -146,7 +94,7 @@ class FinanceAIAssistant(AIAssistant):
                 except ValueError:
                     return "❌ Formato de data inicial inválido. Use DD/MM/YYYY (ex: 25/12/2024)"
 
-            print(f'data_final: {data_final}')
+            logger.debug('data_final: %s', data_final)
             if data_final:
                 try:
                     data_fim = datetime.strptime(data_final, '%d/%m/%Y').date()
@@ -154,44 +102,19 @@ class FinanceAIAssistant(AIAssistant):
                 except ValueError:
                     return "❌ Formato de data final inválido. Use DD/MM/YYYY (ex: 25/12/2024)"
 
-            movements = queryset.order_by('-date', '-created_at')[:limite]
+            # Totais do filtro inteiro, calculados no banco; só uma página de linhas
+            try:
+                movements, next_cursor, remaining = reports.page(queryset, limite, cursor)
+            except ValueError:
+                return "❌ Cursor inválido. Use o cursor informado na última listagem ou liste de novo sem cursor."
 
-            if not movements:
+            if not movements and not cursor:
                 return "💰 Você ainda não tem movimentações registradas."
 
-            movimentacoes_formatadas = ["💰 *Suas Movimentações:*\n"]
-
-            total_receitas = sum(m.amount for m in movements if m.type == 'income')
-            total_despesas = sum(m.amount for m in movements if m.type == 'expense')
-            saldo = total_receitas - total_despesas
-
-            for i, movement in enumerate(movements, 1):
-                tipo_icon = "📈" if movement.type == 'income' else "📉"
-                sinal = "+" if movement.type == 'income' else "-"
-                cor = "🟢" if movement.type == 'income' else "🔴"
-
-                data_formatada = movement.date.strftime('%d/%m/%Y')
-
-                movimento_info = f"{i}. {tipo_icon} *{movement.description}*\n"
-                movimento_info += f"   {cor} {sinal}R$ {movement.amount:.2f}\n"
-                movimento_info += f"   📅 {data_formatada}\n"
-                movimento_info += f"   🏷️ {movement.category.name}"
-
-                # Adicionar método de pagamento se for despesa
-                if movement.type == 'expense' and movement.payment_method:
-                    movimento_info += f"\n   💳 {movement.payment_method.name}"
-
-                movimentacoes_formatadas.append(movimento_info)
-
-            resultado = "\n\n".join(movimentacoes_formatadas)
-
-            # Adicionar resumo
-            resultado += f"\n\n📊 *Resumo do período:*\n"
-            resultado += f"📈 Receitas: R$ {total_receitas:.2f}\n"
-            resultado += f"📉 Despesas: R$ {total_despesas:.2f}\n"
-            resultado += f"💰 Saldo: R$ {saldo:.2f}"
-
-            return resultado
+            summary = reports.summarize(queryset)
+            if formato == reports.WHATSAPP:
+                return reports.render_whatsapp(summary, movements, remaining)
+            return reports.render_compact(summary, movements, next_cursor, remaining)
 
         except Exception as e:
             return f"❌ Erro interno ao listar movimentações: {str(e)}"
@@ -212,7 +135,7 @@ class FinanceAIAssistant(AIAssistant):
             tipo: Tipo da movimentação ('income' para receita, 'expense' para despesa)
             valor: Valor da movimentação (sempre positivo)
             descricao: Descrição da movimentação
-            categoria: Nome da categoria
+            categoria: ID curto da categoria (ex: c3) ou nome da categoria
             data: Data no formato DD/MM/YYYY (opcional, usa data atual se vazio)
             metodo_pagamento: Método de pagamento (obrigatório para despesas, opcional para receitas)
 
@@ -241,15 +164,15 @@ class FinanceAIAssistant(AIAssistant):
 
             user = self._user
 
-            category = Category.objects.filter(user=user, name__iexact=categoria, is_active=True).first()
+            catalogue = get_context(user)['categories']
+            entry = find_in_catalogue(catalogue, categoria)
+            category = Category.objects.filter(pk=entry['pk'], user=user, is_active=True).first() if entry else None
 
             if not category:
-                available_categories = Category.objects.filter(user=user, is_active=True).values_list('name', flat=True)
-                if not available_categories:
+                if not catalogue:
                     return "❌ Você ainda não possui categorias cadastradas."
 
-                categories_list = "\n".join([f"  - {cat}" for cat in available_categories])
-                return f"❌ Categoria '{categoria}' não encontrada. Use EXATAMENTE um dos nomes disponíveis:\n\n{categories_list}"
+                return f"❌ Categoria '{categoria}' não encontrada. Use o id ou o nome de uma das categorias (id nome):\n\n{format_catalogue(catalogue)}"
 
             # Processar método de pagamento para despesas
             payment_method = None
@@ -305,75 +228,32 @@ class FinanceAIAssistant(AIAssistant):
             return f"❌ Erro interno ao registrar movimentação: {str(e)}"
 
     @method_tool
-    def saldo_por_categoria(self, periodo_dias: int = 30) -> str:
+    def saldo_por_categoria(self, periodo_dias: int = 30, formato: str = "compacto") -> str:
         """Mostra o saldo por categoria nos últimos dias
 
+        A saída compacta é uma tabela (categoria|receitas|despesas|saldo|qtd) com a linha TOTAL;
+        monte a resposta ao usuário a partir dela.
+
         Args:
             periodo_dias: Número de dias para considerar (padrão: 30)
+            formato: 'compacto' (padrão) ou 'whatsapp' (texto já formatado para o usuário)
 
         Returns:
-            String com saldo por categoria formatado
+            String com saldo por categoria
         """
         try:
             user = self._user
             data_inicio = timezone.now().date() - timedelta(days=periodo_dias)
 
-            movements = Movement.objects.filter(user=user, date__gte=data_inicio)
+            # Agrupado por categoria no banco
+            rows = reports.by_category(Movement.objects.filter(user=user, date__gte=data_inicio))
 
-            if not movements:
+            if not rows:
                 return f"💰 Não há movimentações nos últimos {periodo_dias} dias."
 
-            # Agrupar por categoria
-            categorias = {}
-            for movement in movements:
-                categoria_nome = movement.category.name
-                if categoria_nome not in categorias:
-                    categorias[categoria_nome] = {
-                        'receitas': Decimal('0'),
-                        'despesas': Decimal('0'),
-                        'quantidade': 0
-                    }
-
-                if movement.type == 'income':
-                    categorias[categoria_nome]['receitas'] += movement.amount
-                else:
-                    categorias[categoria_nome]['despesas'] += movement.amount
-
-                categorias[categoria_nome]['quantidade'] += 1
-
-            # Formatar resposta
-            resultado = [f"📊 *Saldo por Categoria - Últimos {periodo_dias} dias:*\n"]
-
-            total_receitas = Decimal('0')
-            total_despesas = Decimal('0')
-
-            for categoria_nome, dados in sorted(categorias.items()):
-                saldo_categoria = dados['receitas'] - dados['despesas']
-                total_receitas += dados['receitas']
-                total_despesas += dados['despesas']
-
-                cor = "🟢" if saldo_categoria >= 0 else "🔴"
-                sinal = "+" if saldo_categoria >= 0 else ""
-
-                categoria_info = f"🏷️ *{categoria_nome}*\n"
-                categoria_info += f"   📈 Receitas: R$ {dados['receitas']:.2f}\n"
-                categoria_info += f"   📉 Despesas: R$ {dados['despesas']:.2f}\n"
-                categoria_info += f"   {cor} Saldo: {sinal}R$ {saldo_categoria:.2f}\n"
-                categoria_info += f"   📊 {dados['quantidade']} movimentações"
-
-                resultado.append(categoria_info)
-
-            # Totais
-            saldo_total = total_receitas - total_despesas
-            cor_total = "🟢" if saldo_total >= 0 else "🔴"
-            sinal_total = "+" if saldo_total >= 0 else ""
-
-            resultado.append(f"\n💰 *RESUMO GERAL:*")
-            resultado.append(f"📈 Total Receitas: R$ {total_receitas:.2f}")
-            resultado.append(f"📉 Total Despesas: R$ {total_despesas:.2f}")
-            resultado.append(f"{cor_total} *Saldo Final: {sinal_total}R$ {saldo_total:.2f}*")
-
-            return "\n\n".join(resultado)
+            if formato == reports.WHATSAPP:
+                return reports.render_categories_whatsapp(rows, periodo_dias)
+            return reports.render_categories_compact(rows, periodo_dias)
 
         except Exception as e:
             return f"❌ Erro interno ao calcular saldo por categoria: {str(e)}"
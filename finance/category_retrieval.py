@@ -0,0 +1,184 @@
+"""
+Catálogo compacto de categorias e seleção top-k por mensagem
+Cada categoria recebe um ID curto (c1, c2...) na ordem alfabética e o nome
+sem o emoji. Para catálogos grandes demais para o prefixo cacheado
+(finance.prompt_cache), apenas as mais relevantes para a mensagem
+(palavras-chave + TF-IDF + frequência de uso) vão junto dela; sem confiança
+suficiente, o catálogo completo é usado.
+"""
+import math
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+STOPWORDS = {
+    'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma', 'uns', 'umas',
+    'com', 'por', 'para', 'pra', 'pro', 'que', 'os', 'as', 'ao', 'aos', 'mais', 'menos', 'meu',
+    'minha', 'meus', 'minhas', 'seu', 'sua', 'hoje', 'ontem', 'amanha', 'reais', 'real', 'gastei',
+    'paguei', 'comprei', 'recebi', 'registra', 'registrar', 'anota', 'anotar', 'valor', 'conta',
+}
+
+# Tamanho do prefixo usado como "stem": cobre plurais e flexões comuns do português
+STEM_LENGTH = 6
+
+# Peso da frequência de uso no score final (o lexical domina)
+USAGE_WEIGHT = 0.15
+
+# Janela (dias) para contar o uso de cada categoria
+USAGE_WINDOW_DAYS = 90
+
+_EMOJI_PREFIX = re.compile(r'^[^\w(]+', re.UNICODE)
+_SHORT_ID = re.compile(r'^c(\d+)$', re.IGNORECASE)
+
+
+def strip_emoji(name):
+    """'🏠 Aluguel' -> 'Aluguel'"""
+    return _EMOJI_PREFIX.sub('', name).strip() or name.strip()
+
+
+def normalize(text):
+    """Minúsculas e sem acentos"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    tokens = re.findall(r'[a-z]+', normalize(text))
+    return [token[:STEM_LENGTH] for token in tokens if len(token) >= 3 and token not in STOPWORDS]
+
+
+def build_catalogue(user):
+    """
+    Lista das categorias ativas do usuário no formato usado pelo prompt e
+    pelo retriever. Serializável, para ser guardada no cache.
+    """
+    from .models import Category
+
+    rows = Category.objects.filter(user=user, is_active=True).values_list('pk', 'name', 'description')
+    rows = sorted(rows, key=lambda row: normalize(strip_emoji(row[1])))
+    catalogue = []
+    for index, (pk, name, description) in enumerate(rows, 1):
+        label = strip_emoji(name)
+        catalogue.append({
+            'id': f'c{index}',
+            'pk': str(pk),
+            'name': name,
+            'label': label,
+            'name_tokens': sorted(set(tokenize(label))),
+            'tokens': tokenize(f"{label} {description}"),
+        })
+    return catalogue
+
+
+def usage_counts(user):
+    """Movimentações por categoria na janela recente: {pk: quantidade}"""
+    from .models import Movement
+
+    since = timezone.now().date() - timedelta(days=USAGE_WINDOW_DAYS)
+    rows = (
+        Movement.objects.filter(user=user, date__gte=since)
+        .values('category_id')
+        .annotate(total=Count('id'))
+    )
+    return {str(row['category_id']): row['total'] for row in rows}
+
+
+class CategoryRetriever:
+    """
+    Ranqueia as categorias do catálogo para uma mensagem:
+    - TF-IDF (cosseno) entre a mensagem e nome + descrição da categoria
+    - bônus quando o nome da categoria aparece na mensagem (palavra-chave)
+    - prior de frequência de uso do próprio usuário
+    """
+
+    def __init__(self, catalogue, usage=None):
+        self.catalogue = catalogue
+        self.usage = usage or {}
+
+        document_frequency = {}
+        for entry in catalogue:
+            for token in set(entry['tokens']):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        total = len(catalogue) or 1
+        self.idf = {token: math.log((1 + total) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+        self.vectors = []
+        for entry in catalogue:
+            weights = {}
+            for token in entry['tokens']:
+                weights[token] = weights.get(token, 0) + self.idf[token]
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1
+            self.vectors.append({token: w / norm for token, w in weights.items()})
+
+        max_usage = max(self.usage.values(), default=0)
+        self.usage_norm = math.log1p(max_usage) or 1
+
+    def score(self, message):
+        """Lista de (score_lexical, score_final, entrada) para cada categoria"""
+        query_tokens = set(tokenize(message))
+        query_weights = {token: self.idf[token] for token in query_tokens if token in self.idf}
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values())) or 1
+
+        results = []
+        for entry, vector in zip(self.catalogue, self.vectors):
+            lexical = sum(weight * vector.get(token, 0) for token, weight in query_weights.items()) / query_norm
+            if entry['name_tokens'] and set(entry['name_tokens']) <= query_tokens:
+                lexical += 1.0
+            prior = math.log1p(self.usage.get(entry['pk'], 0)) / self.usage_norm
+            results.append((lexical, lexical + USAGE_WEIGHT * prior, entry))
+        return results
+
+    def select(self, message, k=None, min_score=None):
+        """
+        Retorna (categorias, parcial). Com confiança baixa (nenhuma categoria
+        acima de `min_score`), retorna o catálogo completo e parcial=False.
+        """
+        k = k or getattr(settings, 'FINANCE_CATEGORY_TOP_K', 8)
+        min_score = min_score if min_score is not None else getattr(settings, 'FINANCE_CATEGORY_MIN_SCORE', 0.2)
+
+        if not message or len(self.catalogue) <= k:
+            return self.catalogue, False
+
+        scored = self.score(message)
+        if max(lexical for lexical, _, _ in scored) < min_score:
+            return self.catalogue, False
+
+        # Só entram categorias com alguma evidência (termos em comum ou uso)
+        scored = [item for item in scored if item[1] > 0]
+        scored.sort(key=lambda item: -item[1])
+        selected = [entry for _, _, entry in scored[:k]]
+        selected.sort(key=lambda entry: int(entry['id'][1:]))
+        return selected, True
+
+
+def format_catalogue(entries):
+    """'c1 Aluguel; c2 Condomínio; ...'"""
+    return "; ".join(f"{entry['id']} {entry['label']}" for entry in entries)
+
+
+def find_in_catalogue(catalogue, value):
+    """
+    Localiza a categoria pelo ID curto (c12), pelo nome exato ou pelo
+    nome sem emoji, ignorando maiúsculas e acentos.
+    """
+    value = (value or '').strip()
+    if not value:
+        return None
+
+    match = _SHORT_ID.match(value)
+    if match:
+        short_id = f'c{int(match.group(1))}'
+        for entry in catalogue:
+            if entry['id'] == short_id:
+                return entry
+
+    wanted = normalize(strip_emoji(value))
+    for entry in catalogue:
+        if normalize(entry['name']) == normalize(value) or normalize(entry['label']) == wanted:
+            return entry
+    return None
@@ -0,0 +1,450 @@
+"""
+Atalho determinístico para as mensagens financeiras mais comuns
+"gastei R$ 50 no supermercado", "recebi 1200 de salário" e "quanto gastei este
+mês" são interpretadas por regras (intenção, valor no formato brasileiro, data
+relativa, categoria por palavras-chave) e executadas direto nas ferramentas do
+FinanceAIAssistant, sem passar pelo LLM. Só interpretações com confiança acima
+de FINANCE_FAST_PATH_MIN_CONFIDENCE são executadas; o resto segue para o agente.
+
+FINANCE_FAST_PATH:
+- 'on': responde direto quando confiante
+- 'shadow': só interpreta; a resposta vem do LLM e as duas são comparadas
+- 'off': desligado
+
+Sempre que o LLM responde a uma mensagem interpretada, as ferramentas que ele
+chamou são comparadas com a interpretação (métrica de concordância).
+"""
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from monitoring.metrics import FAST_PATH_AGREEMENT, FAST_PATH_REQUESTS
+from .category_retrieval import CategoryRetriever, find_in_catalogue, normalize, tokenize
+from .prompt_cache import get_context, get_usage
+
+logger = logging.getLogger(__name__)
+
+# Termos comuns que não aparecem no nome/descrição das categorias padrão
+KEYWORDS = {
+    'mercado': 'supermercado',
+    'ifood': 'delivery',
+    'rappi': 'delivery',
+    'remedio': 'farmacia',
+    'remedios': 'farmacia',
+    'pao': 'padaria',
+    'almoco': 'restaurante',
+    'jantar': 'restaurante',
+    'netflix': 'streaming',
+    'spotify': 'streaming',
+    'uber': 'taxi',
+    'taxi': 'uber',
+    'luz': 'energia',
+}
+
+# Palavras que identificam um método de pagamento pelo nome cadastrado
+PAYMENT_ALIASES = {
+    'pix': 'pix',
+    'dinheiro': 'dinheiro',
+    'especie': 'dinheiro',
+    'credito': 'credito',
+    'debito': 'debito',
+    'boleto': 'boleto',
+    'cheque': 'cheque',
+}
+
+# Palavras de ligação removidas das pontas da descrição
+FILLER_WORDS = {
+    'no', 'na', 'nos', 'nas', 'em', 'de', 'do', 'da', 'dos', 'das', 'com', 'pro', 'pra',
+    'para', 'o', 'a', 'os', 'as', 'um', 'uma', 'e', 'reais', 'real', 'pelo', 'pela', 'via',
+}
+
+MAX_DESCRIPTION_WORDS = 6
+
+_REGISTER = re.compile(
+    r'^\s*(?:eu\s+)?(?:(?P<expense>gastei|paguei|comprei)|(?P<income>recebi|ganhei))\b'
+)
+_REPORT = re.compile(r'^\s*quanto\s+(?:eu\s+)?(?:(?P<expense>gastei)|(?P<income>recebi|ganhei))\b')
+
+_AMOUNT = re.compile(
+    r'(?:r\$\s*)?'
+    r'(?<![\d/,.])(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+[.,]\d{1,2}|\d+)(?![\d/]|[.,]\d)'
+    r'(?:\s*(mil)\b)?'
+    r'(?:\s*(?:reais|real|conto|contos|pila)\b)?'
+)
+
+_WEEKDAYS = ('segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo')
+_RELATIVE_DAYS = {'hoje': 0, 'ontem': 1, 'anteontem': 2}
+
+_DATE = re.compile(
+    r'\b(?:(?:n[oa]|em|dia)\s+)?'
+    r'(?:(?P<relative>hoje|anteontem|ontem)'
+    r'|(?P<day>\d{1,2})/(?P<month>\d{1,2})(?:/(?P<year>\d{2}|\d{4}))?'
+    r'|dia\s+(?P<month_day>\d{1,2})'
+    r'|(?P<weekday>' + '|'.join(_WEEKDAYS) + r')(?:-feira)?(?:\s+passad[oa])?)\b'
+)
+
+_PERIOD = re.compile(
+    r'\b(?:(?P<today>hoje)|(?P<yesterday>ontem)'
+    r'|(?:n?est[ae]|n?ess[ae])\s+(?P<this>semana|mes|ano)'
+    r'|(?:n[oa]\s+)?(?P<last>semana|mes|ano)\s+passad[oa]'
+    r'|(?:n[oa]s?\s+)?ultimos\s+(?P<days>\d{1,3})\s+dias)\b'
+)
+
+
+def _fold(text):
+    """Minúsculas sem acentos, com o mesmo comprimento do texto (as posições valem para o original)"""
+    return ''.join(normalize(ch)[:1] or ch for ch in text)
+
+
+def parse_amount(number, thousands=None):
+    """'1.200,50' -> 1200.5; '50,5' -> 50.5; '12.5' -> 12.5; '2' + 'mil' -> 2000.0"""
+    if re.fullmatch(r'\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?', number):
+        number = number.replace('.', '').replace(',', '.')
+    else:
+        number = number.replace(',', '.')
+    value = float(number)
+    return value * 1000 if thousands else value
+
+
+def _resolve_date(match, today):
+    if match.group('relative'):
+        return today - timedelta(days=_RELATIVE_DAYS[match.group('relative')])
+
+    if match.group('day'):
+        year = match.group('year')
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+        try:
+            date = today.replace(year=year or today.year, month=int(match.group('month')), day=int(match.group('day')))
+        except ValueError:
+            return None
+        # Sem ano, uma data futura se refere ao ano passado
+        if not year and date > today:
+            date = date.replace(year=date.year - 1)
+        return date
+
+    if match.group('month_day'):
+        day = int(match.group('month_day'))
+        month_start = today.replace(day=1)
+        # Dia ainda não chegado neste mês: mês anterior
+        if day > today.day:
+            month_start = (month_start - timedelta(days=1)).replace(day=1)
+        try:
+            return month_start.replace(day=day)
+        except ValueError:
+            return None
+
+    # Dia da semana: a ocorrência mais recente antes de hoje
+    weekday = _WEEKDAYS.index(match.group('weekday'))
+    return today - timedelta(days=(today.weekday() - weekday - 1) % 7 + 1)
+
+
+def _resolve_period(match, today):
+    if match.group('today'):
+        return today, today
+    if match.group('yesterday'):
+        day = today - timedelta(days=1)
+        return day, day
+    if match.group('days'):
+        return today - timedelta(days=int(match.group('days'))), today
+
+    unit = match.group('this') or match.group('last')
+    if unit == 'semana':
+        start = today - timedelta(days=today.weekday())
+        if match.group('last'):
+            return start - timedelta(days=7), start - timedelta(days=1)
+        return start, today
+    if unit == 'mes':
+        start = today.replace(day=1)
+        if match.group('last'):
+            end = start - timedelta(days=1)
+            return end.replace(day=1), end
+        return start, today
+    start = today.replace(month=1, day=1)
+    if match.group('last'):
+        return start.replace(year=start.year - 1), start - timedelta(days=1)
+    return start, today
+
+
+def _match_payment_method(folded, methods):
+    """(nome do método, span) do método citado na mensagem, ou (None, None)"""
+    candidates = []
+    for name in methods:
+        folded_name = _fold(name)
+        if folded_name == 'nao especificado':
+            continue
+        candidates.append((name, folded_name))
+
+    # Nome completo cadastrado (inclui métodos personalizados do usuário)
+    for name, folded_name in sorted(candidates, key=lambda item: -len(item[1])):
+        match = re.search(r'\b(?:(?:n[oa]|em|com|pelo|via)\s+)?' + re.escape(folded_name) + r'\b', folded)
+        if match:
+            return name, match.span()
+
+    for alias, target in PAYMENT_ALIASES.items():
+        match = re.search(r'\b(?:(?:n[oa]|em|com|pelo|via)\s+)?(?:cartao\s+(?:de\s+)?)?' + alias + r'\b', folded)
+        if not match:
+            continue
+        names = [name for name, folded_name in candidates if target in folded_name.split()]
+        if len(names) == 1:
+            return names[0], match.span()
+    return None, None
+
+
+def _remaining_text(text, spans):
+    """Texto original fora dos trechos já interpretados, sem palavras de ligação nas pontas"""
+    parts = []
+    position = 0
+    for start, end in sorted(spans):
+        parts.append(text[position:start])
+        position = max(position, end)
+    parts.append(text[position:])
+
+    words = re.findall(r'[\w/-]+', ' '.join(parts))
+    while words and _fold(words[0]) in FILLER_WORDS:
+        words.pop(0)
+    while words and _fold(words[-1]) in FILLER_WORDS:
+        words.pop()
+    return ' '.join(words)
+
+
+def _category(user, description):
+    """(entrada do catálogo, confiança) da categoria que melhor descreve o texto"""
+    catalogue = get_context(user)['categories']
+    if not catalogue or not description:
+        return None, 0.0
+
+    words = re.findall(r'[a-z]+', normalize(description))
+    query = ' '.join([description] + [KEYWORDS[word] for word in words if word in KEYWORDS])
+    if not tokenize(query):
+        return None, 0.0
+
+    scored = sorted(CategoryRetriever(catalogue, get_usage(user)).score(query), key=lambda item: -item[1])
+    best = scored[0]
+    second = scored[1] if len(scored) > 1 else (0.0, 0.0, None)
+
+    # Nome da categoria citado na mensagem e por nenhuma outra
+    if best[0] >= 1.0 and second[0] < 1.0:
+        return best[2], 1.0
+    if best[0] >= 0.5 and best[1] - second[1] >= 0.25:
+        return best[2], 0.85
+    return best[2], 0.4
+
+
+def _parse_register(message, folded, match, user, today):
+    tipo = 'expense' if match.group('expense') else 'income'
+    confidence = {'intent': 1.0}
+    spans = [match.span()]
+
+    date_matches = list(_DATE.finditer(folded))
+    date = None
+    if date_matches:
+        date = _resolve_date(date_matches[0], today)
+        spans.extend(m.span() for m in date_matches)
+    confidence['date'] = 1.0 if len(date_matches) <= 1 and (date or not date_matches) else 0.3
+
+    # Valores fora das datas já reconhecidas
+    amounts = [
+        m for m in _AMOUNT.finditer(folded)
+        if not any(start <= m.start(1) < end for start, end in spans)
+    ]
+    if len(amounts) != 1:
+        return None
+    valor = parse_amount(amounts[0].group(1), amounts[0].group(2))
+    if valor <= 0:
+        return None
+    spans.append(amounts[0].span())
+
+    metodo_pagamento = ''
+    if tipo == 'expense':
+        metodo_pagamento, span = _match_payment_method(folded, get_context(user)['payment_methods'])
+        if span:
+            spans.append(span)
+        metodo_pagamento = metodo_pagamento or ''
+
+    description = _remaining_text(message, spans)
+    entry, confidence['category'] = _category(user, description)
+
+    word_count = len(description.split())
+    confidence['description'] = 1.0 if 0 < word_count <= MAX_DESCRIPTION_WORDS else 0.4
+    # Perguntas, negações e "no cartão" sem crédito/débito ficam para o LLM
+    ambiguous = '?' in message or re.search(r'\bnao\b', folded) or re.search(r'\bcartao\b', _fold(description))
+    confidence['ambiguity'] = 0.3 if ambiguous else 1.0
+
+    return {
+        'intent': 'register',
+        'tool': 'registrar_movimentacao',
+        'args': {
+            'tipo': tipo,
+            'valor': valor,
+            'descricao': description[:1].upper() + description[1:],
+            'categoria': entry['id'] if entry else '',
+            'data': date.strftime('%d/%m/%Y') if date and date != today else '',
+            'metodo_pagamento': metodo_pagamento,
+        },
+        'category_pk': entry['pk'] if entry else None,
+        'date': date or today,
+        'confidence': min(confidence.values()),
+        'scores': confidence,
+    }
+
+
+def _parse_report(message, folded, match, user, today):
+    tipo = 'expense' if match.group('expense') else 'income'
+    confidence = {'intent': 1.0}
+    spans = [match.span()]
+
+    periods = list(_PERIOD.finditer(folded))
+    if periods:
+        data_inicial, data_final = _resolve_period(periods[0], today)
+        spans.extend(m.span() for m in periods)
+    else:
+        # Sem período explícito: mês atual, com confiança menor
+        data_inicial, data_final = today.replace(day=1), today
+    confidence['period'] = 1.0 if len(periods) == 1 else 0.5
+
+    rest = _remaining_text(message.rstrip('?!. '), spans)
+    entry = None
+    if rest:
+        entry, confidence['category'] = _category(user, rest)
+        if len(rest.split()) > 3:
+            confidence['category'] = min(confidence['category'], 0.4)
+
+    return {
+        'intent': 'report',
+        'tool': 'listar_movimentacoes',
+        'args': {
+            'tipo': tipo,
+            'categoria': entry['label'] if entry else '',
+            'data_inicial': data_inicial.strftime('%d/%m/%Y'),
+            'data_final': data_final.strftime('%d/%m/%Y'),
+            # Resposta enviada direto ao usuário, sem passar pelo LLM
+            'formato': 'whatsapp',
+        },
+        'category_pk': entry['pk'] if entry else None,
+        'confidence': min(confidence.values()),
+        'scores': confidence,
+    }
+
+
+def parse(message, user, today=None):
+    """
+    Interpreta a mensagem. Retorna None quando não é um dos padrões
+    conhecidos, ou um dict com intent, tool, args e confidence (0 a 1).
+    """
+    if not message or not message.strip() or len(message) > 200:
+        return None
+    today = today or timezone.localdate()
+    folded = _fold(message)
+
+    match = _REPORT.match(folded)
+    if match:
+        return _parse_report(message, folded, match, user, today)
+
+    match = _REGISTER.match(folded)
+    if match:
+        return _parse_register(message, folded, match, user, today)
+    return None
+
+
+def get_mode():
+    return getattr(settings, 'FINANCE_FAST_PATH', 'on')
+
+
+def is_confident(prediction):
+    return prediction['confidence'] >= getattr(settings, 'FINANCE_FAST_PATH_MIN_CONFIDENCE', 0.8)
+
+
+def handle(assistant, user, message):
+    """
+    Tenta responder pela interpretação determinística. Deve ser chamado
+    dentro de assistant_state() (as ferramentas usam o usuário da invocação).
+
+    Returns:
+        tuple: (interpretação ou None, resposta ou None). Sem resposta, a
+        mensagem segue para o LLM e a interpretação serve para compare().
+    """
+    mode = get_mode()
+    if mode == 'off' or not user:
+        return None, None
+
+    prediction = parse(message, user)
+    if prediction is None:
+        FAST_PATH_REQUESTS.labels('none', 'miss').inc()
+        return None, None
+
+    confident = is_confident(prediction)
+    logger.info('Atalho de finanças (%s): %s %s confiança %.2f %s',
+                mode, prediction['intent'], prediction['args'], prediction['confidence'], prediction['scores'])
+
+    if not confident:
+        FAST_PATH_REQUESTS.labels(prediction['intent'], 'low_confidence').inc()
+        return prediction, None
+    if mode != 'on':
+        FAST_PATH_REQUESTS.labels(prediction['intent'], 'shadow').inc()
+        return prediction, None
+
+    reply = getattr(assistant, prediction['tool'])(**prediction['args'])
+    if reply.startswith('❌'):
+        # A ferramenta recusou (ex: método de pagamento inexistente): o LLM conduz a conversa
+        logger.warning('Atalho de finanças recusado pela ferramenta: %s', reply[:200])
+        FAST_PATH_REQUESTS.labels(prediction['intent'], 'rejected').inc()
+        return prediction, None
+
+    FAST_PATH_REQUESTS.labels(prediction['intent'], 'hit').inc()
+    return prediction, reply
+
+
+def _same_register(prediction, call, user):
+    args = call['args']
+    expected = prediction['args']
+    if args.get('tipo') != expected['tipo']:
+        return False
+    try:
+        if abs(float(args.get('valor', 0)) - expected['valor']) >= 0.01:
+            return False
+    except (TypeError, ValueError):
+        return False
+
+    entry = find_in_catalogue(get_context(user)['categories'], str(args.get('categoria', '')))
+    if not entry or entry['pk'] != prediction['category_pk']:
+        return False
+
+    # Sem data, a ferramenta usa hoje
+    date = args.get('data') or timezone.localdate().strftime('%d/%m/%Y')
+    return date == prediction['date'].strftime('%d/%m/%Y')
+
+
+def _same_report(prediction, call):
+    args = call['args']
+    expected = prediction['args']
+    return (
+        args.get('tipo', '') == expected['tipo']
+        and args.get('data_inicial', '') == expected['data_inicial']
+        and args.get('data_final', '') == expected['data_final']
+    )
+
+
+def compare(prediction, messages, user):
+    """
+    Compara a interpretação com as ferramentas chamadas pelo LLM
+    (`messages`: mensagens geradas na execução do agente).
+    """
+    calls = [call for message in messages for call in (getattr(message, 'tool_calls', None) or [])]
+    tool_calls = [call for call in calls if call['name'] == prediction['tool']]
+
+    if not tool_calls:
+        result = 'disagree'
+    elif prediction['intent'] == 'register':
+        result = 'agree' if len(tool_calls) == 1 and _same_register(prediction, tool_calls[0], user) else 'disagree'
+    else:
+        result = 'agree' if any(_same_report(prediction, call) for call in tool_calls) else 'disagree'
+
+    FAST_PATH_AGREEMENT.labels(prediction['intent'], result).inc()
+    log = logger.info if result == 'agree' else logger.warning
+    log('Atalho de finanças vs LLM: %s (atalho %s; LLM %s)',
+        result, prediction['args'], [(call['name'], call['args']) for call in calls])
+    return result
@@ -0,0 +1,132 @@
+"""
+Cache do contexto usado no system prompt do FinanceAIAssistant
+O catálogo de categorias e os métodos de pagamento do usuário mudam raramente;
+ficam no cache até um signal de Category/PaymentMethod invalidá-los (ver
+finance/signals.py). A frequência de uso das categorias, que só influencia o
+ranking, expira sozinha.
+
+Catálogos de até FINANCE_CATEGORY_PREFIX_MAX_CHARS caracteres vão inteiros no
+prefixo cacheado pelo provedor (camada do usuário). Nos maiores, o prefixo só
+explica o formato e cada mensagem leva as categorias mais relevantes para ela
+(CategoryRetriever), ou o catálogo completo quando a seleção não tem confiança.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+from monitoring.metrics import record_cache
+from .category_retrieval import CategoryRetriever, build_catalogue, format_catalogue, usage_counts
+from .models import PaymentMethod
+
+PROMPT_CACHE_TIMEOUT = 60 * 60 * 24
+USAGE_CACHE_TIMEOUT = 60 * 60
+
+# Métodos de pagamento globais (user=None) aparecem para todos os usuários:
+# alterá-los incrementa esta versão, que faz parte da chave de todos os usuários
+GLOBAL_VERSION_KEY = 'finance:prompt:global_version'
+
+
+def _global_version():
+    return cache.get(GLOBAL_VERSION_KEY, 0)
+
+
+def _context_key(user_id, global_version):
+    return f'finance:prompt:{global_version}:{user_id}'
+
+
+def _usage_key(user_id):
+    return f'finance:usage:{user_id}'
+
+
+def build_context(user):
+    """Catálogo de categorias e métodos de pagamento do usuário"""
+    # Métodos globais e do usuário podem repetir o nome
+    payment_methods = list(dict.fromkeys(
+        PaymentMethod.objects.filter(
+            models.Q(user=user) | models.Q(user__isnull=True),
+            is_active=True
+        ).order_by('name').values_list('name', flat=True)
+    ))
+    return {
+        'categories': build_catalogue(user),
+        'payment_methods': payment_methods,
+    }
+
+
+def get_context(user):
+    """Contexto do usuário a partir do cache, montando-o no primeiro acesso"""
+    key = _context_key(user.pk, _global_version())
+    context = cache.get(key)
+    record_cache('finance_prompt', context is not None)
+
+    if context is None:
+        context = build_context(user)
+        cache.set(key, context, PROMPT_CACHE_TIMEOUT)
+    return context
+
+
+def get_usage(user):
+    usage = cache.get(_usage_key(user.pk))
+    if usage is None:
+        usage = usage_counts(user)
+        cache.set(_usage_key(user.pk), usage, USAGE_CACHE_TIMEOUT)
+    return usage
+
+
+def catalogue_in_prefix(categories):
+    """Verdadeiro se o catálogo é pequeno o bastante para ir inteiro no prefixo cacheado"""
+    return len(format_catalogue(categories)) <= getattr(settings, 'FINANCE_CATEGORY_PREFIX_MAX_CHARS', 1500)
+
+
+def get_prompt_fragment(user):
+    """
+    Trecho do prompt com as categorias e os métodos de pagamento. Não depende
+    da mensagem: fica no prefixo cacheado pelo provedor (camada do usuário).
+    """
+    context = get_context(user)
+    fragment = ""
+
+    categories = context['categories']
+    if categories and catalogue_in_prefix(categories):
+        fragment += (
+            f"\n\n**CATEGORIAS (id nome):**\n{format_catalogue(categories)}\n"
+            "Ao registrar movimentações informe o id (ex: c3) ou o nome da categoria."
+        )
+    elif categories:
+        fragment += (
+            "\n\n**CATEGORIAS:** as categorias (id nome) mais prováveis vêm junto de cada mensagem.\n"
+            "Ao registrar movimentações informe o id (ex: c3) ou o nome da categoria."
+        )
+
+    if context['payment_methods']:
+        fragment += (
+            f"\n\n**MÉTODOS DE PAGAMENTO:** {'; '.join(context['payment_methods'])}\n"
+            "Para despesas use exatamente um desses nomes (padrão: 'Não especificado')."
+        )
+
+    return fragment
+
+
+def get_message_categories(user, message):
+    """
+    Categorias que vão junto da mensagem quando o catálogo não cabe no
+    prefixo: as mais relevantes para ela ou, sem confiança, todas.
+    """
+    categories = get_context(user)['categories']
+    if not categories or catalogue_in_prefix(categories):
+        return ""
+    selected, partial = CategoryRetriever(categories, get_usage(user)).select(message)
+    label = "Categorias mais prováveis para esta mensagem" if partial else "Categorias"
+    return f"({label} (id nome): {format_catalogue(selected)})"
+
+
+def invalidate_user(user_id):
+    cache.delete(_context_key(user_id, _global_version()))
+
+
+def invalidate_all():
+    """Invalida o contexto de todos os usuários (métodos de pagamento globais)"""
+    try:
+        cache.incr(GLOBAL_VERSION_KEY)
+    except ValueError:
+        cache.set(GLOBAL_VERSION_KEY, 1, None)
@@ -0,0 +1,188 @@
+"""
+Consultas das ferramentas do FinanceAIAssistant, agregadas no banco
+listar_movimentacoes devolvia até 500 movimentações, cada uma em várias
+linhas com emojis, e tudo isso voltava para o contexto do LLM (dezenas de
+milhares de tokens em usuários antigos). Aqui os totais, a contagem e as
+maiores categorias vêm de agregações no banco, as movimentações são
+paginadas por cursor (o modelo pede a próxima página só se precisar) e há
+dois formatos de saída:
+
+- compacto: uma linha por movimentação, para o LLM ler e montar a resposta;
+- whatsapp: o texto com emojis enviado direto ao usuário (finance.fast_path).
+"""
+import base64
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+# Maiores categorias de despesa no resumo
+TOP_CATEGORIES = 5
+# Página máxima de movimentações por chamada
+MAX_PAGE_SIZE = 100
+
+COMPACT = 'compacto'
+WHATSAPP = 'whatsapp'
+
+
+def summarize(queryset, top=TOP_CATEGORIES):
+    """Contagem, receitas, despesas, saldo e maiores categorias de despesa do filtro inteiro"""
+    totals = {row['type']: row for row in queryset.order_by().values('type').annotate(total=Sum('amount'), count=Count('id'))}
+    income = totals.get('income', {}).get('total') or Decimal('0')
+    expense = totals.get('expense', {}).get('total') or Decimal('0')
+    top_categories = list(
+        queryset.filter(type='expense').order_by().values('category__name')
+        .annotate(total=Sum('amount'), count=Count('id')).order_by('-total')[:top]
+    )
+    return {
+        'count': sum(row['count'] for row in totals.values()),
+        'income': income,
+        'expense': expense,
+        'balance': income - expense,
+        'top_categories': [(row['category__name'], row['total'], row['count']) for row in top_categories],
+    }
+
+
+def by_category(queryset):
+    """Receitas, despesas e quantidade por categoria: [(nome, receitas, despesas, quantidade)]"""
+    rows = queryset.order_by().values('category__name').annotate(
+        income=Sum('amount', filter=Q(type='income')),
+        expense=Sum('amount', filter=Q(type='expense')),
+        count=Count('id'),
+    ).order_by('category__name')
+    return [
+        (row['category__name'], row['income'] or Decimal('0'), row['expense'] or Decimal('0'), row['count'])
+        for row in rows
+    ]
+
+
+def encode_cursor(movement):
+    """Posição depois da movimentação na ordem (-date, -created_at, -id)"""
+    raw = f"{movement.date:%Y%m%d}.{movement.created_at.isoformat()}.{movement.id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date, created_at, id) do cursor; ValueError se inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, rest = raw.split('.', 1)
+        created_at, movement_id = rest.rsplit('.', 1)
+        return datetime.strptime(date, '%Y%m%d').date(), datetime.fromisoformat(created_at), movement_id
+    except ValueError as e:
+        raise ValueError('cursor inválido') from e
+
+
+def page(queryset, limit, cursor=''):
+    """
+    Uma página de movimentações a partir do cursor.
+
+    Returns:
+        tuple: (movimentações, cursor da próxima página ou '', quantas restam depois desta)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = queryset.order_by('-date', '-created_at', '-id')
+    if cursor:
+        date, created_at, movement_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(date__lt=date)
+            | Q(date=date, created_at__lt=created_at)
+            | Q(date=date, created_at=created_at, id__lt=movement_id)
+        )
+
+    movements = list(queryset.select_related('category', 'payment_method')[:limit + 1])
+    if len(movements) <= limit:
+        return movements, '', 0
+    movements = movements[:limit]
+    return movements, encode_cursor(movements[-1]), queryset.count() - limit
+
+
+def render_compact(summary, movements, next_cursor, remaining):
+    """Resumo e movimentações em poucas linhas, sem emojis (valores em R$)"""
+    lines = [
+        f"total={summary['count']} receitas={summary['income']:.2f} despesas={summary['expense']:.2f} "
+        f"saldo={summary['balance']:.2f}"
+    ]
+    if summary['top_categories']:
+        lines.append('maiores_despesas: ' + '; '.join(
+            f'{name} {total:.2f} ({count})' for name, total, count in summary['top_categories']
+        ))
+    if movements:
+        lines.append('data|valor|descricao|categoria|pagamento')
+        for movement in movements:
+            sign = '+' if movement.type == 'income' else '-'
+            payment = movement.payment_method.name if movement.payment_method else ''
+            lines.append(
+                f"{movement.date:%d/%m/%Y}|{sign}{movement.amount:.2f}|{movement.description}|"
+                f"{movement.category.name}|{payment}"
+            )
+    if next_cursor:
+        lines.append(f'mais {remaining}: cursor={next_cursor}')
+    return '\n'.join(lines)
+
+
+def render_whatsapp(summary, movements, remaining):
+    """Texto formatado para o WhatsApp"""
+    parts = ["💰 *Suas Movimentações:*\n"]
+    for index, movement in enumerate(movements, 1):
+        tipo_icon = "📈" if movement.type == 'income' else "📉"
+        sinal = "+" if movement.type == 'income' else "-"
+        cor = "🟢" if movement.type == 'income' else "🔴"
+
+        info = f"{index}. {tipo_icon} *{movement.description}*\n"
+        info += f"   {cor} {sinal}R$ {movement.amount:.2f}\n"
+        info += f"   📅 {movement.date.strftime('%d/%m/%Y')}\n"
+        info += f"   🏷️ {movement.category.name}"
+        # Método de pagamento só nas despesas
+        if movement.type == 'expense' and movement.payment_method:
+            info += f"\n   💳 {movement.payment_method.name}"
+        parts.append(info)
+
+    if remaining:
+        parts.append(f"… e mais {remaining} movimentações")
+
+    result = "\n\n".join(parts)
+    result += "\n\n📊 *Resumo do período:*\n"
+    result += f"📈 Receitas: R$ {summary['income']:.2f}\n"
+    result += f"📉 Despesas: R$ {summary['expense']:.2f}\n"
+    result += f"💰 Saldo: R$ {summary['balance']:.2f}"
+    return result
+
+
+def render_categories_compact(rows, days):
+    lines = [f'periodo_dias={days}', 'categoria|receitas|despesas|saldo|qtd']
+    for name, income, expense, count in rows:
+        lines.append(f'{name}|{income:.2f}|{expense:.2f}|{income - expense:.2f}|{count}')
+    income = sum(row[1] for row in rows)
+    expense = sum(row[2] for row in rows)
+    lines.append(f'TOTAL|{income:.2f}|{expense:.2f}|{income - expense:.2f}|{sum(row[3] for row in rows)}')
+    return '\n'.join(lines)
+
+
+def render_categories_whatsapp(rows, days):
+    result = [f"📊 *Saldo por Categoria - Últimos {days} dias:*\n"]
+    total_receitas = Decimal('0')
+    total_despesas = Decimal('0')
+
+    for name, income, expense, count in rows:
+        saldo = income - expense
+        total_receitas += income
+        total_despesas += expense
+        cor = "🟢" if saldo >= 0 else "🔴"
+        sinal = "+" if saldo >= 0 else ""
+
+        info = f"🏷️ *{name}*\n"
+        info += f"   📈 Receitas: R$ {income:.2f}\n"
+        info += f"   📉 Despesas: R$ {expense:.2f}\n"
+        info += f"   {cor} Saldo: {sinal}R$ {saldo:.2f}\n"
+        info += f"   📊 {count} movimentações"
+        result.append(info)
+
+    saldo_total = total_receitas - total_despesas
+    cor_total = "🟢" if saldo_total >= 0 else "🔴"
+    sinal_total = "+" if saldo_total >= 0 else ""
+    result.append("\n💰 *RESUMO GERAL:*")
+    result.append(f"📈 Total Receitas: R$ {total_receitas:.2f}")
+    result.append(f"📉 Total Despesas: R$ {total_despesas:.2f}")
+    result.append(f"{cor_total} *Saldo Final: {sinal_total}R$ {saldo_total:.2f}*")
+    return "\n\n".join(result)
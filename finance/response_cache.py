@@ -0,0 +1,155 @@
+"""
+Cache das respostas do agente financeiro a perguntas só de leitura
+"qual meu saldo por categoria?" e "mostrar gastos do mês" se repetem várias
+vezes ao dia, cada uma com uma volta completa ao LLM e às ferramentas. A
+resposta de um turno que só chamou ferramentas de consulta (READ_ONLY_TOOLS)
+fica no cache com a chave:
+
+- usuário e versão da config LLM;
+- intenção normalizada: a consulta interpretada pelo finance.fast_path
+  (tipo, categoria e período já em datas absolutas) ou as palavras da
+  mensagem sem acentos, pontuação, flexões e palavras de cortesia;
+- versão dos dados do usuário, trocada pelo signal de Movement/Category
+  (finance/signals.py), e o dia (períodos relativos como "este mês").
+
+Só mensagens com uma intenção de consulta reconhecida (READ_INTENTS) entram:
+continuações como "e no mês passado?" dependem da conversa e seguem para o LLM.
+"""
+import hashlib
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from monitoring.metrics import record_cache
+from .category_retrieval import STEM_LENGTH, normalize
+
+logger = logging.getLogger(__name__)
+
+# Ferramentas do FinanceAIAssistant que não alteram dados
+READ_ONLY_TOOLS = {'listar_movimentacoes', 'saldo_por_categoria', 'listar_categorias'}
+
+# Intenção de consulta pelas palavras da mensagem (sem acentos)
+READ_INTENTS = (
+    ('balance', re.compile(r'\bsaldos?\b|\bresumo\b|\bbalanco\b')),
+    ('categories', re.compile(r'\bcategorias\b')),
+    ('statement', re.compile(r'\bgastos?\b|\bdespesas\b|\breceitas\b|\bextrato\b|\bmovimentac|\bquanto\b')),
+)
+
+# Pedidos de alteração nunca usam o cache, mesmo citando saldo ou categorias
+_WRITE_WORDS = re.compile(
+    r'\b(?:gastei|paguei|comprei|recebi|ganhei|registr|anot|cri[ae]|apag|delet|exclu|remov|corrig|alter|mud[ae])'
+)
+
+# "quanto gastei este mês" é consulta apesar do verbo
+_REPORT_QUESTION = re.compile(r'^\s*quanto\s+(?:eu\s+)?(?:gastei|paguei|recebi|ganhei)\b')
+
+# Palavras que não mudam a pergunta
+FILLER_WORDS = {
+    'qual', 'quais', 'o', 'a', 'os', 'as', 'de', 'da', 'do', 'das', 'dos', 'meu', 'minha', 'meus',
+    'minhas', 'me', 'mostra', 'mostrar', 'mostre', 'ver', 'veja', 'por', 'favor', 'pf', 'pfv',
+    'quero', 'queria', 'gostaria', 'pode', 'poderia', 'voce', 'saber', 'e', 'eu', 'oi', 'ola', 'ai',
+}
+
+# Versão dos dados: ausente (expirada/descartada) vira um valor novo, nunca
+# uma versão antiga que ainda tenha respostas no cache
+DATA_VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def is_enabled():
+    return getattr(settings, 'FINANCE_RESPONSE_CACHE', True)
+
+
+def _data_version_key(user_id):
+    return f'finance:data_version:{user_id}'
+
+
+def data_version(user_id):
+    key = _data_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), DATA_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """Troca a versão dos dados do usuário (respostas anteriores deixam de valer)"""
+    cache.set(_data_version_key(user_id), time.time_ns(), DATA_VERSION_TIMEOUT)
+
+
+def normalize_question(message):
+    """'Qual o meu saldo, por favor?' -> 'saldo'; palavras ordenadas e com o mesmo stem"""
+    tokens = re.findall(r'[a-z]+|\d+', normalize(message))
+    return ' '.join(sorted({token[:STEM_LENGTH] for token in tokens if token not in FILLER_WORDS}))
+
+
+def get_intent(message, prediction=None):
+    """
+    (intenção, parâmetros) de uma consulta, ou None se a mensagem não é uma
+    consulta reconhecida. `prediction` é a interpretação do finance.fast_path.
+    """
+    if not message or len(message) > 200:
+        return None
+    if prediction is not None:
+        # Consulta interpretada: os parâmetros já estão resolvidos
+        if prediction['intent'] != 'report':
+            return None
+        args = prediction['args']
+        return 'report', f"{args['tipo']}|{normalize(args['categoria'])}|{args['data_inicial']}|{args['data_final']}"
+
+    folded = normalize(message)
+    if _WRITE_WORDS.search(folded) and not _REPORT_QUESTION.match(folded):
+        return None
+    for intent, pattern in READ_INTENTS:
+        if pattern.search(folded):
+            return intent, normalize_question(message)
+    return None
+
+
+def _key(user, llm_config, intent):
+    name, params = intent
+    digest = hashlib.sha256(params.encode()).hexdigest()[:16]
+    return (
+        f'finance:response:{user.pk}:{llm_config.pk}:{llm_config.updated_at.timestamp()}:'
+        f'{data_version(user.pk)}:{timezone.localdate()}:{name}:{digest}'
+    )
+
+
+def lookup(user, llm_config, message, prediction=None):
+    """
+    Consulta o cache antes do LLM.
+
+    Returns:
+        tuple: (chave, resposta guardada {'response', 'tool_calls'} ou None).
+        A chave é None para mensagens que não são consultas; senão é a que
+        store() deve usar, calculada com a versão dos dados de antes do turno.
+    """
+    if not is_enabled() or not user:
+        return None, None
+    intent = get_intent(message, prediction)
+    if intent is None:
+        return None, None
+
+    key = _key(user, llm_config, intent)
+    entry = cache.get(key)
+    record_cache('finance_response', entry is not None)
+    if entry is not None:
+        logger.info('Resposta financeira do cache: %s', intent[0])
+    return key, entry
+
+
+def store(key, response, tool_calls):
+    """
+    Guarda a resposta se o turno só consultou dados: chamou alguma
+    ferramenta e todas estão em READ_ONLY_TOOLS.
+    """
+    if key is None or not response or not isinstance(response, str):
+        return
+    if not tool_calls or any(call['name'] not in READ_ONLY_TOOLS for call in tool_calls):
+        return
+    cache.set(key, {'response': response, 'tool_calls': tool_calls},
+              getattr(settings, 'FINANCE_RESPONSE_CACHE_TIMEOUT', 60 * 60 * 6))
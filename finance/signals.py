@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import response_cache
+from .models import Category, Movement, PaymentMethod
+from .prompt_cache import invalidate_all, invalidate_user
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def invalidate_prompt_fragment(sender, instance, **kwargs):
+    """
+    Invalida o fragmento do prompt em cache quando categorias ou métodos de
+    pagamento mudam. Métodos globais (sem usuário) invalidam todos os usuários.
+    """
+    if instance.user_id:
+        invalidate_user(instance.user_id)
+    else:
+        invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=Movement)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_responses(sender, instance, **kwargs):
+    """Respostas em cache a consultas do usuário deixam de valer (finance.response_cache)"""
+    if instance.user_id:
+        response_cache.invalidate_user(instance.user_id)
@@ -1,15 +1,12 @@
 import traceback
-from django.utils import timezone
-from django.conf import settings
 from django_ai_assistant import AIAssistant, method_tool
 from datetime import datetime, timedelta
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agents.llm_factory import InvocationAttribute, get_llm
+from agents.prompt_builder import LayeredPromptMixin
 from .services import GoogleCalendarService
 
 
-class GoogleCalendarAIAssistant(AIAssistant):
+class GoogleCalendarAIAssistant(LayeredPromptMixin, AIAssistant):
     id = "google_calendar_assistant"
     name = "Assistente de Google Calendar"
     instructions = """Você é um assistente inteligente especializado em Google Calendar.
@@ -30,6 +27,9 @@ class GoogleCalendarAIAssistant(AIAssistant):
     Para limpar a agenda de uma data específica, utilize listar_eventos_calendar para obter os eventos e, em seguida, delete todos os eventos daquele dia    """
     model = "gpt-4o-mini"
 
+    # Vem do assistant_state() da invocação: a instância é compartilhada entre usuários
+    _user = InvocationAttribute('user')
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._user = kwargs.get('user')
@@ -42,48 +42,10 @@ class GoogleCalendarAIAssistant(AIAssistant):
             if self._llm_config.instructions:
                 self.instructions = self._llm_config.instructions
 
-    def get_instructions(self):
-        return f"{self.instructions}\n\nData e hora atual: {timezone.now().strftime('%d/%m/%Y %H:%M')}"
-
     def get_llm(self):
         if not self._llm_config:
             return super().get_llm()
-
-        provider = self._llm_config.name
-
-        if provider == "openai":
-            return ChatOpenAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                presence_penalty=self._llm_config.presence_penalty,
-                frequency_penalty=self._llm_config.frequency_penalty,
-                openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-            )
-        elif provider == "anthropic":
-            return ChatAnthropic(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                anthropic_api_key=getattr(settings, 'ANTHROPIC_API_KEY', '')
-            )
-        elif provider == "google":
-            return ChatGoogleGenerativeAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_output_tokens=self._llm_config.max_tokens,
-                top_p=self._llm_config.top_p,
-                google_api_key=getattr(settings, 'GOOGLE_API_KEY', '')
-            )
-        else:
-            return ChatOpenAI(
-                model=self._llm_config.model,
-                temperature=self._llm_config.temperature,
-                max_tokens=self._llm_config.max_tokens,
-                openai_api_key=getattr(settings, 'OPENAI_API_KEY', '')
-            )
+        return get_llm(self._llm_config)
 
     @method_tool
     def listar_eventos_calendar(self, numero_whatsapp: str, max_resultados: int = 10) -> str:
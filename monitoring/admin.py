@@ -0,0 +1,44 @@
+import json
+
+from django.contrib import admin
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    Admin para perfis de requisição (somente leitura)
+    """
+    list_display = ['created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms',
+                    'query_count', 'duplicate_count', 'budget_badge']
+    list_filter = ['over_budget', 'method', 'view_name', 'created_at']
+    search_fields = ['path', 'view_name']
+    date_hierarchy = 'created_at'
+    exclude = ['duplicates', 'top_functions']
+    readonly_fields = ['method', 'path', 'view_name', 'status_code', 'user', 'duration_ms', 'query_count',
+                       'query_time_ms', 'duplicate_count', 'query_budget', 'over_budget', 'created_at',
+                       'duplicates_display', 'top_functions_display']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def budget_badge(self, obj):
+        """Exibe queries/orçamento destacando quando excedido"""
+        if obj.query_budget is None:
+            return '-'
+        color = 'red' if obj.over_budget else 'green'
+        return format_html('<span style="color: {};">{} / {}</span>', color, obj.query_count, obj.query_budget)
+    budget_badge.short_description = 'Orçamento'
+
+    def duplicates_display(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.duplicates, indent=2, ensure_ascii=False))
+    duplicates_display.short_description = 'Queries duplicadas'
+
+    def top_functions_display(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.top_functions, indent=2, ensure_ascii=False))
+    top_functions_display.short_description = 'Funções mais custosas (cProfile)'
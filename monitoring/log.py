@@ -0,0 +1,188 @@
+"""
+Logging estruturado, assíncrono e amostrado
+Os handlers lentos (stdout/arquivo) rodam numa thread própria via QueueListener,
+então a thread da requisição apenas enfileira o registro.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+from monitoring.metrics import LOG_RECORDS_DROPPED
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+# Atributos padrão de LogRecord que não entram como campos extras no JSON
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que gerencia o próprio QueueListener.
+
+    Uso no LOGGING (dictConfig):
+        'queue': {
+            '()': 'monitoring.log.QueueListenerHandler',
+            'fmt': 'json',
+        }
+
+    O handler de saída (stderr, no formato `fmt`: 'text' ou 'json') é criado
+    aqui, sem depender da ordem em que o dictConfig configura os handlers. A
+    thread do listener só é iniciada no primeiro registro emitido (e
+    reiniciada após um fork, ex: workers do gunicorn). Registros descartados
+    com a fila cheia são contados em vision_log_records_dropped_total.
+    """
+
+    def __init__(self, fmt='text', maxsize=10000, respect_handler_level=True):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        console = logging.StreamHandler()
+        console.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+        self.targets = [console]
+        self.respect_handler_level = respect_handler_level
+        self.listener = None
+        self.listener_pid = None
+        self.dropped = 0
+        atexit.register(self.stop)
+
+    def _start_listener(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *self.targets, respect_handler_level=self.respect_handler_level
+        )
+        self.listener.start()
+        self.listener_pid = os.getpid()
+
+    def enqueue(self, record):
+        # Nunca bloqueia a requisição: com a fila cheia o registro é descartado
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    def emit(self, record):
+        if self.listener_pid != os.getpid():
+            self.acquire()
+            try:
+                if self.listener_pid != os.getpid():
+                    self._start_listener()
+            finally:
+                self.release()
+        super().emit(record)
+
+    def stop(self):
+        """Drena a fila e encerra a thread do listener"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.dropped:
+            # A fila já foi drenada: o aviso vai direto para a saída
+            self.targets[0].handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': '%d registros de log descartados com a fila cheia', 'args': (self.dropped,),
+            }))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Amostra registros ruidosos: apenas uma fração `rate` dos registros com
+    nível <= `level` passa. Loggers em `exempt` (e seus filhos), que tiveram o
+    nível ajustado explicitamente em LOG_LEVELS, não são amostrados. Um
+    registro pode sobrescrever a taxa com extra={'sample_rate': 1.0}.
+    """
+
+    def __init__(self, rate=0.1, level='DEBUG', exempt=()):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+        self.exempt = tuple(exempt)
+
+    def is_exempt(self, name):
+        return any(name == module or name.startswith(module + '.') for module in self.exempt)
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None:
+            if self.is_exempt(record.name):
+                return True
+            rate = self.rate
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo os campos de `extra`"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key != 'sample_rate':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def payload_size(payload):
+    """
+    Tamanho aproximado (bytes) de um payload, para registrar no log no lugar
+    do conteúdo completo.
+    """
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, bytearray)):
+        return len(payload)
+    if isinstance(payload, str):
+        return len(payload.encode('utf-8', errors='ignore'))
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return len(str(payload))
+
+
+def build_logging_config(apps, level='INFO', module_levels=None, fmt='text',
+                         debug_sample_rate=0.1):
+    """
+    Monta o dict do LOGGING: todos os loggers passam pelo handler assíncrono
+    e cada app/módulo pode ter seu nível ajustado em `module_levels`
+    (ex: {'whatsapp_connector.services': 'DEBUG'}).
+    """
+    module_levels = dict(module_levels or {})
+    loggers = {app: {'level': level} for app in apps}
+    # Substitui o console padrão do Django para não duplicar as saídas
+    loggers['django'] = {'handlers': ['queue'], 'level': 'INFO', 'propagate': False}
+    for module, module_level in module_levels.items():
+        loggers[module] = {'level': module_level.upper()}
+
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'sampling': {
+                '()': 'monitoring.log.SamplingFilter',
+                'rate': debug_sample_rate,
+                'exempt': list(module_levels),
+            },
+        },
+        'handlers': {
+            'queue': {
+                '()': 'monitoring.log.QueueListenerHandler',
+                'fmt': fmt,
+                'filters': ['sampling'],
+            },
+        },
+        'root': {
+            'handlers': ['queue'],
+            'level': 'WARNING',
+        },
+        'loggers': loggers,
+    }
@@ -0,0 +1,125 @@
+"""
+Profiling de memória por etapa do pipeline (tracemalloc)
+Ligado por worker: MEMORY_PROFILING é a fração de processos que ativam o
+tracemalloc (0 desliga, 1 ativa em todos). Cada etapa registra o pico de
+alocação e os maiores alocadores entre os snapshots de entrada e saída.
+O tracemalloc é global ao processo, então alocações de outras threads
+durante a etapa também entram na conta.
+"""
+import logging
+import os
+import random
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .metrics import STAGE_PEAK_BYTES
+from .tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_state = {'pid': None, 'enabled': False}
+_state_lock = threading.Lock()
+
+# Ignora alocações do próprio tracemalloc e do import de módulos
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def is_enabled():
+    """
+    Decide uma vez por processo (sorteio com a fração MEMORY_PROFILING)
+    se o tracemalloc fica ativo neste worker.
+    """
+    pid = os.getpid()
+    if _state['pid'] != pid:
+        with _state_lock:
+            if _state['pid'] != pid:
+                fraction = getattr(settings, 'MEMORY_PROFILING', 0)
+                _state['enabled'] = fraction > 0 and random.random() < fraction
+                _state['pid'] = pid
+                if _state['enabled'] and not tracemalloc.is_tracing():
+                    tracemalloc.start(getattr(settings, 'MEMORY_PROFILING_FRAMES', 1))
+                    logger.info('tracemalloc ativado no worker %s', pid)
+    return _state['enabled']
+
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def top_allocators(before, after, limit=10):
+    """Maiores diferenças de alocação (por linha) entre dois snapshots"""
+    return [
+        {
+            'where': str(stat.traceback[0]),
+            'size_diff': stat.size_diff,
+            'count_diff': stat.count_diff,
+        }
+        for stat in after.compare_to(before, 'lineno')[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+def _record(name, peak, net, allocators):
+    STAGE_PEAK_BYTES.labels(name).observe(peak)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.memory[name] = [peak, net]
+
+    logger.info(
+        'Memória na etapa %s: pico %.1f KiB, líquido %+.1f KiB',
+        name, peak / 1024, net / 1024,
+        extra={'stage': name, 'peak_bytes': peak, 'net_bytes': net, 'top_allocators': allocators},
+    )
+    for allocator in allocators[:3]:
+        logger.debug('  %s: %+.1f KiB', allocator['where'], allocator['size_diff'] / 1024)
+
+
+@contextmanager
+def memory_stage(name):
+    """
+    Mede o pico de memória alocada durante a etapa. Etapas aninhadas herdam
+    o nome da externa ('image' -> 'image.decrypt'). Não faz nada se o
+    profiling não estiver ativo neste worker.
+    """
+    if not is_enabled():
+        yield
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    # reset_peak() zera o pico global: preserva o que a etapa externa já viu
+    if stack:
+        stack[-1]['peak'] = max(stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+
+    full_name = f"{stack[-1]['name']}.{name}" if stack else name
+    snapshot_before = _take_snapshot()
+    tracemalloc.reset_peak()
+    start_current = tracemalloc.get_traced_memory()[0]
+    frame = {'name': full_name, 'start': start_current, 'peak': start_current}
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        frame['peak'] = max(frame['peak'], peak)
+        stack.pop()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+
+        allocators = top_allocators(snapshot_before, _take_snapshot(),
+                                    getattr(settings, 'MEMORY_PROFILING_TOP', 10))
+        # O próprio snapshot não deve contar no pico da etapa externa
+        tracemalloc.reset_peak()
+        _record(full_name, frame['peak'] - start_current, current - start_current, allocators)
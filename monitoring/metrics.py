@@ -0,0 +1,223 @@
+"""
+Métricas no formato Prometheus
+Com PROMETHEUS_MULTIPROC_DIR definido, o prometheus_client grava os valores
+em arquivos mmap compartilhados e a exposição agrega todos os workers do gunicorn.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Buckets (s) para chamadas externas e LLM: de dezenas de ms até ~1 min
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+WEBHOOK_EVENTS = Counter(
+    'vision_webhook_events_total',
+    'Eventos de webhook da Evolution API por tipo de mensagem e resultado',
+    ['message_type', 'outcome'],
+)
+
+QUEUE_DEPTH = Gauge(
+    'vision_queue_depth',
+    'Itens pendentes/em andamento por fila de processamento',
+    ['queue'],
+    multiprocess_mode='livesum',
+)
+
+EXTERNAL_CALL_LATENCY = Histogram(
+    'vision_external_call_seconds',
+    'Latência de chamadas a serviços externos',
+    ['dependency', 'outcome'],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_LATENCY = Histogram(
+    'vision_llm_request_seconds',
+    'Latência de uma execução completa do agente por LLMProviderConfig',
+    ['config', 'provider', 'model'],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_FIRST_MESSAGE = Histogram(
+    'vision_llm_first_message_seconds',
+    'Tempo do início da execução do agente até a primeira parte da resposta enviada (streaming)',
+    ['config', 'provider', 'model'],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_ATTEMPTS = Counter(
+    'vision_llm_attempts_total',
+    'Chamadas a cada provedor/modelo de uma config com failover, por resultado (ok, error, timeout)',
+    ['config', 'provider', 'model', 'outcome'],
+)
+
+LLM_RATE_LIMIT_WAIT = Histogram(
+    'vision_llm_rate_limit_wait_seconds',
+    'Espera na fila do limite de requisições/tokens por provedor e modelo',
+    ['provider', 'model'],
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+
+LLM_RATE_LIMITED = Counter(
+    'vision_llm_rate_limited_total',
+    'Chamadas ao LLM barradas pelo limite: 429 do provedor ou prazo de espera esgotado (timeout)',
+    ['provider', 'model', 'reason'],
+)
+
+LLM_QUOTA_EXCEEDED = Counter(
+    'vision_llm_quota_exceeded_total',
+    'Mensagens não enviadas ao LLM porque o usuário atingiu a cota diária',
+)
+
+AGENT_TOOL_CALLS = Counter(
+    'vision_agent_tool_calls_total',
+    'Chamadas de ferramenta pedidas pelo agente (executed, memoized: repetida no turno, refused: sem orçamento)',
+    ['tool', 'outcome'],
+)
+
+AGENT_BUDGET_EXHAUSTED = Counter(
+    'vision_agent_budget_exhausted_total',
+    'Turnos do agente encerrados pelo orçamento (tool_calls, loop, deadline, tokens)',
+    ['reason'],
+)
+
+LLM_TOKENS = Counter(
+    'vision_llm_tokens_total',
+    'Tokens consumidos por LLMProviderConfig',
+    ['config', 'provider', 'model', 'kind'],
+)
+
+MEDIA_BYTES = Counter(
+    'vision_media_bytes_total',
+    'Bytes de mídia processados',
+    ['media_type', 'stage'],
+)
+
+STAGE_PEAK_BYTES = Histogram(
+    'vision_stage_peak_memory_bytes',
+    'Pico de memória alocada por etapa do pipeline (somente workers com MEMORY_PROFILING)',
+    ['stage'],
+    buckets=(256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 32 * 1024 ** 2,
+             64 * 1024 ** 2, 128 * 1024 ** 2, 256 * 1024 ** 2),
+)
+
+QUERY_BUDGET_EXCEEDED = Counter(
+    'vision_query_budget_exceeded_total',
+    'Requisições que excederam o orçamento de queries da view (QUERY_BUDGETS)',
+    ['view'],
+)
+
+CACHE_REQUESTS = Counter(
+    'vision_cache_requests_total',
+    'Consultas a caches da aplicação (hit ratio = hit / total)',
+    ['cache', 'result'],
+)
+
+FAST_PATH_REQUESTS = Counter(
+    'vision_finance_fast_path_total',
+    'Mensagens de finanças avaliadas pelo atalho determinístico (hit rate = hit / total)',
+    ['intent', 'outcome'],
+)
+
+FAST_PATH_AGREEMENT = Counter(
+    'vision_finance_fast_path_agreement_total',
+    'Interpretações do atalho de finanças comparadas às ferramentas chamadas pelo LLM',
+    ['intent', 'result'],
+)
+
+INTENT_ROUTES = Counter(
+    'vision_intent_routes_total',
+    'Mensagens roteadas por intenção e origem da decisão (model, llm, default, single)',
+    ['intent', 'source'],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    'vision_log_records_dropped_total',
+    'Registros de log descartados porque a fila do logging assíncrono estava cheia',
+)
+
+
+class ExternalCall:
+    """Resultado de uma chamada externa medida por observe_call"""
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+    def response(self, response):
+        """Classifica pela resposta HTTP: 'ok' ou '4xx'/'5xx'"""
+        if response.status_code >= 400:
+            self.outcome = f"{response.status_code // 100}xx"
+        return response
+
+
+@contextmanager
+def observe_call(dependency):
+    """
+    Mede a latência de uma chamada externa:
+
+        with observe_call('evolution') as call:
+            response = call.response(requests.post(...))
+
+    O resultado é 'error' se uma exceção escapar do bloco.
+    """
+    call = ExternalCall()
+    started_at = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = 'error'
+        raise
+    finally:
+        EXTERNAL_CALL_LATENCY.labels(dependency, call.outcome).observe(time.perf_counter() - started_at)
+
+
+def llm_labels(llm_config):
+    """Labels que identificam um LLMProviderConfig nas métricas"""
+    return {
+        'config': str(llm_config.pk),
+        'provider': llm_config.name,
+        'model': llm_config.model,
+    }
+
+
+def record_llm_usage(llm_config, messages, duration):
+    """
+    Registra latência e tokens de uma execução do agente a partir do
+    `usage_metadata` das AIMessages geradas. Tokens lidos/gravados no cache
+    de prefixo do provedor entram como kind='cache_read'/'cache_creation'.
+    """
+    labels = llm_labels(llm_config)
+    LLM_LATENCY.labels(**labels).observe(duration)
+
+    totals = {'input': 0, 'output': 0, 'cache_read': 0, 'cache_creation': 0}
+    for message in messages:
+        usage = getattr(message, 'usage_metadata', None)
+        if usage:
+            totals['input'] += usage.get('input_tokens', 0)
+            totals['output'] += usage.get('output_tokens', 0)
+            # Tokens do prefixo servidos pelo cache do provedor (OpenAI e Anthropic)
+            details = usage.get('input_token_details') or {}
+            totals['cache_read'] += details.get('cache_read') or 0
+            totals['cache_creation'] += details.get('cache_creation') or 0
+
+    for kind, value in totals.items():
+        if value:
+            LLM_TOKENS.labels(kind=kind, **labels).inc(value)
+    return totals
+
+
+def record_cache(cache_name, hit):
+    CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def render_metrics():
+    """Texto no formato de exposição do Prometheus"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
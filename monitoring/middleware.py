@@ -0,0 +1,163 @@
+"""
+Middleware de profiling de requisições
+Conta as queries de toda requisição e compara com o orçamento da view
+(QUERY_BUDGETS). Requisições amostradas (PROFILING['SAMPLE_RATE'] ou header
+de opt-in enviado por um usuário da equipe) também registram queries
+duplicadas e as funções mais custosas do cProfile em RequestProfile.
+"""
+import cProfile
+import logging
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import QUERY_BUDGET_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'TOP_FUNCTIONS': 25,
+}
+
+
+class QueryRecorder:
+    """execute_wrapper que conta as queries e, se `detailed`, guarda SQL e tempo"""
+
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if not self.detailed:
+            return execute(sql, params, many, context)
+
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), (time.perf_counter() - started_at) * 1000))
+
+    @property
+    def total_ms(self):
+        return sum(ms for _, _, ms in self.queries)
+
+    def duplicates(self):
+        """
+        Agrupa queries com o mesmo SQL. `identical` conta as repetições com
+        os mesmos parâmetros; o restante costuma indicar um N+1.
+        """
+        groups = {}
+        for sql, params, ms in self.queries:
+            group = groups.setdefault(sql, {'sql': sql, 'count': 0, 'params': set(), 'ms': 0.0})
+            group['count'] += 1
+            group['params'].add(params)
+            group['ms'] += ms
+
+        duplicates = [
+            {
+                'sql': group['sql'][:1000],
+                'count': group['count'],
+                'identical': group['count'] - len(group['params']),
+                'ms': round(group['ms'], 2),
+            }
+            for group in groups.values() if group['count'] > 1
+        ]
+        duplicates.sort(key=lambda item: -item['count'])
+        return duplicates
+
+
+def _top_functions(profiler, limit):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{filename}:{line}({function})",
+            'calls': ncalls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    rows.sort(key=lambda row: -row['cumtime_ms'])
+    return rows[:limit]
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {**DEFAULT_PROFILING, **getattr(settings, 'PROFILING', {})}
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+
+    def _should_profile(self, request):
+        header = request.headers.get(self.config['HEADER'])
+        if header and header != '0':
+            user = getattr(request, 'user', None)
+            return settings.DEBUG or (user is not None and user.is_staff)
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        sampled = self._should_profile(request)
+        recorder = QueryRecorder(detailed=sampled)
+        profiler = cProfile.Profile() if sampled else None
+
+        started_at = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        duration_ms = (time.perf_counter() - started_at) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else ''
+        budget = self.budgets.get(view_name)
+        over_budget = budget is not None and recorder.count > budget
+
+        if over_budget:
+            QUERY_BUDGET_EXCEEDED.labels(view_name).inc()
+            logger.warning(
+                'Orçamento de queries excedido em %s: %s queries (orçamento %s) - %s %s',
+                view_name, recorder.count, budget, request.method, request.path
+            )
+
+        if sampled or over_budget:
+            self._save_profile(request, response, view_name, duration_ms, recorder, profiler, budget, over_budget)
+
+        return response
+
+    def _save_profile(self, request, response, view_name, duration_ms, recorder, profiler, budget, over_budget):
+        from .models import RequestProfile
+
+        user = getattr(request, 'user', None)
+        duplicates = recorder.duplicates()
+        try:
+            RequestProfile.objects.create(
+                method=request.method,
+                path=request.path[:500],
+                view_name=view_name,
+                status_code=getattr(response, 'status_code', None),
+                user=user if user is not None and user.is_authenticated else None,
+                duration_ms=round(duration_ms, 2),
+                query_count=recorder.count,
+                query_time_ms=round(recorder.total_ms, 2),
+                duplicate_count=sum(item['count'] - 1 for item in duplicates),
+                query_budget=budget,
+                over_budget=over_budget,
+                duplicates=duplicates[:50],
+                top_functions=_top_functions(profiler, self.config['TOP_FUNCTIONS']) if profiler else [],
+            )
+        except Exception as e:
+            logger.error('Erro ao salvar perfil da requisição %s: %s', request.path, e)
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, db_index=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('duration_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Queries')),
+                ('query_time_ms', models.FloatField(default=0, verbose_name='Tempo em SQL (ms)')),
+                ('duplicate_count', models.PositiveIntegerField(default=0, verbose_name='Queries duplicadas')),
+                ('query_budget', models.PositiveIntegerField(blank=True, null=True, verbose_name='Orçamento de queries')),
+                ('over_budget', models.BooleanField(db_index=True, default=False, verbose_name='Acima do orçamento')),
+                ('duplicates', models.JSONField(blank=True, default=list, help_text="Queries repetidas: [{'sql', 'count', 'ms'}]")),
+                ('top_functions', models.JSONField(blank=True, default=list, help_text='Funções mais custosas segundo o cProfile')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Perfil de requisição',
+                'verbose_name_plural': 'Perfis de requisição',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
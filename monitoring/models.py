@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """
+    Perfil de uma requisição amostrada pelo ProfilingMiddleware
+    (ou que estourou o orçamento de queries da view)
+    """
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True, db_index=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    duration_ms = models.FloatField(verbose_name="Duração (ms)")
+    query_count = models.PositiveIntegerField(verbose_name="Queries")
+    query_time_ms = models.FloatField(default=0, verbose_name="Tempo em SQL (ms)")
+    duplicate_count = models.PositiveIntegerField(default=0, verbose_name="Queries duplicadas")
+    query_budget = models.PositiveIntegerField(null=True, blank=True, verbose_name="Orçamento de queries")
+    over_budget = models.BooleanField(default=False, db_index=True, verbose_name="Acima do orçamento")
+    duplicates = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Queries repetidas: [{'sql', 'count', 'ms'}]"
+    )
+    top_functions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Funções mais custosas segundo o cProfile"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Perfil de requisição"
+        verbose_name_plural = "Perfis de requisição"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms, {self.query_count} queries)"
@@ -0,0 +1,192 @@
+"""
+Rastreamento por etapas do pipeline de mensagens
+Registra spans (duração + número de queries SQL) para cada etapa do processamento
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connection
+
+_local = threading.local()
+
+# Limites (ms) dos buckets do histograma exibido na página de métricas
+HISTOGRAM_BUCKETS_MS = [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class QueryCounter:
+    """execute_wrapper que apenas conta as queries executadas na conexão"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Trace:
+    """
+    Trace de uma requisição. Cada etapa é acumulada em `stages` como
+    [duração_ms, queries], com nomes hierárquicos separados por ponto
+    (ex: 'llm.graph_invoke').
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.memory = {}
+        self.message_pk = None
+        self.query_counter = QueryCounter()
+        self._stack = []
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+
+    @property
+    def total_ms(self):
+        end = self._finished_at or time.perf_counter()
+        return (end - self._started_at) * 1000
+
+    def record(self, name, duration_ms, queries):
+        stage = self.stages.setdefault(name, [0.0, 0])
+        stage[0] += duration_ms
+        stage[1] += queries
+
+    def finish(self):
+        self._finished_at = time.perf_counter()
+
+    def as_dict(self):
+        """Formato compacto salvo em MessageHistory.timing"""
+        data = {
+            'total': round(self.total_ms, 1),
+            'queries': self.query_counter.count,
+            'stages': {name: [round(ms, 1), queries] for name, (ms, queries) in self.stages.items()},
+        }
+        if self.memory:
+            # [pico_bytes, líquido_bytes] por etapa, quando o profiling de memória está ativo
+            data['memory'] = self.memory
+        return data
+
+
+def current_trace():
+    """Retorna o trace ativo na thread atual (ou None)"""
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def start_trace(name='pipeline'):
+    """
+    Inicia um trace para a thread atual, contando todas as queries
+    executadas na conexão padrão enquanto ele estiver ativo.
+    """
+    trace = Trace(name)
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        with connection.execute_wrapper(trace.query_counter):
+            yield trace
+    finally:
+        trace.finish()
+        _local.trace = previous
+
+
+@contextmanager
+def span(name):
+    """
+    Mede uma etapa do trace ativo. Spans aninhados herdam o nome do pai
+    ('audio' -> 'audio.decrypt'). Sem trace ativo, não faz nada.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    full_name = f"{trace._stack[-1]}.{name}" if trace._stack else name
+    trace._stack.append(full_name)
+    queries_before = trace.query_counter.count
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        trace._stack.pop()
+        trace.record(full_name, duration_ms, trace.query_counter.count - queries_before)
+
+
+def traced(name):
+    """Decorator equivalente a `with span(name)` para métodos inteiros"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def aggregate_timings(timings):
+    """
+    Agrega uma lista de breakdowns (MessageHistory.timing) em estatísticas
+    e histogramas por etapa.
+
+    Returns:
+        list: dicts ordenados pelo tempo médio, um por etapa (inclui 'total')
+    """
+    durations = {}
+    queries = {}
+    peaks = {}
+
+    for timing in timings:
+        if not timing:
+            continue
+        durations.setdefault('total', []).append(timing.get('total', 0))
+        queries.setdefault('total', []).append(timing.get('queries', 0))
+        for stage_name, (stage_ms, stage_queries) in timing.get('stages', {}).items():
+            durations.setdefault(stage_name, []).append(stage_ms)
+            queries.setdefault(stage_name, []).append(stage_queries)
+        for stage_name, (peak_bytes, _) in timing.get('memory', {}).items():
+            peaks.setdefault(stage_name, []).append(peak_bytes)
+
+    stats = []
+    for stage_name, values in durations.items():
+        values.sort()
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for value in values:
+            for i, limit in enumerate(HISTOGRAM_BUCKETS_MS):
+                if value <= limit:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+        stage_peaks = sorted(peaks.get(stage_name, []))
+        largest = max(counts) or 1
+        labels = [f"≤{limit}ms" for limit in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        stats.append({
+            'name': stage_name,
+            'count': len(values),
+            'avg_ms': sum(values) / len(values),
+            'p50_ms': _percentile(values, 0.50),
+            'p95_ms': _percentile(values, 0.95),
+            'max_ms': values[-1],
+            'avg_queries': sum(queries[stage_name]) / len(queries[stage_name]),
+            'p95_peak_kb': _percentile(stage_peaks, 0.95) / 1024 if stage_peaks else None,
+            'max_peak_kb': stage_peaks[-1] / 1024 if stage_peaks else None,
+            'histogram': [
+                {'label': label, 'count': count, 'width': count * 100 / largest}
+                for label, count in zip(labels, counts)
+            ],
+        })
+
+    stats.sort(key=lambda item: (item['name'] != 'total', -item['avg_ms']))
+    return stats
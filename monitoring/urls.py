@@ -0,0 +1,13 @@
+"""
+URLs de monitoramento interno
+"""
+
+from django.urls import path
+from . import views
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('pipeline/', views.pipeline_metrics, name='pipeline_metrics'),
+    path('metrics/', views.prometheus_metrics, name='prometheus_metrics'),
+]
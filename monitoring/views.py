@@ -0,0 +1,71 @@
+"""
+Views internas de monitoramento
+Páginas restritas à equipe (is_staff) com métricas de desempenho do pipeline
+"""
+
+import hmac
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from whatsapp_connector.models import MessageHistory
+from .metrics import render_metrics
+from .tracing import aggregate_timings, HISTOGRAM_BUCKETS_MS
+
+
+@staff_member_required
+def pipeline_metrics(request):
+    """
+    Histogramas de tempo por etapa do pipeline de mensagens,
+    agregados a partir de MessageHistory.timing
+    """
+    try:
+        hours = max(1, int(request.GET.get('hours', 24)))
+        limit = min(5000, max(1, int(request.GET.get('limit', 1000))))
+    except ValueError:
+        hours, limit = 24, 1000
+
+    since = timezone.now() - timedelta(hours=hours)
+    timings = list(
+        MessageHistory.objects.filter(
+            received_at__gte=since,
+            timing__isnull=False
+        ).order_by('-received_at').values_list('timing', flat=True)[:limit]
+    )
+
+    context = {
+        'stages': aggregate_timings(timings),
+        'sample_size': len(timings),
+        'hours': hours,
+        'limit': limit,
+        'buckets': HISTOGRAM_BUCKETS_MS,
+    }
+    return render(request, 'monitoring/pipeline_metrics.html', context)
+
+
+def _has_metrics_token(request):
+    """Verifica o header 'Authorization: Bearer <METRICS_TOKEN>' usado pelo scraper"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return False
+    header = request.headers.get('Authorization', '')
+    scheme, _, provided = header.partition(' ')
+    # Em bytes: compare_digest recusa str com caracteres não ASCII
+    return scheme.lower() == 'bearer' and hmac.compare_digest(provided.strip().encode(), token.encode())
+
+
+def prometheus_metrics(request):
+    """
+    Métricas no formato texto do Prometheus.
+    Acesso via token (METRICS_TOKEN) ou sessão de um usuário da equipe.
+    """
+    user = getattr(request, 'user', None)
+    if not (_has_metrics_token(request) or (user is not None and user.is_staff)):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -9,8 +9,9 @@ class IntentRouterAssistant(AIAssistant):
     Sua tarefa é simples:
     - Se a mensagem do usuário falar de finanças, gastos, pagamentos, orçamentos, cartões, etc. → responda apenas "finance".
     - Se a mensagem do usuário falar de reuniões, eventos, compromissos, datas, horários, calendário, etc. → responda apenas "calendar".
+    - Se a mensagem não for sobre finanças nem sobre agenda (cumprimentos, dúvidas gerais, atendimento) → responda apenas "general".
     - Se não tiver certeza, escolha a opção mais próxima, mas nunca invente outra categoria.
 
-    Responda somente com uma palavra: "finance" ou "calendar".
+    Responda somente com uma palavra: "finance", "calendar" ou "general".
     """
     model = "gpt-4o-mini"
\ No newline at end of file
@@ -74,6 +74,7 @@ INSTALLED_APPS = [
     'authentication',
     'google_calendar',
     'finance',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
@@ -83,6 +84,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
     'webapp.middleware.UserLanguageMiddleware',
     'authentication.middleware.RoleBasedRedirectMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -119,10 +121,10 @@ DATABASES = {
     }
 }
 
+# Cache compartilhado entre os workers do gunicorn (por padrão em arquivos;
+# use CACHE_URL=redis://... quando houver mais de um servidor)
 CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
-    }
+    "default": env.cache('CACHE_URL', default='filecache:///tmp/vision8-cache'),
 }
 
 
@@ -215,6 +217,187 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Logging
+# LOG_LEVELS permite ajustar módulos específicos, ex:
+# LOG_LEVELS=whatsapp_connector.services=DEBUG,agents=WARNING
+from monitoring.log import build_logging_config  # noqa: E402
+
+LOGGING = build_logging_config(
+    apps=['agents', 'authentication', 'common', 'finance', 'google_calendar',
+          'monitoring', 'utils', 'webapp', 'whatsapp_connector'],
+    level=env('LOG_LEVEL', default='INFO'),
+    module_levels=env.dict('LOG_LEVELS', default={}),
+    fmt=env('LOG_FORMAT', default='text'),
+    debug_sample_rate=env.float('LOG_DEBUG_SAMPLE_RATE', default=0.1),
+)
+
+# Métricas Prometheus (/monitoring/metrics/)
+# Em produção defina também PROMETHEUS_MULTIPROC_DIR (ver conf/production/gunicorn.conf.py)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Profiling de requisições (monitoring.middleware.ProfilingMiddleware)
+# Com ENABLED, toda requisição tem as queries contadas; uma fração SAMPLE_RATE
+# (ou as enviadas com o header 'X-Profile: 1' por um usuário da equipe) é
+# perfilada com cProfile e salva em RequestProfile
+PROFILING = {
+    'ENABLED': env.bool('PROFILING_ENABLED', default=False),
+    'SAMPLE_RATE': env.float('PROFILING_SAMPLE_RATE', default=0.0),
+    'HEADER': 'X-Profile',
+    'TOP_FUNCTIONS': 25,
+}
+
+# Máximo de queries esperado por view (nome da URL); acima disso é registrado um aviso
+QUERY_BUDGETS = {
+    'webapp:home': 10,
+    'finance:dashboard': 15,
+    'message_list': 5,
+    'evolution_webhook_receiver': 40,
+}
+
+# Profiling de memória (monitoring.memory): fração dos workers com tracemalloc ativo
+MEMORY_PROFILING = env.float('MEMORY_PROFILING', default=0.0)
+MEMORY_PROFILING_FRAMES = env.int('MEMORY_PROFILING_FRAMES', default=1)
+MEMORY_PROFILING_TOP = 10
+
+# Categorias no prompt do assistente financeiro (finance.category_retrieval):
+# catálogos de até PREFIX_MAX_CHARS caracteres vão inteiros no prefixo cacheado;
+# nos maiores, cada mensagem leva só as TOP_K mais relevantes para ela
+FINANCE_CATEGORY_PREFIX_MAX_CHARS = env.int('FINANCE_CATEGORY_PREFIX_MAX_CHARS', default=1500)
+FINANCE_CATEGORY_TOP_K = 8
+FINANCE_CATEGORY_MIN_SCORE = 0.2
+
+# Atalho determinístico para mensagens comuns de finanças (finance.fast_path):
+# 'on' responde sem o LLM quando confiante, 'shadow' só compara com o LLM, 'off'
+FINANCE_FAST_PATH = env('FINANCE_FAST_PATH', default='on')
+FINANCE_FAST_PATH_MIN_CONFIDENCE = 0.8
+
+# Respostas a consultas financeiras (saldo, extrato, categorias) reaproveitadas
+# enquanto as movimentações do usuário não mudam (finance.response_cache)
+FINANCE_RESPONSE_CACHE = env.bool('FINANCE_RESPONSE_CACHE', default=True)
+FINANCE_RESPONSE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Roteamento local das mensagens entre as configs finance/calendar/general
+# (agents.intent_router); abaixo da confiança mínima, o LLM decide
+INTENT_ROUTER_MODEL_PATH = env('INTENT_ROUTER_MODEL_PATH', default=os.path.join(BASE_DIR, 'var', 'intent_router.npz'))
+INTENT_ROUTER_MIN_CONFIDENCE = 0.6
+
+# Resposta do agente em partes (agents.streaming): enviada ao WhatsApp em fins
+# de parágrafo/frase enquanto o LLM gera, com o indicador "digitando..."
+LLM_STREAMING = env.bool('LLM_STREAMING', default=True)
+STREAMING_MIN_CHARS = 300
+# Abaixo do limite de 4096 caracteres de uma mensagem do WhatsApp
+STREAMING_MAX_CHARS = 3000
+
+# Failover entre provedores das configs com fallback_chain (agents.llm_routing)
+LLM_ROUTING = {
+    'CIRCUIT_FAILURES': env.int('LLM_CIRCUIT_FAILURES', default=3),
+    'CIRCUIT_COOLDOWN': env.int('LLM_CIRCUIT_COOLDOWN', default=60),
+}
+
+# Limite de chamadas aos provedores LLM (agents.rate_limit), por chave de API
+# e modelo, compartilhado entre os workers da máquina. RPM/TPM: requisições e
+# tokens por minuto; CONCURRENCY: chamadas simultâneas. 'provedor/modelo'
+# sobrepõe os limites do provedor; None desativa o limite
+LLM_RATE_LIMITS = {
+    'openai': {
+        'RPM': env.int('OPENAI_RPM', default=500),
+        'TPM': env.int('OPENAI_TPM', default=200000),
+        'CONCURRENCY': env.int('OPENAI_CONCURRENCY', default=16),
+    },
+    'anthropic': {
+        'RPM': env.int('ANTHROPIC_RPM', default=50),
+        'TPM': env.int('ANTHROPIC_TPM', default=40000),
+        'CONCURRENCY': env.int('ANTHROPIC_CONCURRENCY', default=8),
+    },
+    'google': {
+        'RPM': env.int('GOOGLE_RPM', default=60),
+        'TPM': env.int('GOOGLE_TPM', default=250000),
+        'CONCURRENCY': env.int('GOOGLE_CONCURRENCY', default=8),
+    },
+}
+LLM_RATE_LIMIT_DIR = env('LLM_RATE_LIMIT_DIR', default=os.path.join(BASE_DIR, 'var', 'rate_limits'))
+# Espera máxima na fila antes de desistir (ou passar ao próximo da fallback_chain)
+LLM_RATE_LIMIT_MAX_WAIT = env.int('LLM_RATE_LIMIT_MAX_WAIT', default=20)
+
+# Preço (US$ por milhão de tokens) para o custo em LLMUsageDaily (agents.usage);
+# o modelo usa o prefixo mais longo que casar ('gpt-4o-mini-2024-07-18' -> 'gpt-4o-mini')
+LLM_PRICES = {
+    'gpt-4o-mini': {'input': 0.15, 'cache_read': 0.075, 'output': 0.60},
+    'gpt-4o': {'input': 2.50, 'cache_read': 1.25, 'output': 10.00},
+    'gpt-4.1-mini': {'input': 0.40, 'cache_read': 0.10, 'output': 1.60},
+    'gpt-4.1': {'input': 2.00, 'cache_read': 0.50, 'output': 8.00},
+    'claude-3-5-haiku': {'input': 0.80, 'cache_read': 0.08, 'cache_creation': 1.00, 'output': 4.00},
+    'claude-3-5-sonnet': {'input': 3.00, 'cache_read': 0.30, 'cache_creation': 3.75, 'output': 15.00},
+    'claude-sonnet-4': {'input': 3.00, 'cache_read': 0.30, 'cache_creation': 3.75, 'output': 15.00},
+    'gemini-1.5-flash': {'input': 0.075, 'output': 0.30},
+    'gemini-2.0-flash': {'input': 0.10, 'output': 0.40},
+}
+# Cota diária por usuário (tokens de entrada + saída e US$); 0 desativa
+LLM_DAILY_TOKEN_QUOTA = env.int('LLM_DAILY_TOKEN_QUOTA', default=0)
+LLM_DAILY_COST_QUOTA = env.float('LLM_DAILY_COST_QUOTA', default=0)
+
+# Orçamento de cada turno do agente (agents.turn_budget): chamadas de
+# ferramenta, tempo (s) e tokens; repetir a mesma chamada mais de MAX_REPEATS
+# vezes é tratado como loop. Esgotado, o agente responde com o que já obteve
+AGENT_TURN_BUDGET = {
+    'MAX_TOOL_CALLS': env.int('AGENT_MAX_TOOL_CALLS', default=8),
+    'MAX_SECONDS': env.int('AGENT_MAX_SECONDS', default=60),
+    'MAX_TOKENS': env.int('AGENT_MAX_TOKENS', default=60000),
+    'MAX_REPEATS': 2,
+}
+
+# Provedor 'fake' (agents.fake_llm): respostas por regras e latência simulada,
+# para testes de carga sem chamar os provedores. SCRIPT: arquivo JSON com
+# regras próprias, avaliadas antes das padrão
+LLM_FAKE = {
+    'LATENCY': {
+        'DISTRIBUTION': env('LLM_FAKE_LATENCY', default='lognormal'),
+        'MEDIAN': env.float('LLM_FAKE_LATENCY_MEDIAN', default=0.8),
+        'SIGMA': env.float('LLM_FAKE_LATENCY_SIGMA', default=0.4),
+        'MIN': env.float('LLM_FAKE_LATENCY_MIN', default=0.2),
+        'MAX': env.float('LLM_FAKE_LATENCY_MAX', default=2.0),
+    },
+    'ERROR_RATE': env.float('LLM_FAKE_ERROR_RATE', default=0.0),
+    'SEED': env.int('LLM_FAKE_SEED', default=0),
+    'SCRIPT': env('LLM_FAKE_SCRIPT', default=''),
+}
+
+# Memória da conversa (agents.memory): últimos turnos dentro do orçamento de
+# tokens; os mais antigos são resumidos em ChatSession.summary
+CHAT_HISTORY_TOKEN_BUDGET = env.int('CHAT_HISTORY_TOKEN_BUDGET', default=3000)
+CHAT_HISTORY_MAX_TURNS = env.int('CHAT_HISTORY_MAX_TURNS', default=10)
+CHAT_SUMMARY_MAX_TOKENS = 400
+
+# Índice BM25 dos arquivos de contexto (agents.retrieval): bases maiores que o
+# orçamento entram no prompt só com os trechos mais relevantes para a mensagem
+CONTEXT_INDEX_DIR = env('CONTEXT_INDEX_DIR', default=os.path.join(BASE_DIR, 'var', 'context_index'))
+CONTEXT_CHUNK_TOKENS = 300
+CONTEXT_RETRIEVAL_TOP_K = env.int('CONTEXT_RETRIEVAL_TOP_K', default=6)
+CONTEXT_RETRIEVAL_TOKEN_BUDGET = env.int('CONTEXT_RETRIEVAL_TOKEN_BUDGET', default=1500)
+
+# Extração dos arquivos de contexto em segundo plano (agents.ingestion)
+CONTEXT_INGESTION = {
+    'WORKERS': env.int('CONTEXT_INGESTION_WORKERS', default=2),
+    'TIMEOUT': env.int('CONTEXT_INGESTION_TIMEOUT', default=300),
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,
+    # Busca periódica (s) por arquivos presos em 'processing' nos workers do gunicorn
+    'RECOVERY_INTERVAL': env.int('CONTEXT_INGESTION_RECOVERY_INTERVAL', default=300),
+}
+
+# Extração de PDFs (agents.file_processors.PDFFileProcessor): faixas de páginas
+# em paralelo, texto de cada página em cache pelo hash do arquivo
+CONTEXT_PDF_WORKERS = env.int('CONTEXT_PDF_WORKERS', default=2)
+CONTEXT_PDF_PAGES_PER_TASK = 10
+CONTEXT_PDF_MAX_PAGES = env.int('CONTEXT_PDF_MAX_PAGES', default=500)
+CONTEXT_PDF_TIME_BUDGET = env.int('CONTEXT_PDF_TIME_BUDGET', default=120)
+CONTEXT_PDF_CACHE_DIR = env('CONTEXT_PDF_CACHE_DIR', default=os.path.join(BASE_DIR, 'var', 'pdf_pages'))
+
+# Extração de texto/CSV/JSON/HTML em fluxo (agents.file_processors.TextFileProcessor)
+CONTEXT_TEXT_MAX_CHARS = env.int('CONTEXT_TEXT_MAX_CHARS', default=2_000_000)
+CONTEXT_CSV_MAX_ROWS = 100
+CONTEXT_JSON_MAX_DEPTH = 20
+
 # Django AI Assistant settings
 DJANGO_AI_ASSISTANT = {
     'save_messages': False,  # Não salvar mensagens automaticamente
@@ -29,6 +29,7 @@ urlpatterns = [
     path('whatsapp/', include('whatsapp_connector.urls')),  # WhatsApp connector URLs
     path('google-calendar/', include('google_calendar.urls')),  # Google Calendar integration URLs
     path('finance/', include('finance.urls')),  # Finance dashboard URLs
+    path('monitoring/', include('monitoring.urls')),  # Métricas internas de desempenho
     path('ai-assistant/', include('django_ai_assistant.urls')),  # AI Assistant URLs
     path('', include('webapp.urls')),  # WebApp como página inicial
 ]
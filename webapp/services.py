@@ -4,11 +4,13 @@ Implementa padrão Service Layer para gerenciamento de instâncias
 """
 
 import requests
-import traceback
+import logging
 from typing import Dict, List, Optional, Tuple
 from django.utils import timezone
 from whatsapp_connector.models import EvolutionInstance
 
+logger = logging.getLogger(__name__)
+
 
 class EvolutionAPIError(Exception):
     """Exceção personalizada para erros da Evolution API"""
@@ -374,7 +376,7 @@ class InstanceManager:
             return False
             
         except Exception as e:
-            print(f"Erro ao atualizar status da instância {instance.name}: {e}")
+            logger.error('Erro ao atualizar status da instância %s: %s', instance.name, e)
             instance.status = 'error'
             instance.save()
             return False
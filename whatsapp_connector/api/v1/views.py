@@ -1,4 +1,4 @@
-import traceback
+import logging
 from datetime import datetime
 from typing import Tuple
 
@@ -9,14 +9,19 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from agents.models import LLMProviderConfig
+from agents import intent_router
 from agents.services import create_llm_service
 from authentication.models import User
-from utils.ai_assistants import IntentRouterAssistant
+from monitoring.log import payload_size
+from monitoring.memory import memory_stage
+from monitoring.metrics import QUEUE_DEPTH, WEBHOOK_EVENTS
+from monitoring.tracing import start_trace, span
 from whatsapp_connector.models import MessageHistory, EvolutionInstance
-from whatsapp_connector.services import ImageProcessingService, EvolutionAPIService
+from whatsapp_connector.services import ImageProcessingService, EvolutionAPIService, StreamingReply
 from whatsapp_connector.utils import transcribe_audio_from_bytes, clean_number_whatsapp
 
+logger = logging.getLogger(__name__)
+
 # from django_ai_assistant.models import Thread  # Não usar - desabilitado
 
 
@@ -28,34 +33,66 @@ class EvolutionWebhookView(APIView):
         """
         Handle incoming webhooks from Evolution API
         """
+        self.message_type = 'unknown'
+        with QUEUE_DEPTH.labels('webhook').track_inprogress(), start_trace('webhook') as trace:
+            response = self._process_webhook(request, trace)
+
+        WEBHOOK_EVENTS.labels(self.message_type, self._outcome(response)).inc()
+        self._store_timing(trace)
+        return response
+
+    def _outcome(self, response):
+        """Resultado do evento para as métricas: success, ignored, error..."""
+        data = response.data if isinstance(response.data, dict) else {}
+        if response.status_code >= 400:
+            return 'error'
+        return data.get('status', 'success')
+
+    def _store_timing(self, trace):
+        """Persiste o breakdown de tempos por etapa no MessageHistory processado"""
+        if not trace.message_pk:
+            return
+        try:
+            MessageHistory.objects.filter(pk=trace.message_pk).update(timing=trace.as_dict())
+        except Exception as e:
+            logger.error('Erro ao salvar tempos do pipeline: %s', e)
+
+    def _process_webhook(self, request, trace):
         try:
             data = request.data
             response_msg = None
+            streaming_reply = None
 
             # Validate webhook data
             if not self._validate_webhook_data(data):
                 return Response(
-                    {'error': 'Invalid webhook data'}, 
+                    {'error': 'Invalid webhook data'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
+
             # Extract message data
-            message_data = self._extract_message_data(data)
-            
+            with span('extract'):
+                message_data = self._extract_message_data(data)
+
             if not message_data:
                 return Response(
-                    {'status': 'ignored', 'reason': 'Not a valid message'}, 
+                    {'status': 'ignored', 'reason': 'Not a valid message'},
                     status=status.HTTP_200_OK
                 )
 
             # Get Evolution instance
-            evolution_instance = self._get_evolution_instance(message_data)
+            with span('instance_lookup'):
+                evolution_instance = self._get_evolution_instance(message_data)
 
             # Save message to database and get WhatsApp contact user
-            message_history, whatsapp_user = self._save_message(message_data, evolution_instance)
+            with span('save_message'):
+                message_history, whatsapp_user = self._save_message(message_data, evolution_instance)
+            trace.message_pk = message_history.pk
+            self.message_type = message_history.message_type or 'unknown'
 
             # Check and process admin commands (activate/deactivate instance)
-            admin_response = self._process_admin_commands(message_history, evolution_instance)
+            with span('admin_commands'):
+                admin_response = self._process_admin_commands(message_history, evolution_instance)
             if admin_response:
                 return admin_response
 
@@ -66,7 +103,7 @@ class EvolutionWebhookView(APIView):
 
             # Verifique se a instância está ativa - caso contrário, ignore a mensagem
             if evolution_instance and not evolution_instance.is_active:
-                print(f"🔴 Instância inativa, ignorando mensagem: {evolution_instance.name}")
+                logger.warning('🔴 Instância inativa, ignorando mensagem: %s', evolution_instance.name)
                 return Response({
                     'status': 'ignored',
                     'reason': 'Instância está inativa',
@@ -87,16 +124,18 @@ class EvolutionWebhookView(APIView):
             evolution_api = EvolutionAPIService(evolution_instance)
             # n8n_service = N8NService()  # Comentado - usando OpenAI via agents
 
-            print(f"Processando mensagem: {message_history.message_type} de {message_history.sender_name}")
-            print(f"Has image: {message_data.get('has_image')}, Has audio: {message_data.get('has_audio')}")
-            print(f"Media URL: {message_history.media_url}")
+            logger.debug('Processando mensagem: %s de %s', message_history.message_type, message_history.sender_name)
+            logger.debug('Has image: %s, Has audio: %s', message_data.get('has_image'), message_data.get('has_audio'))
+            logger.debug('Media URL: %s', message_history.media_url)
 
             # Processar diferentes tipos de mensagens como o aplicativo Orbi
             if message_data.get('has_audio') or message_history.message_type == 'audio':
-                message_history = self._process_audio_message(message_history, evolution_api, data)
+                with span('audio'), memory_stage('audio'):
+                    message_history = self._process_audio_message(message_history, evolution_api, data)
 
             elif message_data.get('has_image') or message_history.message_type == 'image':
-                message_history = self._process_image_message(message_history, data, evolution_instance)
+                with span('image'), memory_stage('image'):
+                    message_history = self._process_image_message(message_history, data, evolution_instance, whatsapp_user)
 
             if message_history.content:
             # elif message_history.content or message_history.message_type == 'text':  # Text message
@@ -104,19 +143,25 @@ class EvolutionWebhookView(APIView):
                 message_history.processing_status = 'processing'
                 message_history.save()
 
-                # intent_router_assistant = IntentRouterAssistant()
-                #
-                # # Não usar Thread do django-ai-assistant (desabilitado)
-                # config_type = intent_router_assistant.run(
-                #     message=message_history.content,
-                #     thread_id=None  # Sem thread persistente
-                # )
-
-                llm_config = LLMProviderConfig.objects.filter(config_type='finance').first()
+                # Config finance/calendar/general da instância, escolhida pelo classificador local
+                with span('llm_config'):
+                    llm_config = intent_router.route(message_history.content, evolution_instance, whatsapp_user)
 
                 if llm_config:
-                    ai = create_llm_service(llm_config, user=whatsapp_user)
-                    response_msg = ai.send_text_message(message_history.content, message_history.chat_session)
+                    # Resposta enviada em partes enquanto o LLM gera, com "digitando..."
+                    if settings.LLM_STREAMING and message_history.chat_session.allows_ai_response():
+                        streaming_reply = StreamingReply(evolution_api, message_history.chat_session.from_number)
+
+                    try:
+                        with span('llm'):
+                            ai = create_llm_service(llm_config, user=whatsapp_user)
+                            response_msg = ai.send_text_message(
+                                message_history.content, message_history.chat_session, on_part=streaming_reply
+                            )
+                    finally:
+                        # Sem "digitando..." depois da resposta completa ou de um erro
+                        if streaming_reply is not None:
+                            streaming_reply.finish()
                 else:
                     # Fallback: usar configuração padrão ou mostrar erro
                     response_msg = "⚠️ Nenhuma configuração de IA foi encontrada para esta instância. Configure um LLM Provider no painel administrativo."
@@ -125,7 +170,12 @@ class EvolutionWebhookView(APIView):
             result = False
             if response_msg:
 
-                result = self._send_response_to_whatsapp(evolution_api, message_history.chat_session.from_number, response_msg)
+                if streaming_reply is not None and streaming_reply.parts:
+                    # Já enviada em partes durante a geração
+                    result = streaming_reply.result
+                else:
+                    with span('send'):
+                        result = self._send_response_to_whatsapp(evolution_api, message_history.chat_session.from_number, response_msg)
 
                 # Atualizar o MessageHistory com a resposta
                 if result and not isinstance(result, dict):
@@ -133,23 +183,23 @@ class EvolutionWebhookView(APIView):
                     message_history.response = response_msg
                     message_history.processing_status = 'completed'
                     message_history.save()
-                    print(f"✅ Resposta enviada e salva para mensagem {message_history.message_id}")
+                    logger.info('✅ Resposta enviada e salva para mensagem %s', message_history.message_id)
                 elif isinstance(result, dict) and result.get('error') == 'number_not_exists':
                     # Número não tem WhatsApp
                     message_history.processing_status = 'failed'
                     message_history.response = f"❌ Número {result.get('number')} não tem WhatsApp"
                     message_history.save()
-                    print(f"⚠️ Número {result.get('number')} não tem WhatsApp - mensagem não enviada")
+                    logger.warning('⚠️ Número %s não tem WhatsApp - mensagem não enviada', result.get('number'))
                     result = True  # Considerar como sucesso pois foi processado corretamente
                 else:
                     message_history.processing_status = 'failed'
                     message_history.save()
-                    print(f"❌ Erro ao enviar resposta para {message_history.chat_session.from_number}")
+                    logger.error('❌ Erro ao enviar resposta para %s', message_history.chat_session.from_number)
             else:
                 # Sem resposta - marcar como processado mas sem resposta (sessão humana/encerrada)
                 message_history.processing_status = 'completed'
                 message_history.save()
-                print(f"ℹ️ Mensagem processada sem resposta para {message_history.chat_session.from_number} (sessão em atendimento humano ou encerrada)")
+                logger.info('ℹ️ Mensagem processada sem resposta para %s (sessão em atendimento humano ou encerrada)', message_history.chat_session.from_number)
                 result = True  # Considerar como sucesso pois foi processado corretamente
 
             if result:
@@ -166,8 +216,7 @@ class EvolutionWebhookView(APIView):
 
 
         except Exception as e:
-            print(f"Error processing webhook: {e}")
-            traceback.print_exc()
+            logger.exception('Error processing webhook: %s', e)
             return Response(
                 {'error': 'Internal server error'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -182,7 +231,7 @@ class EvolutionWebhookView(APIView):
         try:
             data = webhook_data.get('data', {})
 
-            print(data)
+            logger.debug('Payload do webhook: %s bytes', payload_size(data))
             
             if not data:
                 return None
@@ -252,7 +301,7 @@ class EvolutionWebhookView(APIView):
             return None
             
         except Exception as e:
-            print(f"Error extracting message data: {e}")
+            logger.error('Error extracting message data: %s', e)
             return None
     
     def _get_message_type(self, message):
@@ -333,21 +382,23 @@ class EvolutionWebhookView(APIView):
         from_number = clean_number_whatsapp(message_data['from_number'])
         to_number = clean_number_whatsapp(message_data.get('to_number', ''))
 
-        print(f'from_number {from_number} to_number {to_number}')
+        logger.debug('from_number %s to_number %s', from_number, to_number)
 
-        user_whatsapp_contact, user_created, password = self._get_or_create_user(from_number, message_data.get('sender_name', ''))
+        with span('user'):
+            user_whatsapp_contact, user_created, password = self._get_or_create_user(from_number, message_data.get('sender_name', ''))
 
         # Buscar sessão ativa (ai ou human) ou criar nova com status 'ai'
-        chat_session, session_created = ChatSession.get_or_create_active_session(
-            from_number=from_number,
-            to_number=to_number,
-            evolution_instance=evolution_instance,
-            owner=user_whatsapp_contact
-        )
+        with span('session'):
+            chat_session, session_created = ChatSession.get_or_create_active_session(
+                from_number=from_number,
+                to_number=to_number,
+                evolution_instance=evolution_instance,
+                owner=user_whatsapp_contact
+            )
 
 
         if session_created:
-            print(f"✅ Nova sessão criada para {from_number} com status 'ai'")
+            logger.info("✅ Nova sessão criada para %s com status 'ai'", from_number)
 
             # Se o usuário foi criado agora, enviar mensagem de boas-vindas
             if user_created and password and evolution_instance:
@@ -379,10 +430,11 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
 
 💡 *Dica:* Guarde suas credenciais em um local seguro. Você pode usar o sistema via WhatsApp ou acessar o dashboard pelo link acima."""
 
-                evolution_api.send_text_message(from_number, welcome_msg)
-                print(f"📨 Mensagem de boas-vindas enviada para {from_number}")
+                with span('welcome'):
+                    evolution_api.send_text_message(from_number, welcome_msg)
+                logger.info('📨 Mensagem de boas-vindas enviada para %s', from_number)
         else:
-            print(f"ℹ️ Usando sessão existente para {from_number} (status: {chat_session.get_status_display()})")
+            logger.debug('ℹ️ Usando sessão existente para %s (status: %s)', from_number, chat_session.get_status_display())
 
         # Extract data for database saving (remove helper fields)
         save_data = message_data.copy()
@@ -394,7 +446,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         # Check if instance is inactive and mark the message
         if evolution_instance and not evolution_instance.is_active:
             save_data['received_while_inactive'] = True
-            print(f"🔴 Marcando mensagem como recebida com instância inativa: {evolution_instance.name}")
+            logger.warning('🔴 Marcando mensagem como recebida com instância inativa: %s', evolution_instance.name)
         else:
             save_data['received_while_inactive'] = False
         
@@ -406,37 +458,40 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         if 'timestamp' in save_data:
             save_data['created_at'] = save_data.pop('timestamp')
         
-        message_history, created = MessageHistory.objects.get_or_create(
-            message_id=message_data['message_id'],
-            defaults=save_data
-        )
+        with span('insert'):
+            message_history, created = MessageHistory.objects.get_or_create(
+                message_id=message_data['message_id'],
+                defaults=save_data
+            )
         return message_history, user_whatsapp_contact
     
     def _process_audio_message(self, message, evolution_api, raw_data) -> str:
         """Process audio message like orbi app"""
         try:
-            print("Mensagem de áudio detectada")
+            logger.debug('Mensagem de áudio detectada')
             message.processing_status = 'processing'
             message.save()
             
             # Decrypt audio using the same logic as orbi
-            audio_bytes = evolution_api.decrypt_whatsapp_audio(raw_data)
+            with span('decrypt'), memory_stage('decrypt'):
+                audio_bytes = evolution_api.decrypt_whatsapp_audio(raw_data)
             
             if audio_bytes:
                 # Transcribe audio
-                transcription = transcribe_audio_from_bytes(audio_bytes.read())
-                print(f"Texto transcrito: {transcription}")
+                with span('transcribe'), memory_stage('transcribe'):
+                    transcription = transcribe_audio_from_bytes(audio_bytes.read())
+                logger.debug('Texto transcrito: %s caracteres', len(transcription))
                 
                 message.audio_transcription = transcription
                 message.content = transcription  # Use transcription as message content
                 message.save()
             else:
-                print("❌ Falha ao descriptografar áudio")
+                logger.error('❌ Falha ao descriptografar áudio')
                 message.processing_status = 'failed'
                 message.save()
 
         except Exception as e:
-            print(f"Error processing audio message: {e}")
+            logger.error('Error processing audio message: %s', e)
             message.processing_status = 'failed'
             message.save()
 
@@ -446,7 +501,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
     def _process_text_message(self, message, n8n_service):
         """Process text message like orbi app"""
         try:
-            print(f"Mensagem de texto detectada {message}")
+            logger.debug('Mensagem de texto detectada: %s caracteres', len(message or ''))
             message.processing_status = 'processing'
             message.save()
             
@@ -466,48 +521,52 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
             message.save()
             
         except Exception as e:
-            print(f"Error processing text message: {e}")
+            logger.error('Error processing text message: %s', e)
             message.processing_status = 'failed'
             message.save()
     
-    def _process_image_message(self, message, raw_data=None, evolution_instance=None):
+    def _process_image_message(self, message, raw_data=None, evolution_instance=None, whatsapp_user=None):
         """Process image message with decryption support"""
         try:
-            print("Mensagem de imagem detectada")
+            logger.debug('Mensagem de imagem detectada')
             message.processing_status = 'processing'
             message.save()
             
-            processing_service = ImageProcessingService(evolution_instance)
+            processing_service = ImageProcessingService(evolution_instance, user=whatsapp_user)
             evolution_api = EvolutionAPIService(evolution_instance) if evolution_instance else None
             
             # Try to decrypt the image first if we have raw_data
             if raw_data:
-                print("Tentando descriptografar imagem...")
-                print(f"Raw data structure keys: {list(raw_data.keys())}")
+                logger.debug('Tentando descriptografar imagem...')
+                logger.debug('Raw data structure keys: %s', list(raw_data.keys()))
                 if 'data' in raw_data:
-                    print(f"Data structure keys: {list(raw_data['data'].keys())}")
+                    logger.debug('Data structure keys: %s', list(raw_data['data'].keys()))
                     if 'message' in raw_data['data']:
-                        print(f"Message structure keys: {list(raw_data['data']['message'].keys())}")
+                        logger.debug('Message structure keys: %s', list(raw_data['data']['message'].keys()))
                 
-                decrypted_image = evolution_api.decrypt_whatsapp_image(raw_data)
+                with span('decrypt'), memory_stage('decrypt'):
+                    decrypted_image = evolution_api.decrypt_whatsapp_image(raw_data)
                 
                 if decrypted_image:
-                    print("✓ Descriptografia bem-sucedida")
+                    logger.info('✓ Descriptografia bem-sucedida')
                     # Save decrypted image directly
-                    if processing_service.save_decrypted_image(decrypted_image, message):
+                    with span('save'), memory_stage('save'):
+                        saved = processing_service.save_decrypted_image(decrypted_image, message)
+                    if saved:
                         # Process the decrypted image
-                        processing_service.process_image_message(message)
+                        with span('analyze'), memory_stage('analyze'):
+                            processing_service.process_image_message(message)
                     else:
-                        print("✗ Falha ao salvar imagem descriptografada")
+                        logger.error('✗ Falha ao salvar imagem descriptografada')
                         message.processing_status = 'failed'
                         message.save()
                 else:
-                    print("Falha na descriptografia, tentando download direto...")
+                    logger.error('Falha na descriptografia, tentando download direto...')
                     # Fallback to direct download
                     if message.media_url and processing_service.download_and_save_image(message.media_url, message):
                         processing_service.process_image_message(message)
                     else:
-                        print("✗ Download direto também falhou")
+                        logger.error('✗ Download direto também falhou')
                         message.processing_status = 'failed'
                         message.save()
             else:
@@ -519,7 +578,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
                     message.save()
                     
         except Exception as e:
-            print(f"Error processing image message: {e}")
+            logger.error('Error processing image message: %s', e)
             message.processing_status = 'failed'
             message.save()
 
@@ -564,12 +623,11 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
             # Criar métodos de pagamento padrão para o novo usuário
             payment_methods_count = create_default_payment_methods(user)
 
-            print(f"✅ Usuário criado automaticamente: {username} ({email})")
-            print(f"🔐 Senha gerada: {password}")
-            print(f"📂 {categories_count} categorias padrão criadas")
-            print(f"💳 {payment_methods_count} métodos de pagamento padrão criados")
+            logger.info('✅ Usuário criado automaticamente: %s (%s)', username, email)
+            logger.debug('📂 %s categorias padrão criadas', categories_count)
+            logger.debug('💳 %s métodos de pagamento padrão criados', payment_methods_count)
         else:
-            print(f"ℹ️ Usuário já existe: {username}")
+            logger.info('ℹ️ Usuário já existe: %s', username)
 
         return user, user_created, password
 
@@ -588,13 +646,13 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
             try:
                 # Buscar por algum campo que corresponda ao instanceId
                 # Como não temos um campo instanceId no modelo, vamos usar uma abordagem diferente
-                print(f"🔍 Buscando instância por instanceId: {instance_id}")
+                logger.debug('🔍 Buscando instância por instanceId: %s', instance_id)
 
                 # Buscar todas as instâncias e verificar via API qual corresponde ao instanceId
                 evolution_instance = EvolutionInstance.objects.get(instance_evolution_id=instance_id)
 
             except Exception as e:
-                print(f"❌ Erro ao buscar instância por instanceId: {e}")
+                logger.error('❌ Erro ao buscar instância por instanceId: %s', e)
 
 
         return evolution_instance
@@ -610,7 +668,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         message_content = message_history.content.strip().lower() if message_history.content else ""
         evolution_api = EvolutionAPIService(evolution_instance)
 
-        print(f'sender_number {sender_number} evolution_instance.phone_number {evolution_instance.phone_number}')
+        logger.debug('sender_number %s evolution_instance.phone_number %s', sender_number, evolution_instance.phone_number)
 
         # sender_number 558396194249 558399330465
         # sender_number 558396194249 558399330465
@@ -650,7 +708,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         if not evolution_instance.is_active:
             evolution_instance.is_active = True
             evolution_instance.save(update_fields=['is_active'])
-            print(f"✅ Instância ativada via comando: {evolution_instance.name}")
+            logger.info('✅ Instância ativada via comando: %s', evolution_instance.name)
             
             confirmation_msg = f"✅ Instância '{evolution_instance.name}' foi ativada com sucesso!"
             evolution_api.send_text_message(sender_number, confirmation_msg)
@@ -675,7 +733,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         if evolution_instance.is_active:
             evolution_instance.is_active = False
             evolution_instance.save(update_fields=['is_active'])
-            print(f"🔴 Instância desativada via comando: {evolution_instance.name}")
+            logger.warning('🔴 Instância desativada via comando: %s', evolution_instance.name)
             
             confirmation_msg = f"🔴 Instância '{evolution_instance.name}' foi desativada com sucesso!"
             evolution_api.send_text_message(sender_number, confirmation_msg)
@@ -854,7 +912,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
             evolution_instance.profile_name and
             sender_name == evolution_instance.profile_name):
             
-            print(f"🚫 Ignorando mensagem da própria instância: {sender_name}")
+            logger.warning('🚫 Ignorando mensagem da própria instância: %s', sender_name)
             return Response({
                 'status': 'ignored',
                 'reason': 'Mensagem enviada pela própria instância',
@@ -872,9 +930,9 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         
         if not evolution_instance.is_number_authorized(sender_number):
             authorized_numbers = evolution_instance.get_authorized_numbers_list()
-            print(f"❌ Número não autorizado: {sender_number}")
+            logger.warning('❌ Número não autorizado: %s', sender_number)
             if authorized_numbers:
-                print(f"📱 Números permitidos: {authorized_numbers}")
+                logger.debug('📱 Números permitidos: %s', len(authorized_numbers))
             
             return Response({
                 'status': 'ignored',
@@ -882,7 +940,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
                 'message_id': message_history.message_id
             }, status=status.HTTP_200_OK)
         
-        print(f"✅ Número autorizado: {sender_number}")
+        logger.debug('✅ Número autorizado: %s', sender_number)
         return None
     
     def _send_response_to_whatsapp(self, evolution_api, to_number, response_msg):
@@ -903,9 +961,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         text = structured_response.get("text", "").strip()
         file_url = structured_response.get("file", "").strip()
         
-        print(f"📤 Enviando resposta estruturada:")
-        print(f"   Texto: {text[:100]}..." if len(text) > 100 else f"   Texto: {text}")
-        print(f"   Arquivo: {file_url}")
+        logger.info('📤 Enviando resposta estruturada: texto com %s caracteres, arquivo: %s', len(text), file_url or '-')
         
         results = []
         
@@ -913,7 +969,7 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
         if text:
             text_result = evolution_api.send_text_message(to_number, text)
             results.append(text_result)
-            print(f"✅ Texto enviado: {text_result}")
+            logger.debug('✅ Texto enviado: %s', bool(text_result))
         
         # Enviar arquivo depois se não estiver vazio
         if file_url:
@@ -921,9 +977,9 @@ Se quiser acompanhar suas finanças de forma visual, você também pode acessar
             if file_url.startswith(('http://', 'https://')):
                 file_result = evolution_api.send_file_message(to_number, file_url)
                 results.append(file_result) 
-                print(f"📎 Arquivo enviado: {file_result}")
+                logger.debug('📎 Arquivo enviado: %s', bool(file_result))
             else:
-                print(f"⚠️ URL de arquivo inválida: '{file_url}' - deve começar com http:// ou https://")
+                logger.warning("⚠️ URL de arquivo inválida: '%s' - deve começar com http:// ou https://", file_url)
                 # Enviar mensagem explicativa para o usuário
                 error_message = f"❌ Não foi possível enviar o arquivo '{file_url}'. O sistema precisa de uma URL completa (ex: https://exemplo.com/arquivo.pdf)."
                 error_result = evolution_api.send_text_message(to_number, error_message)
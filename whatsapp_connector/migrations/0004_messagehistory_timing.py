@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_connector', '0003_evolutioninstance_instance_evolution_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagehistory',
+            name='timing',
+            field=models.JSONField(blank=True, help_text='Breakdown de tempo (ms) e queries por etapa do pipeline', null=True, verbose_name='Tempos por etapa'),
+        ),
+    ]
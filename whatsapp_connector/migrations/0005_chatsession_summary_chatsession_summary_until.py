@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_connector', '0004_messagehistory_timing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary',
+            field=models.TextField(blank=True, default='', help_text='Resumo incremental das mensagens que saíram da janela de contexto do assistente', verbose_name='Resumo da conversa'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_until',
+            field=models.DateTimeField(blank=True, help_text='Data da última mensagem do histórico incluída no resumo', null=True, verbose_name='Resumo até'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-import traceback
+import logging
 
 from django.contrib.auth import get_user_model
 from django.db import models
@@ -7,6 +7,8 @@ from django.conf import settings
 
 from common.models import BaseUUIDModel, HistoryBaseModel
 
+logger = logging.getLogger(__name__)
+
 
 class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
     """
@@ -117,7 +119,7 @@ class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
             url = f"{self.base_url}/instance/fetchInstances"
             response = requests.get(url, headers=headers, timeout=15)
 
-            print(f'fetch_and_update_connection_info {response.json()}')
+            logger.debug('fetch_and_update_connection_info: %s bytes', len(response.content))
 
             if response.status_code == 200:
                 data = response.json()
@@ -146,7 +148,7 @@ class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
                     if instance_evolution_id and instance_evolution_id != self.instance_evolution_id:
                         self.instance_evolution_id = instance_evolution_id
                         updated = True
-                        print(f"🆔 Instance evolution ID updated: {instance_evolution_id}")
+                        logger.info('🆔 Instance evolution ID updated: %s', instance_evolution_id)
 
                     # Capturar número da conta (ownerJid é o formato completo)
                     if owner_jid and '@s.whatsapp.net' in owner_jid:
@@ -154,18 +156,18 @@ class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
                         if phone_number != self.phone_number:
                             self.phone_number = phone_number
                             updated = True
-                            print(f"📱 Phone number updated: {phone_number}")
+                            logger.info('📱 Phone number updated: %s', phone_number)
 
                     # Atualizar informações do perfil
                     if profile_name and profile_name != self.profile_name:
                         self.profile_name = profile_name
                         updated = True
-                        print(f"👤 Profile name updated: {profile_name}")
+                        logger.info('👤 Profile name updated: %s', profile_name)
 
                     if profile_pic_url and profile_pic_url != self.profile_pic_url:
                         self.profile_pic_url = profile_pic_url
                         updated = True
-                        print(f"📸 Profile pic updated: {profile_pic_url}")
+                        logger.info('📸 Profile pic updated: %s', profile_pic_url)
 
                     # Mapear status da API para nosso modelo
                     status_mapping = {
@@ -178,7 +180,7 @@ class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
                     if new_status != self.status:
                         self.status = new_status
                         updated = True
-                        print(f"🔄 Status updated: {api_status} -> {new_status}")
+                        logger.info('🔄 Status updated: %s -> %s', api_status, new_status)
 
                     # Atualizar última conexão
                     self.last_connection = timezone.now()
@@ -186,17 +188,16 @@ class EvolutionInstance(BaseUUIDModel, HistoryBaseModel):
 
                     if updated:
                         self.save()
-                        print(f"✅ Updated connection info for instance {self.name}: {owner_jid} (status: {api_status})")
+                        logger.info('✅ Updated connection info for instance %s: %s (status: %s)', self.name, owner_jid, api_status)
                         return True
                 else:
-                    print(f"⚠️ Instance {self.instance_name} not found in API response")
+                    logger.warning('⚠️ Instance %s not found in API response', self.instance_name)
                     # Debug: mostrar nomes disponíveis
                     available_names = [item.get('name', 'unknown') for item in data] if isinstance(data, list) else []
-                    print(f"   Available instances: {available_names}")
+                    logger.debug('Available instances: %s', available_names)
 
         except Exception as e:
-            traceback.print_exc()
-            print(f"❌ Error fetching connection info for instance {self.name}: {e}")
+            logger.exception('❌ Error fetching connection info for instance %s: %s', self.name, e)
 
         return False
 
@@ -226,6 +227,18 @@ class ChatSession(models.Model):
         default="ai",
         verbose_name="Status da sessão"
     )
+    summary = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="Resumo da conversa",
+        help_text="Resumo incremental das mensagens que saíram da janela de contexto do assistente"
+    )
+    summary_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Resumo até",
+        help_text="Data da última mensagem do histórico incluída no resumo"
+    )
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
     updated_at = models.DateTimeField('Atualizado em', auto_now=True)
 
@@ -354,8 +367,14 @@ class MessageHistory(models.Model):
         default=False,
         help_text='Indica se a mensagem foi recebida enquanto a instância estava inativa'
     )
+    timing = models.JSONField(
+        'Tempos por etapa',
+        blank=True,
+        null=True,
+        help_text='Breakdown de tempo (ms) e queries por etapa do pipeline'
+    )
+
 
-    
     class Meta:
         ordering = ['-received_at']
     
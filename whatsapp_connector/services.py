@@ -1,4 +1,4 @@
-import traceback
+import logging
 import json
 
 import requests
@@ -6,6 +6,8 @@ import base64
 import io
 import hmac
 import hashlib
+import threading
+import time
 
 from Crypto.Cipher import AES
 from Crypto.Hash import SHA256
@@ -14,9 +16,15 @@ from django.conf import settings
 from django.core.files.base import ContentFile
 from PIL import Image
 from io import BytesIO
+from agents import rate_limit, usage
+from monitoring.log import payload_size
+from monitoring.metrics import MEDIA_BYTES, observe_call
+
 from .models import ImageProcessingJob
 from .utils import clean_number_whatsapp
 
+logger = logging.getLogger(__name__)
+
 
 class EvolutionAPIService:
     def __init__(self, instance):
@@ -40,23 +48,24 @@ class EvolutionAPIService:
         payload = {"numbers": clean_numbers}
 
         try:
-            print(f"🔍 Verificando números no WhatsApp: {clean_numbers}")
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
+            logger.debug('🔍 Verificando números no WhatsApp: %s', clean_numbers)
+            with observe_call('evolution') as call:
+                response = call.response(requests.post(url, json=payload, headers=headers, timeout=10))
 
             if response.status_code == 200:
                 result = response.json()
-                print(f"✅ Verificação de números concluída: {result}")
+                logger.debug('✅ Verificação de números concluída: %s bytes', payload_size(result))
                 return result
             else:
-                print(f"⚠️ Erro na verificação de números: {response.status_code} - {response.text}")
+                logger.error('⚠️ Erro na verificação de números: %s - %s', response.status_code, response.text)
                 return None
 
         except requests.RequestException as e:
-            print(f"❌ Erro ao verificar números no WhatsApp: {e}")
+            logger.error('❌ Erro ao verificar números no WhatsApp: %s', e)
             return None
 
-    def send_text_message(self, to_number, message):
-        """Send text message using Evolution API"""
+    def send_text_message(self, to_number, message, delay=1200):
+        """Send text message using Evolution API (delay: ms showing "typing..." before sending)"""
         url = f"{self.base_url}/message/sendText/{self.instance.instance_name}"
 
         headers = {
@@ -71,24 +80,25 @@ class EvolutionAPIService:
             "number": clean_number,
             "text": message,
             "options": {
-                "delay": 1200,
+                "delay": delay,
                 "presence": "composing",
                 "linkPreview": False
             }
         }
         
-        print(f"📤 Enviando mensagem via Evolution API:")
-        print(f"   URL: {url}")
-        print(f"   Número original: {to_number}")
-        print(f"   Número limpo: {clean_number}")
+        logger.info('📤 Enviando mensagem via Evolution API:')
+        logger.debug('URL: %s', url)
+        logger.debug('Número original: %s', to_number)
+        logger.debug('Número limpo: %s', clean_number)
         # print(f"   Mensagem: {message}")
         # print(f"   Payload: {payload}")
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
-            print(f"   Status: {response.status_code}")
+            with observe_call('evolution') as call:
+                response = call.response(requests.post(url, json=payload, headers=headers))
+            logger.debug('Status: %s', response.status_code)
             if response.status_code != 200:
-                print(f"   Response body1: {response.text}")
+                logger.debug('Response body1: %s', response.text)
 
             # Verificar se houve erro específico do WhatsApp antes de raise_for_status
             if response.status_code == 400:
@@ -100,7 +110,7 @@ class EvolutionAPIService:
                             message_info = messages[0]
                             if message_info.get('exists') is False:
                                 number = message_info.get('number', clean_number)
-                                print(f"⚠️ Número {number} não tem WhatsApp ou não existe")
+                                logger.warning('⚠️ Número %s não tem WhatsApp ou não existe', number)
                                 return {'error': 'number_not_exists', 'number': number, 'message': 'Número não tem WhatsApp'}
                 except:
                     pass  # Se não conseguir parsear, continua com o fluxo normal
@@ -110,10 +120,10 @@ class EvolutionAPIService:
 
             return response.json()
         except requests.RequestException as e:
-            print(f"❌ Erro ao enviar mensagem: {e}")
+            logger.exception('❌ Erro ao enviar mensagem: %s', e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"   Response status: {e.response.status_code}")
-                print(f"   Response body2: {e.response.text}")
+                logger.debug('Response status: %s', e.response.status_code)
+                logger.debug('Response body2: %s', e.response.text)
 
                 # Tentar extrair informação mais específica do erro
                 try:
@@ -128,9 +138,38 @@ class EvolutionAPIService:
                 except:
                     pass
 
-            traceback.print_exc()
             return None
     
+    def send_presence(self, to_number, presence='composing', delay=5000):
+        """
+        Show a presence ("composing" = typing...) to the contact for `delay` ms.
+        The Evolution API only answers after the delay, so the request runs in
+        a background thread.
+        """
+        url = f"{self.base_url}/chat/sendPresence/{self.instance.instance_name}"
+
+        headers = {
+            "apikey": self.instance.api_key,
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "number": clean_number_whatsapp(to_number),
+            "presence": presence,
+            "delay": delay,
+        }
+
+        def send():
+            try:
+                with observe_call('evolution') as call:
+                    response = call.response(requests.post(url, json=payload, headers=headers, timeout=delay / 1000 + 10))
+                if response.status_code not in (200, 201):
+                    logger.debug('⚠️ Erro ao enviar presença: %s - %s', response.status_code, response.text)
+            except requests.RequestException as e:
+                logger.debug('⚠️ Erro ao enviar presença: %s', e)
+
+        threading.Thread(target=send, daemon=True).start()
+
     def send_file_message(self, to_number, file_url_or_path, caption=None):
         """Send file message using Evolution API with base64 encoding"""
         url = f"{self.base_url}/message/sendMedia/{self.instance.instance_name}"
@@ -147,8 +186,9 @@ class EvolutionAPIService:
             # Determinar se é URL ou caminho local e baixar/ler o arquivo
             if file_url_or_path.startswith(('http://', 'https://')):
                 # É uma URL - fazer download
-                print(f"📥 Baixando arquivo de: {file_url_or_path}")
-                file_response = requests.get(file_url_or_path, timeout=30)
+                logger.info('📥 Baixando arquivo de: %s', file_url_or_path)
+                with observe_call('file_download') as call:
+                    file_response = call.response(requests.get(file_url_or_path, timeout=30))
                 file_response.raise_for_status()
                 file_data = file_response.content
                 
@@ -172,7 +212,7 @@ class EvolutionAPIService:
                     
             else:
                 # É caminho local - ler arquivo
-                print(f"📁 Lendo arquivo local: {file_url_or_path}")
+                logger.info('📁 Lendo arquivo local: %s', file_url_or_path)
                 with open(file_url_or_path, 'rb') as file:
                     file_data = file.read()
                 
@@ -194,7 +234,7 @@ class EvolutionAPIService:
             
             # Para imagens, SEMPRE converter para JPEG (WhatsApp funciona melhor)
             if media_type == "image":
-                print(f"🔄 Processando imagem para WhatsApp...")
+                logger.info('🔄 Processando imagem para WhatsApp...')
                 try:
                     from PIL import Image
                     from io import BytesIO
@@ -203,24 +243,24 @@ class EvolutionAPIService:
                     image = Image.open(BytesIO(file_data))
                     original_size = image.size
                     original_mode = image.mode
-                    print(f"📊 Imagem original: {original_size} - {original_mode}")
+                    logger.debug('📊 Imagem original: %s - %s', original_size, original_mode)
                     
                     # SEMPRE redimensionar se muito grande (WhatsApp tem limites)
                     max_size = 1024
                     if max(image.size) > max_size:
                         image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                        print(f"📐 Redimensionado: {original_size} → {image.size}")
+                        logger.debug('📐 Redimensionado: %s → %s', original_size, image.size)
                     
                     # SEMPRE converter para RGB/JPEG (remove transparência, PNG, etc)
                     if image.mode in ('RGBA', 'LA', 'P'):
-                        print(f"🎨 Convertendo {original_mode} → RGB (removendo transparência)")
+                        logger.debug('🎨 Convertendo %s → RGB (removendo transparência)', original_mode)
                         background = Image.new('RGB', image.size, (255, 255, 255))
                         if image.mode == 'P':
                             image = image.convert('RGBA')
                         background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
                         image = background
                     elif image.mode != 'RGB':
-                        print(f"🎨 Convertendo {original_mode} → RGB")
+                        logger.debug('🎨 Convertendo %s → RGB', original_mode)
                         image = image.convert('RGB')
                     
                     # SEMPRE salvar como JPEG otimizado para WhatsApp
@@ -236,11 +276,11 @@ class EvolutionAPIService:
                     if not file_name.lower().endswith(('.jpg', '.jpeg')):
                         file_name = file_name.rsplit('.', 1)[0] + '.jpg' if '.' in file_name else file_name + '.jpg'
                     
-                    print(f"✅ Imagem convertida para JPEG: {len(file_data)} bytes ({len(base64_string)} chars base64)")
-                    print(f"📱 Nome final: {file_name}")
+                    logger.info('✅ Imagem convertida para JPEG: %s bytes (%s chars base64)', len(file_data), len(base64_string))
+                    logger.info('📱 Nome final: %s', file_name)
                     
                 except Exception as e:
-                    print(f"⚠️ Erro ao processar imagem: {e}")
+                    logger.error('⚠️ Erro ao processar imagem: %s', e)
                     # Continua com imagem original
             
             # Preparar payload no formato unificado da Evolution API
@@ -261,36 +301,36 @@ class EvolutionAPIService:
             if caption:
                 payload["mediaMessage"]["caption"] = caption
             
-            print(f"📎 Enviando arquivo via Evolution API:")
-            print(f"   URL: {url}")
-            print(f"   Número: {clean_number}")
-            print(f"   Tipo: {media_type}")
-            print(f"   Nome: {file_name}")
-            print(f"   Tamanho: {len(file_data)} bytes")
-            print(f"   Caption: {caption}")
+            logger.info('📎 Enviando arquivo via Evolution API:')
+            logger.debug('URL: %s', url)
+            logger.debug('Número: %s', clean_number)
+            logger.debug('Tipo: %s', media_type)
+            logger.debug('Nome: %s', file_name)
+            logger.debug('Tamanho: %s bytes', len(file_data))
+            logger.debug('Caption: %s', caption)
             
-            response = requests.post(url, json=payload, headers=headers)
-            print(f"   Status: {response.status_code}")
+            with observe_call('evolution') as call:
+                response = call.response(requests.post(url, json=payload, headers=headers))
+            MEDIA_BYTES.labels(media_type, 'sent').inc(len(file_data))
+            logger.debug('Status: %s', response.status_code)
             if response.status_code != 200:
-                print(f"   Response body3: {response.text}")
+                logger.debug('Response body3: %s', response.text)
             response.raise_for_status()
-            print(f"✅ Arquivo enviado com sucesso: {response.text}")
+            logger.info('✅ Arquivo enviado com sucesso (%s bytes)', len(file_data))
 
             return response.json()
             
         except requests.RequestException as e:
-            print(f"❌ Erro ao processar/enviar arquivo: {e}")
+            logger.exception('❌ Erro ao processar/enviar arquivo: %s', e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"   Response status: {e.response.status_code}")
-                print(f"   Response body4: {e.response.text}")
-            traceback.print_exc()
+                logger.debug('Response status: %s', e.response.status_code)
+                logger.debug('Response body4: %s', e.response.text)
             return None
         except FileNotFoundError:
-            print(f"❌ Arquivo não encontrado: {file_url_or_path}")
+            logger.error('❌ Arquivo não encontrado: %s', file_url_or_path)
             return None
         except Exception as e:
-            print(f"❌ Erro inesperado ao enviar arquivo: {e}")
-            traceback.print_exc()
+            logger.exception('❌ Erro inesperado ao enviar arquivo: %s', e)
             return None
     
     def _get_real_filename_from_url(self, file_url, fallback_name):
@@ -307,7 +347,7 @@ class EvolutionAPIService:
             ).first()
             
             if context_file and context_file.name:
-                print(f"✓ Nome real encontrado no banco: {context_file.name}")
+                logger.info('✓ Nome real encontrado no banco: %s', context_file.name)
                 return context_file.name
             
             # Se não encontrou no banco, tentar extrair da URL
@@ -317,16 +357,16 @@ class EvolutionAPIService:
                 if len(url_parts) > 0:
                     filename_from_url = unquote(url_parts[-1])  # Decodificar URL encoding
                     if '.' in filename_from_url and len(filename_from_url) > 3:
-                        print(f"✓ Nome extraído da URL: {filename_from_url}")
+                        logger.info('✓ Nome extraído da URL: %s', filename_from_url)
                         return filename_from_url
             except Exception as e:
-                print(f"Erro ao extrair nome da URL: {e}")
+                logger.error('Erro ao extrair nome da URL: %s', e)
             
-            print(f"Usando nome fallback: {fallback_name}")
+            logger.debug('Usando nome fallback: %s', fallback_name)
             return fallback_name
             
         except Exception as e:
-            print(f"Erro ao buscar nome real do arquivo: {e}")
+            logger.error('Erro ao buscar nome real do arquivo: %s', e)
             return fallback_name
     
     def decrypt_whatsapp_audio(self, message_data):
@@ -342,19 +382,21 @@ class EvolutionAPIService:
                 if 'audioMessage' in message_obj:
                     audio_msg = message_obj['audioMessage']
                 else:
-                    print("audioMessage not found in webhook data structure")
+                    logger.warning('audioMessage not found in webhook data structure')
                     return None
             elif 'audioMessage' in message_data:
                 # Direct audioMessage structure
                 audio_msg = message_data['audioMessage']
             else:
-                print(f"Could not find audioMessage in data structure. Available keys: {list(message_data.keys())}")
+                logger.debug('Could not find audioMessage in data structure. Available keys: %s', list(message_data.keys()))
                 return None
             enc_url = audio_msg['url']
             media_key_b64 = audio_msg['mediaKey']
 
             # 1) Download encrypted media
-            enc_data = requests.get(enc_url).content
+            with observe_call('whatsapp_media') as call:
+                enc_data = call.response(requests.get(enc_url)).content
+            MEDIA_BYTES.labels('audio', 'downloaded').inc(len(enc_data))
 
             # 2) HKDF (112 bytes) with Audio type info
             media_key = base64.b64decode(media_key_b64)
@@ -391,8 +433,7 @@ class EvolutionAPIService:
             return io.BytesIO(decrypted)
             
         except Exception as e:
-            print(f"Error decrypting audio: {e}")
-            traceback.print_exc()
+            logger.exception('Error decrypting audio: %s', e)
             return None
     
     def decrypt_whatsapp_image(self, message_data):
@@ -408,32 +449,34 @@ class EvolutionAPIService:
                 if 'imageMessage' in message_obj:
                     image_msg = message_obj['imageMessage']
                 else:
-                    print("imageMessage not found in webhook data structure")
+                    logger.warning('imageMessage not found in webhook data structure')
                     return None
             elif 'imageMessage' in message_data:
                 # Direct imageMessage structure
                 image_msg = message_data['imageMessage']
             else:
-                print(f"Could not find imageMessage in data structure. Available keys: {list(message_data.keys())}")
+                logger.debug('Could not find imageMessage in data structure. Available keys: %s', list(message_data.keys()))
                 return None
             enc_url = image_msg['url']
             media_key_b64 = image_msg['mediaKey']
 
-            print(f"Decriptografando imagem de: {enc_url}")
+            logger.debug('Decriptografando imagem de: %s', enc_url)
             
             # 1) Download encrypted media
-            enc_data = requests.get(enc_url).content
-            print(f"Downloaded encrypted data: {len(enc_data)} bytes")
+            with observe_call('whatsapp_media') as call:
+                enc_data = call.response(requests.get(enc_url)).content
+            MEDIA_BYTES.labels('image', 'downloaded').inc(len(enc_data))
+            logger.debug('Downloaded encrypted data: %s bytes', len(enc_data))
 
             # 2) HKDF (112 bytes) with Image type info
             media_key = base64.b64decode(media_key_b64)
-            print(f"Media key length: {len(media_key)} bytes")
+            logger.debug('Media key length: %s bytes', len(media_key))
             info = b"WhatsApp Image Keys"  # Different from audio
             try:
                 derived = HKDF(media_key, 112, salt=None, info=info, hashmod=SHA256)
-                print(f"HKDF derived key length: {len(derived)} bytes")
+                logger.debug('HKDF derived key length: %s bytes', len(derived))
             except Exception as hkdf_error:
-                print(f"HKDF derivation failed: {hkdf_error}")
+                logger.error('HKDF derivation failed: %s', hkdf_error)
                 return None
 
             # Correct order:
@@ -448,20 +491,17 @@ class EvolutionAPIService:
 
             # 4) Verify MAC (include IV in calculation)
             calc_mac = hmac.new(mac_key, iv + file_data, hashlib.sha256).digest()[:10]
-            print(f"Calculated MAC: {calc_mac.hex()}")
-            print(f"Expected MAC: {mac_tag.hex()}")
             if calc_mac != mac_tag:
-                print("MAC validation failed - trying different MAC calculation methods")
+                logger.warning('MAC validation failed - trying different MAC calculation methods')
                 # Try without IV (some implementations don't include IV)
                 calc_mac_no_iv = hmac.new(mac_key, file_data, hashlib.sha256).digest()[:10]
-                print(f"MAC without IV: {calc_mac_no_iv.hex()}")
                 if calc_mac_no_iv != mac_tag:
-                    print("All MAC validation methods failed")
+                    logger.error('All MAC validation methods failed')
                     return None
                 else:
-                    print("MAC validation succeeded without IV")
+                    logger.debug('MAC validation succeeded without IV')
             else:
-                print("MAC validation succeeded with IV")
+                logger.debug('MAC validation succeeded with IV')
 
             # 5) Decrypt AES-CBC with PKCS#7
             cipher = AES.new(cipher_key, AES.MODE_CBC, iv)
@@ -473,41 +513,106 @@ class EvolutionAPIService:
                 raise ValueError("Invalid padding")
             decrypted = decrypted[:-pad_len]
 
-            print(f"Successfully decrypted image: {len(decrypted)} bytes")
-            print(f"First 20 bytes of decrypted: {decrypted[:20].hex()}")
+            logger.debug('Successfully decrypted image: %s bytes', len(decrypted))
             
             # Validate that decrypted data is a valid image
             try:
                 from PIL import Image
                 test_image = Image.open(io.BytesIO(decrypted))
-                print(f"✓ Decrypted image is valid: {test_image.format} {test_image.mode} {test_image.size}")
+                logger.info('✓ Decrypted image is valid: %s %s %s', test_image.format, test_image.mode, test_image.size)
                 test_image.close()
             except Exception as img_error:
-                print(f"✗ Decrypted data is not a valid image: {img_error}")
+                logger.error('✗ Decrypted data is not a valid image: %s', img_error)
                 # Try different padding removal approaches
                 for pad_attempt in [1, 2, 3, 4, 8, 16]:
                     try:
                         test_decrypted = decrypted[:-pad_attempt] if len(decrypted) > pad_attempt else decrypted
                         test_image = Image.open(io.BytesIO(test_decrypted))
-                        print(f"✓ Valid image found with padding adjustment -{pad_attempt}: {test_image.format}")
+                        logger.info('✓ Valid image found with padding adjustment -%s: %s', pad_attempt, test_image.format)
                         decrypted = test_decrypted
                         test_image.close()
                         break
                     except:
                         continue
                 else:
-                    print("Could not create valid image even with padding adjustments")
+                    logger.debug('Could not create valid image even with padding adjustments')
                     return None
             
             # 6) Return image bytes as BytesIO
             return io.BytesIO(decrypted)
             
         except Exception as e:
-            print(f"Error decrypting image: {e}")
-            traceback.print_exc()
+            logger.exception('Error decrypting image: %s', e)
             return None
 
 
+class StreamingReply:
+    """
+    Sends the agent reply to WhatsApp in parts as it is generated, with the
+    typing indicator while the LLM works. Used as the `on_part` callback of
+    AgentLLMService.send_text_message (agents.streaming), which calls start()
+    when the LLM is actually going to run (not for fast path/cache answers)
+    and typing() when generation resumes after a part. The caller must call
+    finish() once send_text_message returns or raises.
+    """
+
+    # ms of "typing..." at the start (until the first part) and before each next part
+    FIRST_PRESENCE_DELAY = 20000
+    PRESENCE_DELAY = 4000
+
+    def __init__(self, evolution_api, to_number):
+        self.evolution_api = evolution_api
+        self.to_number = to_number
+        self.parts = []
+        self.results = []
+        self.presence_sent = False
+
+    def start(self):
+        self._presence(self.FIRST_PRESENCE_DELAY)
+
+    def typing(self):
+        """More text is coming after a part that was already sent"""
+        if not self.failed:
+            self._presence(self.PRESENCE_DELAY)
+
+    def finish(self):
+        """Clears the typing indicator (reply complete, or generation failed)"""
+        if self.presence_sent:
+            self.evolution_api.send_presence(self.to_number, presence='paused', delay=0)
+            self.presence_sent = False
+
+    def _presence(self, delay):
+        self.evolution_api.send_presence(self.to_number, delay=delay)
+        self.presence_sent = True
+
+    def __call__(self, text):
+        if self.failed:
+            # Número inexistente ou API fora: não adianta enviar o resto
+            return
+        # Sem o delay padrão do sendText: o tempo de geração já é a espera
+        result = self.evolution_api.send_text_message(self.to_number, text, delay=0)
+        self.parts.append(text)
+        self.results.append(result)
+        if self.failed:
+            logger.warning('⚠️ Falha ao enviar a parte %s da resposta para %s', len(self.parts), self.to_number)
+
+    @staticmethod
+    def _failed(result):
+        return not result or isinstance(result, dict) and 'error' in result
+
+    @property
+    def failed(self):
+        return any(self._failed(result) for result in self.results)
+
+    @property
+    def result(self):
+        """First failed send (None or error dict), otherwise the last result"""
+        for result in self.results:
+            if self._failed(result):
+                return result
+        return self.results[-1] if self.results else None
+
+
 class N8NService:
     def __init__(self):
         self.webhook_url = getattr(settings, 'N8N_WEBHOOK_URL')
@@ -515,7 +620,7 @@ class N8NService:
     def send_image_for_processing(self, image_data, message_data):
         """Send image data to n8n webhook for processing"""
         if not self.webhook_url or self.webhook_url == 'http://localhost:5678/webhook/whatsapp-image':
-            print("N8N webhook URL não configurada corretamente")
+            logger.debug('N8N webhook URL não configurada corretamente')
             return None
             
         try:
@@ -527,25 +632,26 @@ class N8NService:
                 'action': 'processImage'
             }
             
-            print(f"Enviando para n8n: {self.webhook_url}")
-            response = requests.post(self.webhook_url, json=payload, timeout=30)
+            logger.debug('Enviando para n8n: %s', self.webhook_url)
+            with observe_call('n8n') as call:
+                response = call.response(requests.post(self.webhook_url, json=payload, timeout=30))
             
             if response.status_code == 404:
-                print(f"Webhook n8n não encontrado (404): {self.webhook_url}")
+                logger.warning('Webhook n8n não encontrado (404): %s', self.webhook_url)
                 return None
             elif response.status_code == 200:
-                print("Enviado para n8n com sucesso")
+                logger.debug('Enviado para n8n com sucesso')
                 return response.json()
             else:
-                print(f"N8n retornou status {response.status_code}: {response.text}")
+                logger.debug('N8n retornou status %s: %s', response.status_code, response.text)
                 return None
                 
         except requests.exceptions.Timeout:
-            print("Timeout ao conectar com n8n")
+            logger.warning('Timeout ao conectar com n8n')
             return None
         except requests.RequestException as e:
-            print(f"Error sending to n8n: {e}")
-            print(f"URL tentativa: {self.webhook_url}")
+            logger.error('Error sending to n8n: %s', e)
+            logger.debug('URL tentativa: %s', self.webhook_url)
             return None
     
     def send_message_to_n8n(self, sender_jid, sender_name, text_message):
@@ -562,31 +668,34 @@ class N8NService:
         }
         
         try:
-            response = requests.post(self.webhook_url, json=payload)
+            with observe_call('n8n') as call:
+                response = call.response(requests.post(self.webhook_url, json=payload))
 
-            print(self.webhook_url)
-            print(payload)
-            print(response)
+            logger.debug('Enviando para n8n: %s', self.webhook_url)
+            logger.debug('Payload n8n: %s bytes', payload_size(payload))
+            logger.debug('Status n8n: %s', response.status_code)
 
             if response.status_code == 200:
                 result = response.json()
                 if result.get('message') == 'Workflow was started':
-                    print("Enviado para o n8n com sucesso!")
+                    logger.debug('Enviado para o n8n com sucesso!')
                     return result
                 else:
-                    print("N8n workflow não foi iniciado")
+                    logger.debug('N8n workflow não foi iniciado')
                     return None
             else:
-                print(f"N8n error: {response.status_code}")
+                logger.error('N8n error: %s', response.status_code)
                 return None
                 
         except requests.RequestException as e:
-            print(f"Error sending to n8n: {e}")
-            traceback.print_exc()
+            logger.exception('Error sending to n8n: %s', e)
             return None
 
 
 class AIVisionService:
+    # Tokens estimados de uma imagem com detail=auto (limite de TPM)
+    IMAGE_TOKENS = 1100
+
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
         # Lista de modelos para tentar, do mais recente para o mais antigo
@@ -607,11 +716,11 @@ class AIVisionService:
             # Abrir a imagem usando PIL para validar e converter
             image = Image.open(BytesIO(image_bytes))
             
-            print(f"Imagem original: {image.format} {image.mode} {image.size}")
+            logger.debug('Imagem original: %s %s %s', image.format, image.mode, image.size)
             
             # Converter para RGB se necessário (remove transparência, etc)
             if image.mode in ('RGBA', 'LA', 'P'):
-                print(f"Convertendo imagem de {image.mode} para RGB")
+                logger.debug('Convertendo imagem de %s para RGB', image.mode)
                 background = Image.new('RGB', image.size, (255, 255, 255))
                 if image.mode == 'P':
                     image = image.convert('RGBA')
@@ -625,7 +734,7 @@ class AIVisionService:
             width, height = image.size
             
             if width > max_dimension or height > max_dimension:
-                print(f"Redimensionando imagem de {width}x{height}")
+                logger.debug('Redimensionando imagem de %sx%s', width, height)
                 
                 # Calcular nova dimensão mantendo aspect ratio
                 if width > height:
@@ -637,19 +746,18 @@ class AIVisionService:
                 
                 # Redimensionar
                 image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                print(f"Imagem redimensionada para {new_width}x{new_height}")
+                logger.debug('Imagem redimensionada para %sx%s', new_width, new_height)
             
             # Converter para JPEG de alta qualidade
             buffer = BytesIO()
             image.save(buffer, format='JPEG', quality=90, optimize=True)
             processed_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
             
-            print(f"Imagem processada: tamanho final ~{len(processed_b64) * 3/4 / 1024 / 1024:.2f} MB")
+            logger.debug('Imagem processada: tamanho final ~%.2f MB', len(processed_b64) * 3/4 / 1024 / 1024)
             return processed_b64
             
         except Exception as e:
-            print(f"Erro ao processar imagem: {e}")
-            traceback.print_exc()
+            logger.exception('Erro ao processar imagem: %s', e)
             return image_data
     
     def _try_model(self, model, image_data, prompt):
@@ -661,7 +769,7 @@ class AIVisionService:
         
         # Debug: verificar tamanho da imagem
         image_size_mb = len(image_data) * 3/4 / 1024 / 1024  # Aproximado do tamanho em MB
-        print(f"Tamanho da imagem base64 original: ~{image_size_mb:.2f} MB")
+        logger.debug('Tamanho da imagem base64 original: ~%.2f MB', image_size_mb)
         
         # Sempre processar e validar a imagem para garantir compatibilidade
         image_data = self._process_and_validate_image(image_data)
@@ -700,37 +808,71 @@ Por favor, forneça as informações de forma clara, separadas e organizadas. Se
             "max_tokens": 300
         }
         
-        print(f"Enviando payload com modelo {model}, prompt: '{prompt[:50]}...'")
-        print(f"Tamanho do payload: {len(json.dumps(payload))} bytes")
+        logger.debug('Enviando payload com modelo %s, prompt com %s caracteres', model, len(prompt))
+        logger.debug('Tamanho do payload: %s bytes', payload_size(payload))
         
         # Use only the standard OpenAI Chat Completions endpoint
         endpoint = 'https://api.openai.com/v1/chat/completions'
         
-        print(f"Enviando requisição para: {endpoint}")
+        logger.debug('Enviando requisição para: %s', endpoint)
         try:
-            response = requests.post(
-                endpoint,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            with observe_call('openai_vision') as call:
+                response = call.response(requests.post(
+                    endpoint,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                ))
         except requests.exceptions.RequestException as e:
-            print(f"Erro na requisição: {e}")
+            logger.error('Erro na requisição: %s', e)
             return None
         
         return response
 
-    def analyze_image(self, image_data, prompt=None):
+    def _call_model(self, model, image_data, prompt, user=None, evolution_instance=None):
+        """
+        _try_model atrás do limite compartilhado da chave da OpenAI
+        (agents.rate_limit): espera capacidade e, num 429, aguarda o
+        Retry-After e tenta de novo enquanto houver prazo. O consumo entra
+        no LLMUsageDaily do usuário e da instância (e na cota diária).
+        """
+        limiter = rate_limit.get_limiter('openai', model, self.api_key)
+        deadline = time.monotonic() + rate_limit.max_wait()
+        # Imagem (até ~1100 tokens com detail=auto) + prompt + max_tokens
+        tokens = self.IMAGE_TOKENS + len(prompt or '') // rate_limit.CHARS_PER_TOKEN + 300
+
+        while True:
+            permit = limiter.acquire(tokens, deadline)
+            response = None
+            started_at = time.perf_counter()
+            try:
+                response = self._try_model(model, image_data, prompt)
+            finally:
+                used = None
+                if response is not None and response.status_code == 200:
+                    consumed = usage.build_openai_usage(model, response.json(), time.perf_counter() - started_at)
+                    usage.record(consumed, user=user, evolution_instance=evolution_instance)
+                    used = consumed['input_tokens'] + consumed['output_tokens']
+                permit.release(used)
+
+            if response is None or response.status_code != 429:
+                return response
+            delay = rate_limit.retry_after(response.headers)
+            limiter.block(delay)
+            if time.monotonic() + delay > deadline:
+                return response
+
+    def analyze_image(self, image_data, prompt=None, user=None, evolution_instance=None):
         """Analisa imagem usando OpenAI Vision API com fallback de modelos"""
         
         # Verificar se a API key está configurada
         if not self.api_key or self.api_key in ['your_ai_api_key', 'your_openai_api_key_here', None, '']:
-            print("OpenAI API key não configurada. Configure OPENAI_API_KEY no arquivo .env")
+            logger.debug('OpenAI API key não configurada. Configure OPENAI_API_KEY no arquivo .env')
             return "Análise de imagem não disponível (API key não configurada)"
         
         # Verificar se a API key tem formato válido (deve começar com sk-)
         if not self.api_key.startswith('sk-'):
-            print(f"API key inválida - deve começar com 'sk-'. Atual: {self.api_key[:10]}...")
+            logger.warning("API key inválida - deve começar com 'sk-'")
             return "Erro: Chave da API OpenAI inválida (formato incorreto)"
         
         # Primeiro tenta com o modelo configurado
@@ -738,66 +880,71 @@ Por favor, forneça as informações de forma clara, separadas e organizadas. Se
         
         for model in models_to_try:
             try:
-                print(f"Tentando análise com modelo: {model}")
-                response = self._try_model(model, image_data, prompt)
+                logger.debug('Tentando análise com modelo: %s', model)
+                response = self._call_model(model, image_data, prompt, user, evolution_instance)
                 
                 if response.status_code == 200:
                     result = response.json()
-                    print(f"Resposta recebida: {list(result.keys())}")
+                    logger.debug('Resposta recebida: %s', list(result.keys()))
                     
                     # Standard OpenAI Chat Completions API format
                     if 'choices' in result and len(result['choices']) > 0:
-                        print(f"Análise bem-sucedida com modelo: {model}")
+                        logger.debug('Análise bem-sucedida com modelo: %s', model)
                         return result['choices'][0]['message']['content']
                     else:
-                        print(f"Resposta inesperada do modelo {model}: {result}")
+                        logger.debug('Resposta inesperada do modelo %s: %s bytes', model, payload_size(result))
                         continue
                 
                 elif response.status_code == 401:
-                    print("Erro 401: Chave da API OpenAI inválida")
+                    logger.error('Erro 401: Chave da API OpenAI inválida')
                     return "Erro: Chave da API OpenAI inválida"
                 
                 elif response.status_code == 400:
                     error_detail = response.json().get('error', {}).get('message', 'Erro desconhecido')
-                    print(f"Erro 400 com modelo {model}: {error_detail}")
+                    logger.error('Erro 400 com modelo %s: %s', model, error_detail)
                     # Para erro 400, não tenta outros modelos pois o problema é com os dados
                     return f"Erro na requisição: {error_detail}"
                 
                 elif response.status_code == 404:
-                    print(f"Modelo {model} não disponível (404), tentando próximo...")
+                    logger.debug('Modelo %s não disponível (404), tentando próximo...', model)
                     continue
                 
                 elif response.status_code == 429:
-                    print("Erro 429: Limite de rate da API OpenAI excedido")
+                    logger.error('Erro 429: Limite de rate da API OpenAI excedido')
                     return "Erro: Muitas requisições para a API"
                 
                 else:
-                    print(f"Erro {response.status_code} com modelo {model}")
+                    logger.error('Erro %s com modelo %s', response.status_code, model)
                     try:
                         error_detail = response.json().get('error', {}).get('message', 'Erro desconhecido')
-                        print(f"Detalhes do erro: {error_detail}")
+                        logger.debug('Detalhes do erro: %s', error_detail)
                     except:
-                        print(f"Response body5: {response.text}")
+                        logger.debug('Response body5: %s', response.text)
                     continue
                     
+            except rate_limit.RateLimitTimeout as e:
+                logger.warning('Limite de requisições do modelo %s: %s, tentando próximo...', model, e)
+                continue
             except requests.exceptions.Timeout:
-                print(f"Timeout com modelo {model}, tentando próximo...")
+                logger.warning('Timeout com modelo %s, tentando próximo...', model)
                 continue
             except requests.exceptions.RequestException as e:
-                print(f"Erro de requisição com modelo {model}: {e}")
+                logger.error('Erro de requisição com modelo %s: %s', model, e)
                 continue
             except Exception as e:
-                print(f"Erro inesperado com modelo {model}: {e}")
+                logger.error('Erro inesperado com modelo %s: %s', model, e)
                 continue
         
         # Se chegou aqui, todos os modelos falharam
-        print("Todos os modelos falharam")
+        logger.debug('Todos os modelos falharam')
         return "Erro: Nenhum modelo de IA disponível no momento"
 
 
 class ImageProcessingService:
-    def __init__(self, evolution_instance=None):
+    def __init__(self, evolution_instance=None, user=None):
         self.evolution_instance = evolution_instance
+        # Usuário do WhatsApp a quem o consumo da análise é atribuído
+        self.user = user
         self.evolution_api = EvolutionAPIService(evolution_instance) if evolution_instance else None
         self.n8n_service = N8NService()
         self.ai_service = AIVisionService()
@@ -805,54 +952,54 @@ class ImageProcessingService:
     def download_and_save_image(self, media_url, message):
         """Download image from WhatsApp URL and save it"""
         try:
-            print(f"Baixando imagem de: {media_url}")
+            logger.debug('Baixando imagem de: %s', media_url)
             
             # Headers para simular um browser real
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(media_url, headers=headers, timeout=30)
+            with observe_call('whatsapp_media') as call:
+                response = call.response(requests.get(media_url, headers=headers, timeout=30))
             response.raise_for_status()
+            MEDIA_BYTES.labels('image', 'downloaded').inc(len(response.content))
             
-            print(f"Response status: {response.status_code}")
-            print(f"Content-Type: {response.headers.get('content-type')}")
-            print(f"Content-Length: {len(response.content)} bytes")
-            print(f"Response headers: {dict(response.headers)}")
+            logger.debug('Response status: %s', response.status_code)
+            logger.debug('Content-Type: %s', response.headers.get('content-type'))
+            logger.debug('Content-Length: %s bytes', len(response.content))
             
             # Verificar se realmente é uma imagem
             content = response.content
             
             if len(content) < 100:  # Muito pequeno para ser uma imagem
-                print(f"Conteúdo muito pequeno: {len(content)} bytes")
+                logger.debug('Conteúdo muito pequeno: %s bytes', len(content))
                 return False
             
             # Debug detalhado do conteúdo
-            print(f"Primeiros 50 bytes (hex): {content[:50].hex()}")
-            print(f"Primeiros 50 bytes (repr): {repr(content[:50])}")
+            logger.debug('Primeiros 16 bytes (hex): %s', content[:16].hex())
             
             # Se começar com HTML, pode ser uma página de erro
             if content[:100].lower().startswith(b'<!doctype') or content[:100].lower().startswith(b'<html'):
-                print("ERRO: Resposta parece ser HTML, não uma imagem")
-                print(f"Início da resposta: {content[:200].decode('utf-8', errors='ignore')}")
+                logger.error('ERRO: Resposta parece ser HTML, não uma imagem')
+                logger.debug('Início da resposta: %s', content[:200].decode('utf-8', errors='ignore'))
                 return False
             
             # Verificar magic numbers de formatos de imagem
             file_extension = "jpg"  # Padrão
             if content.startswith(b'\xff\xd8\xff'):
-                print("Formato detectado por magic number: JPEG")
+                logger.debug('Formato detectado por magic number: JPEG')
                 file_extension = "jpg"
             elif content.startswith(b'\x89PNG\r\n\x1a\n'):
-                print("Formato detectado por magic number: PNG")
+                logger.debug('Formato detectado por magic number: PNG')
                 file_extension = "png"
             elif content.startswith(b'GIF8'):
-                print("Formato detectado por magic number: GIF")
+                logger.debug('Formato detectado por magic number: GIF')
                 file_extension = "gif"
             elif content.startswith(b'RIFF') and b'WEBP' in content[:12]:
-                print("Formato detectado por magic number: WEBP")
+                logger.debug('Formato detectado por magic number: WEBP')
                 file_extension = "webp"
             else:
-                print("AVISO: Formato não reconhecido pelos magic numbers")
+                logger.warning('AVISO: Formato não reconhecido pelos magic numbers')
                 # Tentar inferir do Content-Type
                 content_type = response.headers.get('content-type', '').lower()
                 if 'jpeg' in content_type or 'jpg' in content_type:
@@ -864,67 +1011,66 @@ class ImageProcessingService:
                 elif 'webp' in content_type:
                     file_extension = "webp"
                 else:
-                    print(f"Content-Type também não reconhecido: {content_type}")
+                    logger.debug('Content-Type também não reconhecido: %s', content_type)
             
             # Validar se é uma imagem válida usando PIL - mais detalhado
             try:
-                print("Tentando abrir imagem com PIL...")
+                logger.debug('Tentando abrir imagem com PIL...')
                 test_image = Image.open(BytesIO(content))
-                print(f"✓ PIL conseguiu abrir: format={test_image.format}, mode={test_image.mode}, size={test_image.size}")
+                logger.info('✓ PIL conseguiu abrir: format=%s, mode=%s, size=%s', test_image.format, test_image.mode, test_image.size)
                 actual_format = test_image.format.lower() if test_image.format else 'unknown'
                 test_image.close()
                 
                 # Usar o formato detectado pelo PIL se válido
                 if actual_format in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
                     file_extension = 'jpg' if actual_format == 'jpeg' else actual_format
-                    print(f"Usando extensão baseada no PIL: {file_extension}")
+                    logger.debug('Usando extensão baseada no PIL: %s', file_extension)
                 
             except Exception as img_error:
-                print(f"✗ PIL falhou ao validar imagem: {img_error}")
-                print(f"Tipo do erro: {type(img_error).__name__}")
+                logger.error('✗ PIL falhou ao validar imagem: %s', img_error)
+                logger.debug('Tipo do erro: %s', type(img_error).__name__)
                 
                 # Análise adicional quando PIL falha
-                print("Fazendo análise adicional do conteúdo...")
+                logger.debug('Fazendo análise adicional do conteúdo...')
                 
                 # Verificar se pode ser um arquivo corrompido
                 if len(content) > 1000:
                     # Verificar se há padrões típicos de corrupção
                     null_count = content.count(b'\x00')
-                    print(f"Bytes nulos encontrados: {null_count}")
+                    logger.debug('Bytes nulos encontrados: %s', null_count)
                     
                     # Verificar se parece com dados binários válidos
                     try:
                         # Tenta decodificar como texto - se funcionar, provavelmente não é imagem
                         text_content = content.decode('utf-8')
-                        print("ERRO: Conteúdo pode ser decodificado como texto UTF-8!")
-                        print(f"Primeiros 200 chars: {text_content[:200]}")
+                        logger.error('ERRO: Conteúdo pode ser decodificado como texto UTF-8!')
+                        logger.debug('Primeiros 200 chars: %s', text_content[:200])
                         return False
                     except UnicodeDecodeError:
-                        print("✓ Conteúdo parece ser binário (não é texto)")
+                        logger.info('✓ Conteúdo parece ser binário (não é texto)')
                 
                 # Mesmo com erro PIL, tenta salvar para debug
-                print(f"Tentando salvar mesmo assim como {file_extension} para análise posterior")
+                logger.debug('Tentando salvar mesmo assim como %s para análise posterior', file_extension)
             
             # Create a file from the downloaded content
             file_content = ContentFile(content)
             file_name = f"whatsapp_image_{message.message_id}.{file_extension}"
             
-            print(f"Salvando como: {file_name}")
+            logger.debug('Salvando como: %s', file_name)
             message.media_file.save(file_name, file_content)
             message.save()
             
-            print("✓ Arquivo salvo com sucesso")
+            logger.info('✓ Arquivo salvo com sucesso')
             return True
             
         except requests.exceptions.Timeout:
-            print("Timeout ao baixar imagem")
+            logger.warning('Timeout ao baixar imagem')
             return False
         except requests.exceptions.RequestException as e:
-            print(f"Erro de requisição ao baixar imagem: {e}")
+            logger.error('Erro de requisição ao baixar imagem: %s', e)
             return False
         except Exception as e:
-            print(f"Erro inesperado ao baixar imagem: {e}")
-            traceback.print_exc()
+            logger.exception('Erro inesperado ao baixar imagem: %s', e)
             return False
     
     def save_decrypted_image(self, decrypted_image_io, message):
@@ -934,35 +1080,33 @@ class ImageProcessingService:
             decrypted_image_io.seek(0)
             image_content = decrypted_image_io.read()
             
-            print(f"Salvando imagem descriptografada: {len(image_content)} bytes")
-            print(f"Primeiros 20 bytes: {image_content[:20].hex()}")
+            logger.debug('Salvando imagem descriptografada: %s bytes', len(image_content))
             
             # Validate it's a proper image using PIL
             try:
                 test_image = Image.open(BytesIO(image_content))
-                print(f"✓ Imagem descriptografada válida: {test_image.format} {test_image.mode} {test_image.size}")
+                logger.info('✓ Imagem descriptografada válida: %s %s %s', test_image.format, test_image.mode, test_image.size)
                 format_extension = test_image.format.lower() if test_image.format else 'jpg'
                 if format_extension == 'jpeg':
                     format_extension = 'jpg'
                 test_image.close()
             except Exception as img_error:
-                print(f"✗ Imagem descriptografada inválida: {img_error}")
+                logger.error('✗ Imagem descriptografada inválida: %s', img_error)
                 return False
             
             # Create a file from the decrypted content
             file_content = ContentFile(image_content)
             file_name = f"whatsapp_image_decrypted_{message.message_id}.{format_extension}"
             
-            print(f"Salvando como: {file_name}")
+            logger.debug('Salvando como: %s', file_name)
             message.media_file.save(file_name, file_content)
             message.save()
             
-            print("✓ Imagem descriptografada salva com sucesso")
+            logger.info('✓ Imagem descriptografada salva com sucesso')
             return True
             
         except Exception as e:
-            print(f"Erro ao salvar imagem descriptografada: {e}")
-            traceback.print_exc()
+            logger.exception('Erro ao salvar imagem descriptografada: %s', e)
             return False
     
     def process_image_message(self, message):
@@ -970,81 +1114,79 @@ class ImageProcessingService:
         try:
             # First, download the image if we don't have it locally
             if not message.media_file and message.media_url:
-                print(f"Baixando imagem de: {message.media_url}")
+                logger.debug('Baixando imagem de: %s', message.media_url)
                 if not self.download_and_save_image(message.media_url, message):
-                    print("Falhou ao baixar a imagem")
+                    logger.error('Falhou ao baixar a imagem')
                     message.processing_status = 'failed'
                     message.save()
                     return False
             
             if not message.media_file:
-                print("Nenhuma imagem disponível para processar")
+                logger.debug('Nenhuma imagem disponível para processar')
                 message.processing_status = 'failed'
                 message.save()
                 return False
             
             # Convert image to base64
-            print("Convertendo imagem para base64...")
+            logger.debug('Convertendo imagem para base64...')
             with message.media_file.open('rb') as image_file:
                 image_content = image_file.read()
                 
             # Validar se é uma imagem válida
             try:
-                print("Validando imagem salva com PIL...")
-                print(f"Tamanho do arquivo: {len(image_content)} bytes")
-                print(f"Primeiros 20 bytes: {image_content[:20].hex()}")
+                logger.debug('Validando imagem salva com PIL...')
+                logger.debug('Tamanho do arquivo: %s bytes', len(image_content))
                 
                 test_image = Image.open(BytesIO(image_content))
-                print(f"✓ Imagem válida: format={test_image.format}, mode={test_image.mode}, size={test_image.size}")
+                logger.info('✓ Imagem válida: format=%s, mode=%s, size=%s', test_image.format, test_image.mode, test_image.size)
                 test_image.close()
                 
             except Exception as img_error:
-                print(f"✗ Primeira validação de imagem falhou: {img_error}")
-                print(f"Tipo do erro: {type(img_error).__name__}")
+                logger.error('✗ Primeira validação de imagem falhou: %s', img_error)
+                logger.debug('Tipo do erro: %s', type(img_error).__name__)
                 
                 # Debug adicional do conteúdo do arquivo salvo
                 if len(image_content) < 100:
-                    print(f"ERRO: Arquivo muito pequeno: {len(image_content)} bytes")
+                    logger.error('ERRO: Arquivo muito pequeno: %s bytes', len(image_content))
                 elif image_content[:100].lower().startswith(b'<!doctype') or image_content[:100].lower().startswith(b'<html'):
-                    print("ERRO: Arquivo salvo contém HTML, não é uma imagem")
-                    print(f"Conteúdo: {image_content[:200].decode('utf-8', errors='ignore')}")
+                    logger.error('ERRO: Arquivo salvo contém HTML, não é uma imagem')
+                    logger.debug('Conteúdo: %s', image_content[:200].decode('utf-8', errors='ignore'))
                 else:
-                    print("Arquivo parece ser binário, mas PIL não consegue abrir")
+                    logger.debug('Arquivo parece ser binário, mas PIL não consegue abrir')
                 
                 # Tentar baixar novamente se ainda temos a URL
                 if message.media_url:
-                    print("Tentando baixar a imagem novamente...")
+                    logger.debug('Tentando baixar a imagem novamente...')
                     if self.download_and_save_image(message.media_url, message):
                         # Tentar validar novamente
                         try:
                             with message.media_file.open('rb') as image_file:
                                 new_image_content = image_file.read()
-                            print(f"Novo conteúdo: {len(new_image_content)} bytes")
-                            print(f"Novos primeiros 20 bytes: {new_image_content[:20].hex()}")
+                            logger.debug('Novo conteúdo: %s bytes', len(new_image_content))
                             
                             test_image = Image.open(BytesIO(new_image_content))
-                            print(f"✓ Imagem válida após re-download: {test_image.format} {test_image.mode} {test_image.size}")
+                            logger.info('✓ Imagem válida após re-download: %s %s %s', test_image.format, test_image.mode, test_image.size)
                             image_content = new_image_content  # Usar o novo conteúdo
                             test_image.close()
                         except Exception as retry_error:
-                            print(f"✗ Re-validação também falhou: {retry_error}")
-                            print(f"Tipo do erro: {type(retry_error).__name__}")
+                            logger.error('✗ Re-validação também falhou: %s', retry_error)
+                            logger.debug('Tipo do erro: %s', type(retry_error).__name__)
                             message.processing_status = 'failed'
                             message.save()
                             return False
                     else:
-                        print("✗ Re-download também falhou")
+                        logger.error('✗ Re-download também falhou')
                         message.processing_status = 'failed'
                         message.save()
                         return False
                 else:
-                    print("✗ Não é possível re-baixar a imagem (sem URL)")
+                    logger.error('✗ Não é possível re-baixar a imagem (sem URL)')
                     message.processing_status = 'failed' 
                     message.save()
                     return False
             
             image_data = base64.b64encode(image_content).decode('utf-8')
-            print(f"Imagem convertida para base64: {len(image_data)} caracteres")
+            logger.debug('Imagem convertida para base64: %s caracteres', len(image_data))
             
             # Create processing job for AI
             ai_job = ImageProcessingJob.objects.create(
@@ -1057,7 +1199,9 @@ class ImageProcessingService:
             ai_job.status = 'processing'
             ai_job.save()
             
-            ai_result = self.ai_service.analyze_image(image_data)
+            ai_result = self.ai_service.analyze_image(
+                image_data, user=self.user, evolution_instance=self.evolution_instance
+            )
             if ai_result and not ai_result.startswith("Erro"):
                 ai_job.result = {'analysis': ai_result}
                 ai_job.status = 'completed'
@@ -1109,8 +1253,7 @@ class ImageProcessingService:
             return True
             
         except Exception as e:
-            print(f"Error processing image: {e}")
-            traceback.print_exc()
+            logger.exception('Error processing image: %s', e)
             message.processing_status = 'failed'
             message.save()
             return False
@@ -1,4 +1,4 @@
-import traceback
+import logging
 
 import requests
 import threading
@@ -9,6 +9,8 @@ from django.dispatch import receiver
 from agents.models import ChatHistory
 from whatsapp_connector.models import ChatSession, EvolutionInstance
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=ChatSession, weak=False)
 def post_save_chat_session(sender, instance: ChatSession, *args, **kwargs):
@@ -25,7 +27,7 @@ def _configure_webhook_async(instance_pk, instance_name_for_log):
 
     try:
         # Aguardar um pouco para dar tempo da instância ser criada na Evolution API
-        print(f"⏰ Aguardando 5 segundos antes de configurar webhook para '{instance_name_for_log}'...")
+        logger.info("⏰ Aguardando 5 segundos antes de configurar webhook para '%s'...", instance_name_for_log)
         time.sleep(5)
 
         # Recarregar instância do banco para ter os dados mais recentes
@@ -34,12 +36,12 @@ def _configure_webhook_async(instance_pk, instance_name_for_log):
         # Gerar URL padrão do webhook
         base_url = getattr(settings, 'BACKEND_BASE_URL', '').rstrip('/')
         if not base_url:
-            print(f"❌ BACKEND_BASE_URL não configurado, abortando configuração de webhook para '{instance_name_for_log}'")
+            logger.error("❌ BACKEND_BASE_URL não configurado, abortando configuração de webhook para '%s'", instance_name_for_log)
             return
 
-        print(f"📍 BACKEND_BASE_URL: {base_url}")
-        print(f"📍 Evolution API URL: {instance.base_url}")
-        print(f"📍 Instance name: {instance.instance_name}")
+        logger.info('📍 BACKEND_BASE_URL: %s', base_url)
+        logger.info('📍 Evolution API URL: %s', instance.base_url)
+        logger.info('📍 Instance name: %s', instance.instance_name)
         
         webhook_url = f"{base_url}/whatsapp_connector/v1/evolution/webhook/receiver"
         
@@ -59,20 +61,20 @@ def _configure_webhook_async(instance_pk, instance_name_for_log):
 
         # Primeiro verificar se a instância existe na Evolution API usando endpoint mais específico
         check_url = f"{instance.base_url}/instance/connectionState/{instance.instance_name}"
-        print(f"🔍 Verificando se instância '{check_url}' existe na Evolution API..." )
+        logger.info("🔍 Verificando se instância '%s' existe na Evolution API...", check_url)
 
         check_response = requests.get(check_url, headers={'apikey': instance.api_key}, timeout=30)
 
         if check_response.status_code == 404:
-            print(f"❌ Instância '{instance.instance_name}' não existe na Evolution API. Abortando configuração de webhook.")
-            print(f"   Response: {check_response.text}")
+            logger.error("❌ Instância '%s' não existe na Evolution API. Abortando configuração de webhook.", instance.instance_name)
+            logger.debug('Response: %s', check_response.text)
             return
         elif check_response.status_code != 200:
-            print(f"⚠️ Erro ao verificar instância na Evolution API (continuando mesmo assim): {check_response.text}")
+            logger.error('⚠️ Erro ao verificar instância na Evolution API (continuando mesmo assim): %s', check_response.text)
             # Continua mesmo com erro pois pode ser um problema temporário
         else:
-            print(f"✅ Instância '{instance.instance_name}' encontrada na Evolution API.")
-        print(f"🔄 Configurando webhook automaticamente para instância '{instance_name_for_log}' ({instance.instance_name})...")
+            logger.info("✅ Instância '%s' encontrada na Evolution API.", instance.instance_name)
+        logger.info("🔄 Configurando webhook automaticamente para instância '%s' (%s)...", instance_name_for_log, instance.instance_name)
 
         response = requests.post(webhook_config_url, json=data, headers=headers, timeout=30)
         
@@ -80,15 +82,15 @@ def _configure_webhook_async(instance_pk, instance_name_for_log):
             # Salvar URL do webhook na instância
             EvolutionInstance.objects.filter(pk=instance_pk).update(webhook_url=webhook_url)
             
-            print(f"✅ Webhook configurado automaticamente para instância '{instance_name_for_log}': {webhook_url}")
-            print(f"   Evento configurado: MESSAGES_UPSERT")
+            logger.info("✅ Webhook configurado automaticamente para instância '%s': %s", instance_name_for_log, webhook_url)
+            logger.debug('Evento configurado: MESSAGES_UPSERT')
         else:
-            print(f"❌ Falha ao configurar webhook para instância '{instance_name_for_log}': {response.text}")
+            logger.error("❌ Falha ao configurar webhook para instância '%s': %s", instance_name_for_log, response.text)
             
     except requests.RequestException as e:
-        print(f"❌ Erro de conexão ao configurar webhook para instância '{instance_name_for_log}': {str(e)}")
+        logger.error("❌ Erro de conexão ao configurar webhook para instância '%s': %s", instance_name_for_log, str(e))
     except Exception as e:
-        print(f"❌ Erro inesperado ao configurar webhook para instância '{instance_name_for_log}': {str(e)}")
+        logger.error("❌ Erro inesperado ao configurar webhook para instância '%s': %s", instance_name_for_log, str(e))
 
 
 @receiver(post_save, sender=EvolutionInstance)
@@ -96,8 +98,8 @@ def auto_configure_webhook(sender, instance, created, **kwargs):
     """
     Signal para configurar webhook automaticamente quando uma instância é criada
     """
-    print(f"🔄 Signal post_save executado para instância '{instance.name}' (ID: {instance.pk})")
-    print(f"   created={created}, base_url='{instance.base_url}', api_key={'***' if instance.api_key else 'None'}, instance_name='{instance.instance_name}'")
+    logger.info("🔄 Signal post_save executado para instância '%s' (ID: %s)", instance.name, instance.pk)
+    logger.debug("created=%s, base_url='%s', api_key=%s, instance_name='%s'", created, instance.base_url, '***' if instance.api_key else 'None', instance.instance_name)
 
     if created and instance.base_url and instance.api_key and instance.instance_name:
         # Executar configuração em thread separada para não bloquear
@@ -107,11 +109,10 @@ def auto_configure_webhook(sender, instance, created, **kwargs):
             daemon=True
         )
         thread.start()
-        print(f"🚀 Iniciando configuração automática de webhook para '{instance.name}' em background...")
+        logger.info("🚀 Iniciando configuração automática de webhook para '%s' em background...", instance.name)
     else:
-        traceback.print_exc()
-        print(f"⚠️ Signal executado para '{instance.name}' mas condições não atendidas:")
-        print(f"   created={created}, base_url={bool(instance.base_url)}, api_key={bool(instance.api_key)}, instance_name={bool(instance.instance_name)}")
+        logger.warning("⚠️ Signal executado para '%s' mas condições não atendidas:", instance.name)
+        logger.debug('created=%s, base_url=%s, api_key=%s, instance_name=%s', created, bool(instance.base_url), bool(instance.api_key), bool(instance.instance_name))
 
 
 @receiver(pre_delete, sender=EvolutionInstance)
@@ -120,7 +121,7 @@ def delete_evolution_instance(sender, instance, **kwargs):
     Signal para deletar instância da Evolution API quando removida localmente
     """
     try:
-        print(f"🗑️ Deletando instância '{instance.name}' ({instance.instance_name}) da Evolution API...")
+        logger.info("🗑️ Deletando instância '%s' (%s) da Evolution API...", instance.name, instance.instance_name)
         
         # URL para deletar instância conforme documentação
         delete_url = f"{instance.base_url}/instance/delete/{instance.instance_name}"
@@ -129,14 +130,14 @@ def delete_evolution_instance(sender, instance, **kwargs):
         response = requests.delete(delete_url, headers=headers, timeout=30)
         
         if response.status_code == 200:
-            print(f"✅ Instância '{instance.name}' deletada com sucesso da Evolution API")
+            logger.info("✅ Instância '%s' deletada com sucesso da Evolution API", instance.name)
         elif response.status_code == 404:
-            print(f"ℹ️ Instância '{instance.name}' não encontrada na Evolution API (já foi removida)")
+            logger.warning("ℹ️ Instância '%s' não encontrada na Evolution API (já foi removida)", instance.name)
         else:
-            print(f"❌ Erro ao deletar instância '{instance.name}' da Evolution API: HTTP {response.status_code}")
-            print(f"   Response: {response.text}")
+            logger.error("❌ Erro ao deletar instância '%s' da Evolution API: HTTP %s", instance.name, response.status_code)
+            logger.debug('Response: %s', response.text)
             
     except requests.RequestException as e:
-        print(f"❌ Erro de conexão ao deletar instância '{instance.name}' da Evolution API: {str(e)}")
+        logger.error("❌ Erro de conexão ao deletar instância '%s' da Evolution API: %s", instance.name, str(e))
     except Exception as e:
-        print(f"❌ Erro inesperado ao deletar instância '{instance.name}' da Evolution API: {str(e)}")
+        logger.error("❌ Erro inesperado ao deletar instância '%s' da Evolution API: %s", instance.name, str(e))
@@ -1,8 +1,12 @@
-import traceback
+import logging
 
 import requests
 from django.conf import settings
 
+from monitoring.metrics import MEDIA_BYTES, observe_call
+
+logger = logging.getLogger(__name__)
+
 
 def clean_number_whatsapp(number: str) -> str:
     try:
@@ -16,7 +20,7 @@ def clean_number_whatsapp(number: str) -> str:
         number = "".join(filter(str.isdigit, number))
         return number
     except Exception:
-        traceback.print_exc()
+        logger.exception('Erro ao limpar número do WhatsApp')
         return ""
 
 def transcribe_audio_from_bytes(audio_bytes: bytes, language="pt-BR") -> str:
@@ -25,7 +29,7 @@ def transcribe_audio_from_bytes(audio_bytes: bytes, language="pt-BR") -> str:
     """
     deepgram_key = getattr(settings, 'DEEPGRAM_API_KEY', None)
     if not deepgram_key:
-        print("DEEPGRAM_API_KEY not configured")
+        logger.debug('DEEPGRAM_API_KEY not configured')
         return "Áudio recebido (transcrição não disponível)"
     
     url = "https://api.deepgram.com/v1/listen"
@@ -43,10 +47,12 @@ def transcribe_audio_from_bytes(audio_bytes: bytes, language="pt-BR") -> str:
     }
 
     try:
-        response = requests.post(url, headers=headers, params=params, data=audio_bytes)
+        with observe_call('deepgram') as call:
+            response = call.response(requests.post(url, headers=headers, params=params, data=audio_bytes))
+        MEDIA_BYTES.labels('audio', 'transcribed').inc(len(audio_bytes))
         
         if response.status_code != 200:
-            print(f"Deepgram error: {response.status_code}, {response.text}")
+            logger.error('Deepgram error: %s, %s', response.status_code, response.text)
             return "Erro na transcrição do áudio"
 
         result = response.json()
@@ -55,5 +61,5 @@ def transcribe_audio_from_bytes(audio_bytes: bytes, language="pt-BR") -> str:
         return transcript if transcript.strip() else "Áudio sem conteúdo detectável"
         
     except Exception as e:
-        print(f"Error transcribing audio: {e}")
+        logger.error('Error transcribing audio: %s', e)
         return "Erro na transcrição do áudio"
\ No newline at end of file
@@ -1,4 +1,4 @@
-import traceback
+import logging
 
 import requests
 from django.shortcuts import render, redirect, get_object_or_404
@@ -17,6 +17,8 @@ from django.conf import settings
 from .models import EvolutionInstance, MessageHistory
 from .forms import InstanceForm, WebhookConfigForm, AuthorizedNumbersForm
 
+logger = logging.getLogger(__name__)
+
 
 class MessageHistoryListView(LoginRequiredMixin, ListView):
     model = MessageHistory
@@ -298,21 +300,21 @@ class InstanceDeleteView(LoginRequiredMixin, DeleteView):
             api_deleted = False
             
             try:
-                print(f"🗑️ Tentando deletar instância '{self.object.name}' ({self.object.instance_name})")
+                logger.info("🗑️ Tentando deletar instância '%s' (%s)", self.object.name, self.object.instance_name)
                 
                 # Primeiro verificar se a instância existe na Evolution API
                 check_url = f"{self.object.base_url}/instance/connectionState/{self.object.instance_name}"
-                print(f"   Verificando se instância existe: {check_url}")
+                logger.debug('Verificando se instância existe: %s', check_url)
                 
                 check_response = requests.get(check_url, headers={'apikey': self.object.api_key}, timeout=10)
-                print(f"   Status da verificação: {check_response.status_code}")
+                logger.debug('Status da verificação: %s', check_response.status_code)
                 
                 if check_response.status_code == 404:
-                    print(f"   Instância não existe na Evolution API, pulando deleção")
+                    logger.debug('Instância não existe na Evolution API, pulando deleção')
                     messages.info(request, f'Instância não encontrada na Evolution API (já foi removida)')
                     api_deleted = True
                 elif check_response.status_code != 200:
-                    print(f"   Erro ao verificar instância: {check_response.text}")
+                    logger.error('Erro ao verificar instância: %s', check_response.text)
                 
                 if not api_deleted:
                     # Tentar diferentes formatos de URL da Evolution API para deleção
@@ -326,34 +328,34 @@ class InstanceDeleteView(LoginRequiredMixin, DeleteView):
                 
                 for i, url in enumerate(urls_to_try, 1):
                     try:
-                        print(f"   Tentativa {i}/3 - URL: {url}")
+                        logger.debug('Tentativa %s/3 - URL: %s', i, url)
                         
                         response = requests.delete(url, headers=headers, timeout=30)
                         
-                        print(f"   Status Code: {response.status_code}")
+                        logger.debug('Status Code: %s', response.status_code)
                         
                         if response.status_code == 200:
                             try:
                                 response_data = response.json()
                                 messages.info(request, f'Instância removida da Evolution API: {response_data.get("message", "Deletada com sucesso")}')
-                                print(f"✅ Instância '{self.object.name}' deletada com sucesso da Evolution API")
-                                print(f"   Response JSON: {response_data}")
+                                logger.info("✅ Instância '%s' deletada com sucesso da Evolution API", self.object.name)
+                                logger.debug('Response JSON: %s', response_data)
                             except:
                                 messages.info(request, f'Instância removida da Evolution API')
-                                print(f"✅ Instância '{self.object.name}' deletada com sucesso da Evolution API")
+                                logger.info("✅ Instância '%s' deletada com sucesso da Evolution API", self.object.name)
                             api_deleted = True
                             break
                         elif response.status_code == 404:
-                            print(f"   Endpoint não encontrado (404), tentando próxima URL...")
+                            logger.warning('Endpoint não encontrado (404), tentando próxima URL...')
                             continue
                         else:
-                            print(f"   Response: {response.text}")
+                            logger.debug('Response: %s', response.text)
                             # Se é a última tentativa, mostrar o erro
                             if i == len(urls_to_try):
                                 messages.warning(request, f'Evolution API retornou HTTP {response.status_code}: {response.text}')
                             
                     except requests.RequestException as req_error:
-                        print(f"   Erro na tentativa {i}: {str(req_error)}")
+                        logger.error('Erro na tentativa %s: %s', i, str(req_error))
                         if i == len(urls_to_try):  # Última tentativa
                             raise req_error
                         continue
@@ -361,12 +363,12 @@ class InstanceDeleteView(LoginRequiredMixin, DeleteView):
                 if not api_deleted:
                     error_message = f'Falha ao remover da Evolution API - Todos os endpoints testados falharam'
                     messages.warning(request, error_message)
-                    print(f"❌ {error_message}")
+                    logger.error('❌ %s', error_message)
                     
             except requests.RequestException as e:
                 error_message = f'Erro ao conectar com Evolution API: {str(e)}'
                 messages.warning(request, error_message)
-                print(f"❌ {error_message}")
+                logger.error('❌ %s', error_message)
             
             # Deletar do banco de dados
             response = super().delete(request, *args, **kwargs)
@@ -563,7 +565,7 @@ def sync_phone_numbers(request):
                 if instance.fetch_and_update_connection_info():
                     updated += 1
             except Exception as e:
-                print(f"Error syncing connection info for {instance.name}: {e}")
+                logger.error('Error syncing connection info for %s: %s', instance.name, e)
                 errors += 1
         
         if updated > 0:
@@ -634,7 +636,7 @@ def instance_status(request, pk):
         })
         
     except Exception as e:
-        traceback.print_exc()
+        logger.exception('Erro ao atualizar status da instância %s', pk)
         return JsonResponse({
             'success': False,
             'error': str(e)